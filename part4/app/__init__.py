@@ -1,23 +1,39 @@
 """ Constructor for the 'app' module """
-from flask import Flask
-from flask_restx import Api
-from flask_jwt_extended import JWTManager
-from app.api.v1.users import api as users_ns
-from app.api.v1.amenities import api as amenities_ns
-from app.api.v1.places import api as places_ns
-from app.api.v1.reviews import api as reviews_ns
-from app.api.v1.auth import api as auth_ns
-from app.api.v1.protected import api as protected_ns
-from flask_cors import CORS
-
-def create_app():
+from config import config
+
+def create_app(config_name='default', doc='/'):
     """ method used to create an app instance """
 
+    # The web stack and the namespaces (and with them the facade and models) are only
+    # imported when an app is actually built, so scripts doing `import app.models...` stay cheap
+    from flask import Flask
+    from flask_restx import Api
+    from flask_jwt_extended import JWTManager
+    from flask_cors import CORS
+    from app.api.v1.users import api as users_ns
+    from app.api.v1.amenities import api as amenities_ns
+    from app.api.v1.places import api as places_ns
+    from app.api.v1.reviews import api as reviews_ns
+    from app.api.v1.auth import api as auth_ns
+    from app.api.v1.protected import api as protected_ns
+    from app.api.v1.changes import api as changes_ns
+    from app.api.v1.stream import api as stream_ns
+    from app.persistence import query_monitor, routing, session_scope, change_log
+    from app.api.rate_limit import limiter
+    from app.api.idempotency import idempotency
+    from app import assets
+
     app = Flask(__name__)
+    app.config.from_object(config[config_name])
+
+    # The frontend pages and assets (see app/assets.py). When Swagger is moved off the
+    # root URL, index.html takes its place; this must be registered before the Api,
+    # which claims '/' for itself.
+    assets.init_app(app, index=doc != '/')
 
     # Need to add CORS so that we can do API calls in Part 4
     CORS(app, resources={r"/api/v1/*": {"origins": "*"}})
-    api = Api(app, version='1.0', title='HBnB API', description='HBnB Application API')
+    api = Api(app, version='1.0', title='HBnB API', description='HBnB Application API', doc=doc)
 
     # Register the namespaces
     api.add_namespace(users_ns, path='/api/v1/users')
@@ -26,10 +42,40 @@ def create_app():
     api.add_namespace(reviews_ns, path='/api/v1/reviews')
     api.add_namespace(auth_ns, path='/api/v1/auth')
     api.add_namespace(protected_ns, path='/api/v1/protected')
+    api.add_namespace(changes_ns, path='/api/v1/changes')
+    api.add_namespace(stream_ns, path='/api/v1/stream')
 
     app.config['JWT_SECRET_KEY'] = 'your_jwt_secret_key'  # Use a strong and unique key in production
     app.config['JWT_IDENTITY_CLAIM'] = 'sub'  # Use 'sub' claim for identity
     app.config['JWT_JSON_IDENTITY_CLAIMS'] = True  # Enable JSON serialization for complex identities
     jwt = JWTManager(app)
 
+    # Flag relationships that get lazy-loaded in a loop (see config.py)
+    query_monitor.init_app(app)
+
+    # Requests that write only talk to the primary DB (see app/persistence/routing.py)
+    routing.init_app(app)
+
+    # A fresh DB session for every request (see app/persistence/session_scope.py)
+    session_scope.init_app(app)
+
+    # How old a change has to be before the feed hands it out (see app/persistence/change_log.py)
+    change_log.init_app(app)
+
+    # Tell the other workers about our writes, and drop what they changed (see app/services/cache.py)
+    from app.services import facade
+    facade.broadcast.init_app(app)
+
+    # Throttle logins and writes (see config.py)
+    limiter.init_app(app)
+
+    # Replay the stored response to retried POSTs (see app/api/idempotency.py)
+    idempotency.init_app(app)
+
+    @app.cli.command('bootstrap')
+    def bootstrap_command():
+        """ Create the DB schema and the default admin user """
+        from bootstrap import bootstrap
+        bootstrap()
+
     return app
@@ -0,0 +1,262 @@
+""" Idempotency-Key support: a retried POST gets the first response back instead of running again """
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+# What begin() found for a key
+NEW = 'new'            # nothing yet: the caller runs the request and then calls finish() or abandon()
+DONE = 'done'          # a stored response, to be replayed
+BUSY = 'busy'          # another worker is running the same request right now
+MISMATCH = 'mismatch'  # the key was used for a request with another body
+
+# A claim whose request never finished (e.g. the worker died) is given up after this many seconds
+PENDING_TTL = 60
+
+# How long a request waits for another worker running the same key before answering 409
+BUSY_WAIT = 5
+BUSY_POLL = 0.05
+
+
+def _storable(status):
+    # Server errors and throttling are transient: a retry should run the request again
+    return status < 500 and status != 429
+
+
+class InMemoryResponseStore:
+    """ Responses kept in this process, least recently used dropped first """
+
+    MAX_ENTRIES = 10000
+
+    def __init__(self):
+        self._entries = OrderedDict()   # key -> (expires, fingerprint, record or None while pending)
+        self._lock = threading.Lock()
+
+    def begin(self, key, fingerprint):
+        """ Claims `key` (NEW) unless it holds a response (DONE) or is being worked on (BUSY) """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                self._entries[key] = (now + PENDING_TTL, fingerprint, None)
+                self._entries.move_to_end(key)
+                self._evict(now)
+                return NEW, None
+
+            expires, stored_fingerprint, record = entry
+            if stored_fingerprint != fingerprint:
+                return MISMATCH, None
+            if record is None:
+                return BUSY, None
+            self._entries.move_to_end(key)
+            return DONE, record
+
+    def finish(self, key, record, ttl):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (time.time() + ttl, entry[1], record)
+
+    def abandon(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is None:
+                del self._entries[key]
+
+    def _evict(self, now):
+        if len(self._entries) <= self.MAX_ENTRIES:
+            return
+        for key in [key for key, entry in self._entries.items() if entry[0] <= now]:
+            del self._entries[key]
+        while len(self._entries) > self.MAX_ENTRIES:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteResponseStore:
+    """
+    Responses in a local SQLite file, so that a retry that lands on another
+    worker of the host is still recognised. Pending claims are rows without a
+    response, so a duplicate running in another worker is seen as BUSY.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute("CREATE TABLE IF NOT EXISTS idempotency_keys "
+                     "(key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, response TEXT, expires REAL NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires ON idempotency_keys (expires)")
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def begin(self, key, fingerprint):
+        """ Claims `key` (NEW) unless it holds a response (DONE) or is being worked on (BUSY) """
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT fingerprint, response, expires FROM idempotency_keys WHERE key = ?",
+                               (key,)).fetchone()
+            if row is None or row[2] <= now:
+                conn.execute("INSERT OR REPLACE INTO idempotency_keys (key, fingerprint, response, expires) "
+                             "VALUES (?, ?, NULL, ?)", (key, fingerprint, now + PENDING_TTL))
+                result = NEW, None
+            elif row[0] != fingerprint:
+                result = MISMATCH, None
+            elif row[1] is None:
+                result = BUSY, None
+            else:
+                result = DONE, json.loads(row[1])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    def finish(self, key, record, ttl):
+        now = time.time()
+        conn = self._connect()
+        conn.execute("UPDATE idempotency_keys SET response = ?, expires = ? WHERE key = ?",
+                     (json.dumps(record), now + ttl, key))
+        conn.execute("DELETE FROM idempotency_keys WHERE expires <= ?", (now,))
+
+    def abandon(self, key):
+        self._connect().execute("DELETE FROM idempotency_keys WHERE key = ? AND response IS NULL", (key,))
+
+    def clear(self):
+        self._connect().execute("DELETE FROM idempotency_keys")
+
+
+def create_store(url):
+    """ 'memory://' or 'sqlite:///path/to/file.db' """
+    if url.startswith('sqlite:///'):
+        return SQLiteResponseStore(url[len('sqlite:///'):])
+    if url == 'memory://':
+        return InMemoryResponseStore()
+    raise ValueError("Unsupported idempotency storage: {}".format(url))
+
+
+def _record(result):
+    """ A Resource method's return value as a JSON-able {status, body, headers}, or None if it can't be stored """
+    if not isinstance(result, tuple):
+        result = (result,)
+    body, status, headers = result + (200, {})[len(result) - 1:]
+    if not isinstance(status, int) or not isinstance(headers, dict):
+        return None
+    try:
+        json.dumps(body)
+    except (TypeError, ValueError):
+        return None
+    return {'status': status, 'body': body, 'headers': {str(k): str(v) for k, v in headers.items()}}
+
+
+class IdempotencyKeys:
+    """
+    Stores the response of every request sent with an Idempotency-Key header and
+    answers retries of it (same caller, endpoint, key and body) from the store,
+    without running validation, bcrypt or any DB write again. Duplicates that
+    arrive while the first one is still running wait for its response.
+    """
+
+    def __init__(self):
+        self.store = InMemoryResponseStore()
+        self.ttl = 24 * 3600
+        self._locks = {}   # key -> [lock, number of requests holding or waiting for it]
+        self._locks_lock = threading.Lock()
+
+    def init_app(self, app):
+        self.store = create_store(app.config.get('IDEMPOTENCY_STORAGE_URL', 'memory://'))
+        self.ttl = app.config.get('IDEMPOTENCY_TTL', self.ttl)
+
+    @contextmanager
+    def _key_lock(self, key):
+        """ Serializes the requests of this worker that share a key; the lock goes away with the last one """
+        with self._locks_lock:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._locks_lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[key]
+
+    @staticmethod
+    def _scope():
+        """ Whose key it is: the JWT identity, or the client address for anonymous calls """
+        from flask import request
+        from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+
+        verify_jwt_in_request(optional=True)
+        return get_jwt_identity() or request.remote_addr
+
+    def _begin(self, key, fingerprint):
+        deadline = time.monotonic() + BUSY_WAIT
+        while True:
+            state, record = self.store.begin(key, fingerprint)
+            if state != BUSY or time.monotonic() >= deadline:
+                return state, record
+            time.sleep(BUSY_POLL)
+
+    def idempotent(self, func):
+        """ Decorator for POST Resource methods; put it below @jwt_required() and above @limiter.limit() """
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            from flask import request
+
+            key = request.headers.get(HEADER)
+            if key is None:
+                return func(*args, **kwargs)
+            if not 0 < len(key) <= MAX_KEY_LENGTH:
+                return {'error': '{} must be 1 to {} characters'.format(HEADER, MAX_KEY_LENGTH)}, 400
+
+            store_key = '{}:{} {}:{}'.format(self._scope(), request.method, request.path, key)
+            fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+
+            with self._key_lock(store_key):
+                state, record = self._begin(store_key, fingerprint)
+                if state == DONE:
+                    return record['body'], record['status'], dict(record['headers'], **{REPLAYED_HEADER: 'true'})
+                if state == MISMATCH:
+                    return {'error': '{} was already used for a different request'.format(HEADER)}, 422
+                if state == BUSY:
+                    return ({'error': 'A request with this {} is still in progress'.format(HEADER)}, 409,
+                            {'Retry-After': '1'})
+
+                try:
+                    result = func(*args, **kwargs)
+                except Exception:
+                    self.store.abandon(store_key)
+                    raise
+
+                record = _record(result)
+                if record is not None and _storable(record['status']):
+                    self.store.finish(store_key, record, self.ttl)
+                else:
+                    self.store.abandon(store_key)
+                return result
+        return wrapper
+
+
+idempotency = IdempotencyKeys()
@@ -0,0 +1,220 @@
+""" In-process rate limiting and concurrency control for expensive endpoints """
+
+import math
+import sqlite3
+import threading
+import time
+from functools import wraps
+
+# Defaults for each policy; override any of them with app.config['RATE_LIMITS']
+#   rate        - tokens added back per second
+#   burst       - size of the bucket, i.e. how many calls can be made back to back
+#   keys        - what a bucket belongs to: 'ip' or 'user' (JWT identity); a call takes a token
+#                 from each of them, or from none if one is empty
+#   concurrency - how many calls may run at the same time in this worker (None = unlimited)
+DEFAULT_POLICIES = {
+    # bcrypt is slow on purpose - keep credential stuffing from eating every worker.
+    # Not keyed by the email: anyone could then lock its owner out of their account
+    'login': {'rate': 5 / 60, 'burst': 5, 'keys': ('ip',), 'concurrency': 4},
+    'write': {'rate': 30 / 60, 'burst': 10, 'keys': ('ip', 'user'), 'concurrency': 8},
+}
+
+
+def validate_policy(name, policy):
+    """ Raises ValueError for a policy that can't be applied """
+    if not policy.get('rate', 0) > 0:
+        raise ValueError("Rate limit policy '{}': rate must be greater than 0".format(name))
+    if not policy.get('burst', 0) >= 1:
+        raise ValueError("Rate limit policy '{}': burst must be at least 1".format(name))
+    if not policy.get('keys'):
+        raise ValueError("Rate limit policy '{}': keys must not be empty".format(name))
+
+
+def _refill(tokens, elapsed, rate, burst):
+    return min(burst, tokens + max(0, elapsed) * rate)
+
+
+def _take_all(buckets, rate):
+    """
+    {key: tokens} -> (new {key: tokens}, retry_after): one token from each bucket
+    if all of them have one, else none, and the seconds until they all do
+    """
+    retry_after = max(((1 - tokens) / rate for tokens in buckets.values() if tokens < 1), default=0)
+    if retry_after:
+        return buckets, retry_after
+    return {key: tokens - 1 for key, tokens in buckets.items()}, 0
+
+
+class InMemoryBucketStore:
+    """ Token buckets kept in this process """
+
+    # Idle buckets are refilled anyway, so drop them once there are this many
+    MAX_BUCKETS = 10000
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, keys, rate, burst):
+        """ Takes one token from each bucket; returns 0 if allowed, else the seconds to wait before retrying """
+        now = time.monotonic()
+        with self._lock:
+            buckets = {}
+            for key in keys:
+                tokens, updated, _ = self._buckets.get(key, (burst, now, now))
+                buckets[key] = _refill(tokens, now - updated, rate, burst)
+            buckets, retry_after = _take_all(buckets, rate)
+
+            # Also remember when each bucket will be full again, i.e. safe to forget
+            for key, tokens in buckets.items():
+                self._buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+
+            if len(self._buckets) > self.MAX_BUCKETS:
+                self._buckets = {k: v for k, v in self._buckets.items() if v[2] > now}
+            return retry_after
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class SQLiteBucketStore:
+    """
+    Token buckets in a local SQLite file, so that every worker on the host
+    shares the same limits. Each take() is one short IMMEDIATE transaction, which
+    also deletes the buckets that are full again (the same as no bucket at all).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets "
+                         "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, expires REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_buckets_expires ON buckets (expires)")
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def take(self, keys, rate, burst):
+        """ Takes one token from each bucket; returns 0 if allowed, else the seconds to wait before retrying """
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = {key: (tokens, updated) for key, tokens, updated in conn.execute(
+                "SELECT key, tokens, updated FROM buckets WHERE key IN ({})".format(', '.join('?' * len(keys))),
+                keys)}
+            buckets = {}
+            for key in keys:
+                tokens, updated = rows.get(key, (burst, now))
+                buckets[key] = _refill(tokens, now - updated, rate, burst)
+            buckets, retry_after = _take_all(buckets, rate)
+
+            conn.executemany("INSERT INTO buckets (key, tokens, updated, expires) VALUES (?, ?, ?, ?) "
+                             "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated, "
+                             "expires = excluded.expires",
+                             [(key, tokens, now, now + (burst - tokens) / rate) for key, tokens in buckets.items()])
+            conn.execute("DELETE FROM buckets WHERE expires <= ?", (now,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return retry_after
+
+    def clear(self):
+        self._connect().execute("DELETE FROM buckets")
+
+
+def create_store(url):
+    """ 'memory://' or 'sqlite:///path/to/file.db' """
+    if url.startswith('sqlite:///'):
+        return SQLiteBucketStore(url[len('sqlite:///'):])
+    if url == 'memory://':
+        return InMemoryBucketStore()
+    raise ValueError("Unsupported rate limit storage: {}".format(url))
+
+
+class RateLimiter:
+    """ Applies token-bucket and concurrency limits to the endpoints decorated with limit() """
+
+    def __init__(self):
+        self.enabled = True
+        self.store = InMemoryBucketStore()
+        self.policies = {name: dict(policy) for name, policy in DEFAULT_POLICIES.items()}
+        self._semaphores = {}
+
+    def init_app(self, app):
+        self.enabled = app.config.get('RATE_LIMIT_ENABLED', True)
+        self.store = create_store(app.config.get('RATE_LIMIT_STORAGE_URL', 'memory://'))
+        for name, overrides in app.config.get('RATE_LIMITS', {}).items():
+            self.policies.setdefault(name, {}).update(overrides)
+        for name, policy in self.policies.items():
+            validate_policy(name, policy)
+        self._semaphores = {}
+
+    def _semaphore(self, name, concurrency):
+        # setdefault is atomic, so two threads can't end up with different semaphores
+        return self._semaphores.setdefault(name, threading.BoundedSemaphore(concurrency))
+
+    @staticmethod
+    def _key_value(key_type):
+        """ What the bucket is keyed by for this request, or None to skip that bucket """
+        from flask import request
+        from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+
+        if key_type == 'ip':
+            return request.remote_addr
+        if key_type == 'user':
+            verify_jwt_in_request(optional=True)
+            return get_jwt_identity()
+        raise ValueError("Unknown rate limit key: {}".format(key_type))
+
+    def check(self, name):
+        """ Returns None if the call may go ahead, else the number of seconds to wait """
+        policy = self.policies[name]
+        keys = []
+        for key_type in policy['keys']:
+            value = self._key_value(key_type)
+            if value is not None:
+                keys.append('{}:{}:{}'.format(name, key_type, value))
+        # All the buckets at once: a call refused by one doesn't spend the tokens of the others
+        retry_after = self.store.take(keys, policy['rate'], policy['burst']) if keys else 0
+        return retry_after or None
+
+    def limit(self, name):
+        """ Decorator for Resource methods: @limiter.limit('login') """
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+
+                retry_after = self.check(name)
+                if retry_after is not None:
+                    return ({'error': 'Too many requests. Please try again later.'}, 429,
+                            {'Retry-After': str(math.ceil(retry_after))})
+
+                # Cap how many of these can run at once so they can't starve cheap reads
+                concurrency = self.policies[name].get('concurrency')
+                if concurrency is None:
+                    return func(*args, **kwargs)
+
+                semaphore = self._semaphore(name, concurrency)
+                if not semaphore.acquire(blocking=False):
+                    return ({'error': 'Server busy. Please try again shortly.'}, 503,
+                            {'Retry-After': '1'})
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    semaphore.release()
+            return wrapper
+        return decorator
+
+
+limiter = RateLimiter()
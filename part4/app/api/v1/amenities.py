@@ -55,13 +55,14 @@ class AmenityList(Resource):
     @api.response(200, 'List of amenities retrieved successfully')
     def get(self):
         """Retrieve a list of all amenities"""
-        all_amenities = facade.get_all_amenities()
+        # Served from the in-memory amenity catalog
+        all_amenities = facade.get_amenity_catalog()
         output = []
 
-        for amenity in all_amenities:
+        for amenity_id, amenity_name in all_amenities:
             output.append({
-                'id': str(amenity.id),
-                'name': amenity.name
+                'id': str(amenity_id),
+                'name': amenity_name
             })
 
         return output, 200
@@ -72,13 +73,13 @@ class AmenityResource(Resource):
     @api.response(404, 'Amenity not found')
     def get(self, amenity_id):
         """Get amenity details by ID"""
-        amenity = facade.get_amenity(amenity_id)
-        if not amenity:
+        amenity_name = facade.get_amenity_name(amenity_id)
+        if not amenity_name:
             return {'error': 'Amenity not found'}, 400
 
         output = {
-            'id': str(amenity.id),
-            'name': amenity.name
+            'id': str(amenity_id),
+            'name': amenity_name
         }
 
         return output, 200
@@ -2,6 +2,7 @@ from flask_restx import Namespace, Resource, fields
 from flask_jwt_extended import create_access_token
 # from app.services.facade import HBnBFacade
 from app.services import facade
+from app.api.rate_limit import limiter
 
 api = Namespace('auth', description='Authentication operations')
 
@@ -16,6 +17,9 @@ login_model = api.model('Login', {
 @api.route('/login')
 class Login(Resource):
     @api.expect(login_model)
+    @api.response(429, 'Too many login attempts')
+    @api.response(503, 'Too many logins in progress')
+    @limiter.limit('login')
     def post(self):
 
         # curl -X POST "http://127.0.0.1:5000/api/v1/users/" -H "Content-Type: application/json" -d '{ "first_name": "John", "last_name": "Doe", "email": "john.doe@example.com", "password": "cowabunga"}'
@@ -0,0 +1,61 @@
+from datetime import timezone
+from flask import request
+from flask_restx import Namespace, Resource
+from app.services import facade
+from app.api.v1.query_params import parse_positive_int
+
+api = Namespace('changes', description='Change feed for delta sync')
+
+CHANGES_PER_PAGE = 100
+MAX_CHANGES_PER_PAGE = 1000
+CHANGE_ENTITIES = ['place', 'review', 'amenity', 'user']
+
+@api.route('/')
+class ChangeFeed(Resource):
+    @api.response(200, 'Changes retrieved successfully')
+    @api.response(400, 'Invalid since, limit or entity')
+    @api.response(410, 'Changes after since were pruned from the log')
+    @api.param('since', 'Return the changes after this seq (the "next" of the previous page); default 0')
+    @api.param('limit', 'Changes per page (default 100, max 1000)')
+    @api.param('entity', 'Comma-separated kinds of entity: place, review, amenity, user')
+    def get(self):
+        """Everything created, updated or deleted since a given point, oldest first"""
+        # Start from the beginning, then keep passing back "next" until "has_more" is false:
+        # curl -X GET "http://localhost:5000/api/v1/changes/?since=0&limit=100&entity=place,review"
+        try:
+            since = int(request.args.get('since', 0))
+        except ValueError:
+            return {'error': 'Invalid since: must be a whole number'}, 400
+        try:
+            limit = parse_positive_int(request.args.get('limit'), CHANGES_PER_PAGE,
+                                       MAX_CHANGES_PER_PAGE, name='limit')
+        except ValueError as error:
+            return {'error': str(error)}, 400
+        entities = [name.strip() for name in request.args.get('entity', '').split(',') if name.strip()]
+        unknown = [name for name in entities if name not in CHANGE_ENTITIES]
+        if unknown:
+            return {'error': 'Invalid entity: {}. Allowed: {}'.format(
+                ', '.join(unknown), ', '.join(CHANGE_ENTITIES))}, 400
+
+        # The client is further behind than the log goes back (since=0 included, once
+        # anything was pruned): it has to reload everything
+        if since < facade.get_pruned_change_seq():
+            return {'error': 'Changes after {} are no longer kept: reload everything, then follow '
+                             'the feed from the latest seq'.format(since)}, 410
+
+        # One more than asked, to know whether another page follows
+        changes = facade.get_changes(since, limit + 1, entities)
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+
+        return {
+            'changes': [{
+                'seq': seq,
+                'entity': entity,
+                'id': entity_id,
+                'action': action,
+                'changed_at': changed_at.replace(tzinfo=timezone.utc).isoformat()
+            } for seq, entity, entity_id, action, changed_at in changes],
+            'next': changes[-1][0] if changes else since,
+            'has_more': has_more
+        }, 200
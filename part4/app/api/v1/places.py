@@ -1,7 +1,15 @@
+from flask import request
+from werkzeug.http import http_date
 from flask_restx import Namespace, Resource, fields
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 # from app.services.facade import HBnBFacade
 from app.services import facade
+from app.api.rate_limit import limiter
+from app.api.idempotency import idempotency
+from app.services.amenity_index import MATCH_ANY, MATCH_ALL
+from app.persistence.place_repository import SORT_OPTIONS
+from app.api.v1.query_params import (parse_id_list, missing_ids, parse_fields, parse_positive_int,
+                                     parse_float, parse_bbox, canonical_id)
 
 api = Namespace('places', description='Place operations')
 
@@ -40,6 +48,129 @@ place_model = api.model('Place', {
 
 # facade = HBnBFacade()
 
+# Sparse fieldsets: every field a client may ask for with ?fields=, and how to render it.
+# 'owner', 'amenities' and 'reviews' are relationships and are only loaded when asked for.
+place_field_getters = {
+    'id': lambda place: str(place.id),
+    'title': lambda place: place.title,
+    'description': lambda place: place.description,
+    'price': lambda place: place.price,
+    'latitude': lambda place: place.latitude,
+    'longitude': lambda place: place.longitude,
+    'owner_id': lambda place: place.owner_id,
+    'owner': lambda place: owner_output(place.owner_r),
+}
+PLACE_FIELDS = list(place_field_getters) + ['amenities', 'reviews']
+# The listing and multi-get don't load reviews: they come one page at a time with the place details
+LIST_PLACE_FIELDS = list(place_field_getters) + ['amenities']
+
+# Relationships that can be added to the place details with ?include=
+PLACE_INCLUDES = ['owner', 'amenities', 'reviews']
+REVIEWS_PER_PAGE = 20
+MAX_REVIEWS_PER_PAGE = 100
+PLACES_PER_PAGE = 20
+MAX_PLACES_PER_PAGE = 100
+
+# What the endpoints return when no ?fields= is given
+LIST_FIELDS = ['id', 'title', 'latitude', 'longitude', 'description', 'price', 'amenities']
+DETAIL_FIELDS = ['id', 'title', 'description', 'price', 'latitude', 'longitude', 'owner', 'amenities']
+
+def owner_output(owner):
+    """ The owner of a place as shown in the place details """
+    return {
+        'id': str(owner.id),
+        'first_name': owner.first_name,
+        'last_name': owner.last_name,
+        'email': owner.email
+    }
+
+def place_output(place, fields, amenities=None, reviews=None):
+    """
+    Only the requested fields of a place, so that columns and relationships
+    that weren't asked for are never loaded. `amenities` and `reviews` are pre-rendered.
+    """
+    output = {}
+    for field in fields:
+        if field == 'amenities':
+            output['amenities'] = amenities
+        elif field == 'reviews':
+            output['reviews'] = reviews
+        else:
+            output[field] = place_field_getters[field](place)
+    return output
+
+def snapshot_reader():
+    """
+    The read-only snapshot to answer this request from, or None to use the DB. Only
+    anonymous requests use it: a logged-in user gets to see their own writes right away,
+    and `Cache-Control: no-cache` asks for the current data (e.g. a page that missed
+    live updates and must not go back to older ones).
+    """
+    if request.headers.get('Authorization') or request.cache_control.no_cache:
+        return None
+    return facade.read_snapshot
+
+def snapshot_headers(exported_at, headers=None):
+    """ Headers of a response answered from the snapshot, with when it was exported """
+    return dict(headers or {}, **{'X-Snapshot-Exported-At': http_date(exported_at)})
+
+def record_output(record, fields, amenities=None, reviews=None):
+    """ Same as place_output(), for a place record of the snapshot """
+    output = {}
+    for field in fields:
+        if field == 'amenities':
+            output['amenities'] = amenities
+        elif field == 'reviews':
+            output['reviews'] = reviews
+        else:
+            output[field] = record[field]
+    return output
+
+def review_output(review):
+    """ A review about a place, along with who wrote it """
+    user = review.user_r if review.user_r else None
+    user_info = {
+        'id': str(user.id),
+        'first_name': user.first_name,
+        'last_name': user.last_name
+    } if user else {
+        'id': 'unknown',
+        'first_name': 'Unknown',
+        'last_name': 'User'
+    }
+
+    return {
+        'id': str(review.id),
+        'text': review.text,
+        'rating': review.rating,
+        'user_id': review.user_id,
+        'user': user_info
+    }
+
+def amenity_details(amenities):
+    """ [(id, name), ...] -> the list of amenity objects shown in place details """
+    return [{'id': str(amenity_id), 'name': amenity_name} for amenity_id, amenity_name in amenities]
+
+def parse_amenity_ids(amenities):
+    """
+    Amenities sent by a client, as ids or as {"id": ...} objects -> list of ids.
+    Raises ValueError if the list is malformed or names an amenity that doesn't exist.
+    """
+    if amenities is None:
+        return []
+    if not isinstance(amenities, list):
+        raise ValueError("amenities must be a list of amenity ids")
+
+    amenity_ids = []
+    for amenity in amenities:
+        amenity_id = amenity.get('id') if isinstance(amenity, dict) else amenity
+        if not isinstance(amenity_id, str):
+            raise ValueError("amenities must be a list of amenity ids")
+        if facade.get_amenity_name(amenity_id) is None:
+            raise ValueError("amenity does not exist: {}".format(amenity_id))
+        amenity_ids.append(amenity_id)
+    return amenity_ids
+
 @api.route('/')
 class PlaceList(Resource):
     @api.expect(place_model)
@@ -47,7 +178,14 @@ class PlaceList(Resource):
     @api.response(400, 'Invalid input data')
     @api.response(400, 'Setter validation failure')
     @api.response(403, 'Unauthorized action')
+    @api.response(409, 'Same Idempotency-Key still in progress')
+    @api.response(422, 'Idempotency-Key reused for another request')
+    @api.response(429, 'Too many requests')
+    @api.response(503, 'Server busy')
+    @api.header('Idempotency-Key', 'Optional: retries with the same key get the first response back')
     @jwt_required()
+    @idempotency.idempotent
+    @limiter.limit('write')
     def post(self):
 
         # Create the user
@@ -66,12 +204,18 @@ class PlaceList(Resource):
         # adding owner_id back in so that places_data still plays nice with the old code
         places_data['owner_id'] = current_user_id
 
-        wanted_keys_list = ['title', 'description', 'price', 'latitude', 'longitude', 'owner_id']
+        wanted_keys_list = ['title', 'description', 'price', 'latitude', 'longitude', 'owner_id', 'amenities']
 
         # Check whether the keys are present
         if not all(name in wanted_keys_list for name in places_data):
             return { 'error': "Invalid input data" }, 400
 
+        # Optional amenities, given as ids or as {"id": ...} objects; saved with the place
+        try:
+            amenity_ids = parse_amenity_ids(places_data.pop('amenities', None))
+        except ValueError as error:
+            return { 'error': "Invalid input data - {}".format(error) }, 400
+
         # check that user exists
         user = facade.get_user(str(places_data.get('owner_id')))
         if not user:
@@ -85,7 +229,7 @@ class PlaceList(Resource):
             # places_data['owner'] = user
             # del places_data['owner_id']
 
-            new_place = facade.create_place(places_data)
+            new_place = facade.create_place(places_data, amenity_ids)
         except ValueError as error:
             return { 'error': "Setter validation failure: {}".format(error) }, 400
 
@@ -96,74 +240,201 @@ class PlaceList(Resource):
             "price": new_place.price,
             'latitude': new_place.latitude,
             'longitude': new_place.longitude,
-            "owner_id": new_place.owner_id
+            "owner_id": new_place.owner_id,
+            'amenities': [str(amenity_id) for amenity_id in dict.fromkeys(amenity_ids)]
         }
         return output, 201
 
     @api.response(200, 'List of places retrieved successfully')
+    @api.response(400, 'Too many ids requested')
+    @api.response(400, 'Invalid fields')
+    @api.param('ids', 'Comma-separated place ids: fetch the details of several places in one request')
+    @api.param('fields', 'Comma-separated fields to return, e.g. id,title,price,latitude,longitude')
+    @api.param('min_price', 'Only places costing at least this much per night')
+    @api.param('max_price', 'Only places costing at most this much per night')
+    @api.param('bbox', 'Only places inside min_lat,min_lng,max_lat,max_lng')
+    @api.param('min_rating', 'Only places whose average rating is at least this')
+    @api.param('amenities', 'Comma-separated amenity names')
+    @api.param('amenities_match', "'any' (default) or 'all' of the amenities")
+    @api.param('sort', "'price' (cheapest first), '-price', 'created' (newest first) or 'rating' (best first)")
+    @api.param('page', 'Page number; when page or per_page is given the X-Total-Count header has the number of matches')
+    @api.param('per_page', 'Places per page (default 20, at most 100)')
     def get(self):
         """Retrieve a list of all places"""
-        all_places = facade.get_all_places()
+        # Multi-get: GET /api/v1/places/?ids=<id1>,<id2>,<id3>
+        # curl -X GET "http://localhost:5000/api/v1/places/?ids=<place_id>,<place_id>"
+        # Sparse fieldsets, e.g. for map markers:
+        # curl -X GET "http://localhost:5000/api/v1/places/?fields=id,title,price,latitude,longitude"
+        # Price range, sorting and paging are done by the DB (on the price / created_at indexes):
+        # curl -X GET "http://localhost:5000/api/v1/places/?min_price=50&max_price=100&sort=price&page=1&per_page=20"
+        # Map area, rating and amenity filters (then sorting and paging) are worked out in memory,
+        # and only the page is loaded:
+        # curl -X GET "http://localhost:5000/api/v1/places/?bbox=40.6,-74.1,40.9,-73.8&min_rating=4&amenities=WiFi"
+        try:
+            place_ids = parse_id_list(request.args.get('ids'))
+            default_fields = DETAIL_FIELDS if place_ids is not None else LIST_FIELDS
+            wanted_fields = parse_fields(request.args.get('fields'), LIST_PLACE_FIELDS, default_fields)
+            min_price = parse_float(request.args.get('min_price'), 'min_price')
+            max_price = parse_float(request.args.get('max_price'), 'max_price')
+            filters = {
+                'bbox': parse_bbox(request.args.get('bbox')),
+                'min_rating': parse_float(request.args.get('min_rating'), 'min_rating'),
+                'amenity_names': [name for name in request.args.get('amenities', '').split(',') if name.strip()],
+            }
+            page = per_page = None
+            if 'page' in request.args or 'per_page' in request.args:
+                page = parse_positive_int(request.args.get('page'), 1, name='page')
+                per_page = parse_positive_int(request.args.get('per_page'), PLACES_PER_PAGE,
+                                              MAX_PLACES_PER_PAGE, name='per_page')
+        except ValueError as error:
+            return {'error': str(error)}, 400
+
+        amenities_match = request.args.get('amenities_match', MATCH_ANY)
+        if amenities_match not in (MATCH_ANY, MATCH_ALL):
+            return {'error': "amenities_match must be 'any' or 'all'"}, 400
+        sort = request.args.get('sort')
+        if sort is not None and sort not in SORT_OPTIONS:
+            return {'error': "Invalid sort: must be one of {}".format(', '.join(SORT_OPTIONS))}, 400
+
+        reader = snapshot_reader()
+        if place_ids is not None and reader is not None:
+            # Only if every place is in the snapshot: one that isn't may be newer than it
+            exported_at = reader.exported_at()
+            records = reader.get_many(place_ids)
+            if records is not None:
+                return {
+                    'places': [record_output(record, wanted_fields, amenity_details(record['amenities']))
+                               for record in records],
+                    'missing': []
+                }, 200, snapshot_headers(exported_at)
+
+        if place_ids is not None:
+            # One IN query for the places and their owners, one for all their amenities
+            places = facade.get_places(place_ids, wanted_fields)
+            place_amenities = {}
+            if 'amenities' in wanted_fields:
+                place_amenities = facade.get_amenities_for_places([place.id for place in places])
+            return {
+                'places': [place_output(place, wanted_fields, amenity_details(place_amenities.get(place.id, [])))
+                           for place in places],
+                'missing': missing_ids(place_ids, places)
+            }, 200
+
+        filters = {name: value for name, value in filters.items() if value is not None and value != []}
+        if reader is not None and not filters and min_price is None and max_price is None and sort is None:
+            # The plain listing, in its default (id) order, straight from the snapshot
+            exported_at = reader.exported_at()
+            listing = reader.page((page - 1) * per_page if page else 0, per_page)
+            if listing is not None:
+                records, total = listing
+                output = [record_output(record, wanted_fields, [name for _, name in record['amenities']])
+                          for record in records]
+                if page is not None:
+                    return output, 200, snapshot_headers(exported_at, {'X-Total-Count': str(total)})
+                return output, 200, snapshot_headers(exported_at)
+
+        if filters:
+            # These filters, the sort and the paging are all worked out in the in-memory
+            # snapshot; only the places of the page are then loaded
+            page_ids, total = facade.filter_places_page(min_price, max_price, match=amenities_match, sort=sort,
+                                                        page=page, per_page=per_page, **filters)
+            all_places = facade.get_place_rows(page_ids, wanted_fields)
+        else:
+            all_places, total = facade.list_places(min_price, max_price, None, sort,
+                                                   page, per_page, wanted_fields)
         output = []
 
+        # One query for every place's amenity ids; the names come from the amenity catalog
+        place_amenities = {}
+        if 'amenities' in wanted_fields:
+            place_amenities = facade.get_amenities_for_places([place.id for place in all_places])
+
         for place in all_places:
             # For Part 4: What if we want to include the amenities of each place in the output?
+            # (For Part 4 the listing card also needs description and price - see LIST_FIELDS)
             amenities_list = []
-            all_amenities = facade.get_place_amenities(place.id)
-            for amenity in all_amenities:
-                amenities_list.append(amenity.name)
+            for amenity_id, amenity_name in place_amenities.get(place.id, []):
+                amenities_list.append(amenity_name)
 
-            output.append({
-                'id': str(place.id),
-                'title': place.title,
-                'latitude': place.latitude,
-                'longitude': place.longitude,
-
-                # For Part 4: additional data needed for Place listing Card
-                'description': place.description,
-                'price': place.price,
-                'amenities': amenities_list
-            })
+            output.append(place_output(place, wanted_fields, amenities_list))
 
+        if total is not None:
+            return output, 200, {'X-Total-Count': str(total)}
         return output, 200
 
 @api.route('/<place_id>')
 class PlaceResource(Resource):
     @api.response(200, 'Place details retrieved successfully')
+    @api.response(400, 'Invalid fields')
+    @api.response(400, 'Invalid include')
     @api.response(404, 'Place not found')
     @api.response(404, 'Place owner not found')
+    @api.param('fields', 'Comma-separated fields to return, e.g. id,title,price')
+    @api.param('include', 'Comma-separated relationships to add: owner, amenities, reviews')
+    @api.param('reviews_page', 'Page of reviews to include (default 1)')
+    @api.param('reviews_per_page', 'Reviews per page (default 20, max 100)')
     def get(self, place_id):
         """Get place details by ID"""
-        place = facade.get_place(place_id)
-        if not place:
-            return {'error': 'Place not found'}, 404
+        # Everything the place page needs in one request, from a fixed number of queries
+        # (place + owner, amenities, one page of reviews + writers, review count/average):
+        # curl -X GET "http://localhost:5000/api/v1/places/<place_id>?include=reviews,owner,amenities&reviews_page=1"
+        try:
+            wanted_fields = parse_fields(request.args.get('fields'), PLACE_FIELDS, DETAIL_FIELDS)
+            includes = parse_fields(request.args.get('include'), PLACE_INCLUDES, [])
+            reviews_page = parse_positive_int(request.args.get('reviews_page'), 1, name='reviews_page')
+            reviews_per_page = parse_positive_int(request.args.get('reviews_per_page'), REVIEWS_PER_PAGE,
+                                                  MAX_REVIEWS_PER_PAGE, name='reviews_per_page')
+        except ValueError as error:
+            return {'error': str(error)}, 400
+        wanted_fields = wanted_fields + [field for field in includes if field not in wanted_fields]
+        # The snapshot and get_places() hand places back under their canonical id
+        place_id = canonical_id(place_id)
+
+        reader = snapshot_reader()
+        exported_at = reader.exported_at() if reader is not None else None
+        record = reader.get(place_id) if reader is not None else None
+        if record is not None:
+            reviews = None
+            if 'reviews' in wanted_fields:
+                start = (reviews_page - 1) * reviews_per_page
+                reviews = {
+                    'items': record['reviews'][start:start + reviews_per_page],
+                    'page': reviews_page,
+                    'per_page': reviews_per_page,
+                    'total': record['review_count'],
+                    'average_rating': record['average_rating']
+                }
+            return (record_output(record, wanted_fields, amenity_details(record['amenities']), reviews), 200,
+                    snapshot_headers(exported_at))
 
-        owner = place.owner_r
-        if not owner:
-            return {'error': 'Place owner not found'}, 404
+        # Going through get_places() brings the owner along in the same query
+        places = facade.get_places([place_id], wanted_fields)
+        if not places:
+            return {'error': 'Place not found'}, 404
+        place = places[0]
 
-        amenities_list = []
-        for amenity in place.amenities_r:
-            amenities_list.append({
-                'id': str(amenity.id),
-                'name': amenity.name
-            })
+        if 'owner' in wanted_fields:
+            owner = place.owner_r
+            if not owner:
+                return {'error': 'Place owner not found'}, 404
+
+        amenities = []
+        if 'amenities' in wanted_fields:
+            amenities = facade.get_amenities_for_places([place.id])[place.id]
+
+        reviews = None
+        if 'reviews' in wanted_fields:
+            page_reviews, total, average_rating = facade.get_place_reviews_page(
+                place.id, reviews_page, reviews_per_page)
+            reviews = {
+                'items': [review_output(review) for review in page_reviews],
+                'page': reviews_page,
+                'per_page': reviews_per_page,
+                'total': total,
+                'average_rating': average_rating
+            }
 
-        output = {
-            'id': str(place.id),
-            'title': place.title,
-            'description': place.description,
-            'price': place.price,
-            'latitude': place.latitude,
-            'longitude': place.longitude,
-            'owner': {
-                'id': str(owner.id),
-                'first_name': owner.first_name,
-                'last_name': owner.last_name,
-                'email': owner.email
-            },
-            'amenities': amenities_list
-        }
+        output = place_output(place, wanted_fields, amenity_details(amenities), reviews)
 
         return output, 200
 
@@ -205,6 +476,64 @@ class PlaceResource(Resource):
 
         return {'error': 'Place not found'}, 404
 
+    @api.response(200, 'Place deleted successfully')
+    @api.response(403, 'Unauthorized action')
+    @api.response(404, 'Place not found')
+    @jwt_required()
+    def delete(self, place_id):
+        # curl -X DELETE "http://127.0.0.1:5000/api/v1/places/<place_id>" -H "Authorization: Bearer <token_goes_here>"
+
+        """Delete a place, with its reviews and amenity links"""
+        current_user_id = get_jwt_identity()
+        current_user = facade.get_user(current_user_id, ['is_admin'])
+
+        place = facade.get_place(place_id, ['owner_id'])
+        if not place:
+            return {'error': 'Place not found'}, 404
+        if not current_user or (not current_user.is_admin and place.owner_id != current_user_id):
+            return {'error': 'Unauthorized action'}, 403
+
+        facade.delete_place(place_id)
+        return {'message': 'Place deleted successfully'}, 200
+
+place_amenities_model = api.model('PlaceAmenities', {
+    'amenities': fields.List(fields.String, required=True,
+                             description='Ids of all the amenities the place should have')
+})
+
+@api.route('/<place_id>/amenities', '/<place_id>/amenities/')
+class PlaceAmenities(Resource):
+    @api.expect(place_amenities_model)
+    @api.response(200, 'Amenities updated successfully')
+    @api.response(400, 'Invalid input data')
+    @api.response(403, 'Unauthorized action')
+    @api.response(404, 'Place not found')
+    @jwt_required()
+    def put(self, place_id):
+        # curl -X PUT "http://127.0.0.1:5000/api/v1/places/<place_id>/amenities" -H "Content-Type: application/json" -H "Authorization: Bearer <token_goes_here>" -d '{"amenities": ["<amenity_id>", "<amenity_id>"]}'
+
+        """Replace the full set of amenities of a place"""
+        current_user_id = get_jwt_identity()
+        current_user = facade.get_user(current_user_id, ['is_admin'])
+
+        place = facade.get_place(place_id, ['owner_id'])
+        if not place:
+            return {'error': 'Place not found'}, 404
+        if not current_user or (not current_user.is_admin and place.owner_id != current_user_id):
+            return {'error': 'Unauthorized action'}, 403
+
+        payload = api.payload
+        if not isinstance(payload, dict) or list(payload) != ['amenities']:
+            return {'error': 'Invalid input data - expected {"amenities": [...]}'}, 400
+        try:
+            amenity_ids = parse_amenity_ids(payload['amenities'])
+        except ValueError as error:
+            return {'error': "Invalid input data - {}".format(error)}, 400
+
+        # Only the links that changed are written (one INSERT + one DELETE at most)
+        amenities = facade.set_place_amenities(place_id, amenity_ids)
+        return {'id': place_id, 'amenities': amenity_details(amenities)}, 200
+
 # Example endpoints to show how to use relationships
 @api.route('/<place_id>/<relation>/')
 class PlaceRelations(Resource):
@@ -219,20 +548,35 @@ class PlaceRelations(Resource):
 
         output = []
 
+        # Anonymous requests for a place of the snapshot are answered from it
+        reader = snapshot_reader()
+        exported_at = reader.exported_at() if reader is not None else None
+        record = reader.get(place_id) if reader is not None else None
+        if record is not None and relation in ("amenities", "reviews", "owner"):
+            if relation == "amenities":
+                if not record['amenities']:
+                    return {'error': 'Unable to retrieve Amenities linked to this property'}, 404
+                return amenity_details(record['amenities']), 200, snapshot_headers(exported_at)
+            if relation == "reviews":
+                if not record['reviews']:
+                    return {'error': 'Unable to retrieve Reviews written about this place'}, 404
+                return record['reviews'], 200, snapshot_headers(exported_at)
+            return record['owner'], 200, snapshot_headers(exported_at)
+
         # === AMENITIES ===
         if relation == "amenities":
-            # Manually add the place_id-to-amenity_id records in the DB. This is the fastest way to do it.
+            # Set them with PUT /api/v1/places/<place_id>/amenities (see PlaceAmenities)
 
             # Get the list of amenities that can be found in this place
             # curl -X GET http://localhost:5000/api/v1/places/<place_id>/amenities/
-            all_amenities = facade.get_place_amenities(place_id)
+            all_amenities = facade.get_amenities_for_places([place_id])[place_id]
             if not all_amenities:
                 return {'error': 'Unable to retrieve Amenities linked to this property'}, 404
 
-            for amenity in all_amenities:
+            for amenity_id, amenity_name in all_amenities:
                 output.append({
-                    'id': str(amenity.id),
-                    'name': amenity.name
+                    'id': str(amenity_id),
+                    'name': amenity_name
                 })
 
         # === REVIEWS ===
@@ -245,25 +589,8 @@ class PlaceRelations(Resource):
                 return {'error': 'Unable to retrieve Reviews written about this place'}, 404
 
             for review in all_reviews:
-                # Get user information for each review
-                user = review.user_r if review.user_r else None
-                user_info = {
-                    'id': str(user.id),
-                    'first_name': user.first_name,
-                    'last_name': user.last_name
-                } if user else {
-                    'id': 'unknown',
-                    'first_name': 'Unknown',
-                    'last_name': 'User'
-                }
-                
-                output.append({
-                    'id': str(review.id),
-                    'text': review.text,
-                    'rating': review.rating,
-                    'user_id': review.user_id,
-                    'user': user_info
-                })
+                # User information for each review (loaded together with the reviews)
+                output.append(review_output(review))
 
         # === OWNER ===
         if relation == "owner":
@@ -292,10 +619,7 @@ class PlaceSearch(Resource):
     def post(self):
         # Query the database based on the data passed in
         # curl -X POST "http://127.0.0.1:5000/api/v1/places/search" -H "Content-Type: application/json" -d '{ "name": "cozy", "price": "250", "amenities": ["wi-fi", "toilet"]}'
-
-        # --- IMPORTS ---
-        from sqlalchemy import text
-        from app.persistence import db_session
+        # curl -X POST "http://127.0.0.1:5000/api/v1/places/search" -H "Content-Type: application/json" -d '{ "name": "", "price": "0", "amenities": ["wi-fi", "pool"], "amenities_match": "all"}'
 
         search_data = api.payload
         # print(search_data)
@@ -303,96 +627,35 @@ class PlaceSearch(Resource):
         name = search_data['name'].strip()
         price = int(search_data['price'])
         amenities = search_data['amenities']
-
-        # --- Example query ---
-        # SELECT * FROM (
-        #     SELECT p.*, GROUP_CONCAT(a.name) AS amenities, GROUP_CONCAT(b.name) AS selected_amenities
-        #     FROM places p
-        #     LEFT JOIN place_amenity pa ON p.id = pa.place_id
-        #     LEFT JOIN amenities a ON pa.amenity_id  = a.id
-        #     LEFT JOIN (
-        #         SELECT * FROM amenities
-        #         WHERE amenities.name IN ('wi-fi', 'toilet')
-        #     ) b ON pa.amenity_id  = b.id
-        #     GROUP BY p.id
-        # ) as x
-        # WHERE (title LIKE "%cozy%" OR description LIKE "%cozy%") AND (price >= 250)
-
-        where_clause = ""
-        and_clause = ""
-        name_conditions = ""
-        price_conditions = ""
-        amenities_condition = ""
-        amenities_and_clause = ""
-        amenities_present_condition = ""
-
-        if len(name) > 0:
-            # add WHERE clause
-            if where_clause == "":
-                where_clause = "WHERE "
-            name_conditions = "(title LIKE \"%" + name + "%\" OR description LIKE \"%" + name + "%\")"
-
-        if price > 0:
-            # add WHERE clause or AND clause
-            if where_clause == "":
-                where_clause = "WHERE "
-            else:
-                and_clause = "AND "
-            price_conditions = "(price >= " + str(price) + ")"
-
-        if len(amenities) > 0:
-            # Assemble the comma-separated list
-            # 1. wrap each item in the list with inverted commas
-            amenities_list = []
-            for a in amenities:
-                amenities_list.append("'" + a + "'")
-
-            # 2. then turn it into a comma separated string
-            amenities_comma_list = ",".join(amenities_list)
-            amenities_condition = "WHERE amenities.name IN (" + amenities_comma_list + ")"
-
-            # 3. add a final clause in the WHERE
-            if where_clause == "":
-                where_clause = "WHERE "
-            else:
-                amenities_and_clause = "AND "
-            amenities_present_condition = "(selected_amenities != '')"
-
-        conditions = where_clause + name_conditions + and_clause + price_conditions + amenities_and_clause + amenities_present_condition
-
-        query = "SELECT * FROM ( \
-            SELECT p.*, GROUP_CONCAT(a.name) AS amenities, GROUP_CONCAT(b.name) AS selected_amenities \
-            FROM places p \
-            LEFT JOIN place_amenity pa ON p.id = pa.place_id \
-            LEFT JOIN amenities a ON pa.amenity_id  = a.id \
-            LEFT JOIN ( \
-                SELECT * FROM amenities \
-                " + amenities_condition + " \
-            ) b ON pa.amenity_id  = b.id \
-            GROUP BY p.id \
-        ) as x " + conditions
-
-        # print(query)
+        # "any" (default): places with at least one of the amenities, "all": places with every one
+        amenities_match = search_data.get('amenities_match', MATCH_ANY)
+        if amenities_match not in (MATCH_ANY, MATCH_ALL):
+            return {'error': "amenities_match must be 'any' or 'all'"}, 400
+
+        # --- What the search does ---
+        # Places whose title or description contain the words in name, that cost at least the
+        # price and that have at least one (or all) of the listed amenities, best match first.
+        # Everything is worked out in memory - the amenity catalog and index for the amenities,
+        # the place snapshot for the price, the BM25 text index for the words - and only the
+        # places that pass are loaded:
+        #
+        # SELECT * FROM places WHERE id IN (<ids of the matching places>)
+
+        all_places = facade.search_places(name, price, amenities, amenities_match)
+        place_amenities = facade.get_amenities_for_places([place.id for place in all_places])
 
         output = []
-        sql = text(query)
-        result = db_session.execute(sql)
-
-        # print(result)
-
-        for row in result:
-            amenities_array = []
-            if row.amenities:
-                amenities_array = row.amenities.split(",")
+        for place in all_places:
+            amenities_array = [amenity_name for amenity_id, amenity_name in place_amenities[place.id]]
 
             output.append({
-                "place_id": row.id,
-                "title": row.title,
-                "description": row.description,
-                "price": row.price,
-                "latitude": row.latitude,
-                "longitude": row.longitude,
-                "owner_id": row.owner_id,
+                "place_id": place.id,
+                "title": place.title,
+                "description": place.description,
+                "price": place.price,
+                "latitude": place.latitude,
+                "longitude": place.longitude,
+                "owner_id": place.owner_id,
                 "amenities": amenities_array
             })
 
@@ -0,0 +1,104 @@
+""" Helpers for parsing the query string parameters shared by the v1 endpoints """
+
+import uuid
+
+# Upper bound on how many entities a single multi-get may ask for
+MAX_IDS_PER_REQUEST = 100
+
+
+def canonical_id(value):
+    """
+    The id in the form the API hands out (lowercase, with dashes), however it was
+    written: 'A1B2...' and '{a1b2...}' name the same row. Anything that isn't a
+    UUID is returned as is (it can't match a row).
+    """
+    try:
+        return str(uuid.UUID(value))
+    except (ValueError, TypeError, AttributeError):
+        return value
+
+
+def parse_id_list(value):
+    """
+    Turns "a,b,c" into ['a', 'b', 'c'] (in canonical form, duplicates and blanks dropped).
+    Returns None when the parameter wasn't given at all.
+    Raises ValueError when too many ids are requested.
+    """
+    if value is None:
+        return None
+
+    ids = list(dict.fromkeys(canonical_id(item.strip()) for item in value.split(',') if item.strip()))
+    if len(ids) > MAX_IDS_PER_REQUEST:
+        raise ValueError("At most {} ids can be requested at once".format(MAX_IDS_PER_REQUEST))
+    return ids
+
+
+def missing_ids(requested_ids, found):
+    """ The requested ids that have no matching entity in found """
+    found_ids = {str(obj.id) for obj in found}
+    return [obj_id for obj_id in requested_ids if obj_id not in found_ids]
+
+
+def parse_fields(value, allowed, default):
+    """
+    Turns "id,title,price" into ['id', 'title', 'price'] for sparse fieldsets.
+    Returns `default` when the parameter wasn't given.
+    Raises ValueError for fields that the endpoint doesn't know about.
+    """
+    if value is None:
+        return default
+
+    fields = list(dict.fromkeys(item.strip() for item in value.split(',') if item.strip()))
+    unknown = [field for field in fields if field not in allowed]
+    if unknown or not fields:
+        raise ValueError("Invalid fields: {}. Allowed fields are: {}".format(
+            ', '.join(unknown) or '(none)', ', '.join(allowed)))
+    return fields
+
+
+def parse_positive_int(value, default, maximum=None, name='value'):
+    """
+    Parses paging parameters such as ?page=2. Returns `default` when not given,
+    clamps to `maximum` and raises ValueError for anything that isn't >= 1.
+    """
+    if value is None:
+        return default
+
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError("Invalid {}: must be a whole number".format(name))
+    if number < 1:
+        raise ValueError("Invalid {}: must be at least 1".format(name))
+    if maximum is not None:
+        number = min(number, maximum)
+    return number
+
+
+def parse_float(value, name='value'):
+    """ Parses numeric filters such as ?min_price=50. Returns None when not given """
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError("Invalid {}: must be a number".format(name))
+
+
+def parse_bbox(value):
+    """
+    Parses ?bbox=min_lat,min_lng,max_lat,max_lng into a tuple of 4 floats.
+    Returns None when not given.
+    """
+    if value is None:
+        return None
+
+    parts = value.split(',')
+    if len(parts) != 4:
+        raise ValueError("Invalid bbox: expected min_lat,min_lng,max_lat,max_lng")
+    min_latitude, min_longitude, max_latitude, max_longitude = (parse_float(part, 'bbox') for part in parts)
+    if None in (min_latitude, min_longitude, max_latitude, max_longitude):
+        raise ValueError("Invalid bbox: expected min_lat,min_lng,max_lat,max_lng")
+    if min_latitude > max_latitude or min_longitude > max_longitude:
+        raise ValueError("Invalid bbox: the minimums must not be above the maximums")
+    return min_latitude, min_longitude, max_latitude, max_longitude
@@ -1,7 +1,11 @@
+from flask import request
 from flask_restx import Namespace, Resource, fields
 from flask_jwt_extended import jwt_required, get_jwt_identity
 # from app.services.facade import HBnBFacade
 from app.services import facade
+from app.api.rate_limit import limiter
+from app.api.idempotency import idempotency
+from app.api.v1.query_params import parse_id_list, missing_ids, parse_fields
 
 api = Namespace('reviews', description='Review operations')
 
@@ -14,6 +18,18 @@ review_model = api.model('Review', {
 
 # facade = HBnBFacade()
 
+# Sparse fieldsets: the fields a client may ask for with ?fields=
+REVIEW_FIELDS = ['id', 'text', 'rating', 'user_id', 'place_id']
+LIST_FIELDS = ['id', 'text', 'rating']
+
+def review_output(review, fields):
+    """ Only the requested fields of a review """
+    output = {}
+    for field in fields:
+        value = getattr(review, field)
+        output[field] = str(value) if field == 'id' else value
+    return output
+
 @api.route('/')
 class ReviewList(Resource):
     @api.expect(review_model)
@@ -21,7 +37,14 @@ class ReviewList(Resource):
     @api.response(400, 'Invalid input data')
     @api.response(400, 'You cannot review your own place.')
     @api.response(400, 'You have already reviewed this place.')
+    @api.response(409, 'Same Idempotency-Key still in progress')
+    @api.response(422, 'Idempotency-Key reused for another request')
+    @api.response(429, 'Too many requests')
+    @api.response(503, 'Server busy')
+    @api.header('Idempotency-Key', 'Optional: retries with the same key get the first response back')
     @jwt_required()
+    @idempotency.idempotent
+    @limiter.limit('write')
     def post(self):
         # curl -X POST "http://127.0.0.1:5000/api/v1/reviews/" -H "Content-Type: application/json" -H "Authorization: Bearer <token_goes_here>" -d '{ "text": "Very dirty", "rating": 1, "place_id": "<place_id_goes_here>" }'
 
@@ -48,12 +71,8 @@ class ReviewList(Resource):
             return {'error': 'You cannot review your own place.'}, 400
 
         # check that this particular logged-in user hasn't already reviewed it before
-        # I have the worst possible way to do it, but it will work:
-        # Get ALL reviews, then search through them for user_id and place_id combo
-        all_reviews = facade.get_all_reviews()
-        for review in all_reviews:
-            if review.user_id == current_user_id and review.place_id == review_data['place_id']:
-                return { 'error': "You have already reviewed this place." }, 400
+        if facade.has_reviewed(current_user_id, review_data['place_id']):
+            return { 'error': "You have already reviewed this place." }, 400
 
         # finally, create the review
         new_review = None
@@ -70,37 +89,52 @@ class ReviewList(Resource):
         return {'id': str(new_review.id), 'message': 'Review created successfully'}, 201
 
     @api.response(200, 'List of reviews retrieved successfully')
+    @api.response(400, 'Too many ids requested')
+    @api.response(400, 'Invalid fields')
+    @api.param('ids', 'Comma-separated review ids: fetch several reviews in one request')
+    @api.param('fields', 'Comma-separated fields to return, e.g. id,rating')
     def get(self):
         """Retrieve a list of all reviews"""
-        all_reviews = facade.get_all_reviews()
+        # curl -X GET "http://localhost:5000/api/v1/reviews/?ids=<review_id>,<review_id>"
+        try:
+            review_ids = parse_id_list(request.args.get('ids'))
+            default_fields = REVIEW_FIELDS if review_ids is not None else LIST_FIELDS
+            wanted_fields = parse_fields(request.args.get('fields'), REVIEW_FIELDS, default_fields)
+        except ValueError as error:
+            return {'error': str(error)}, 400
+        if review_ids is not None:
+            reviews = facade.get_reviews(review_ids, wanted_fields)
+            return {
+                'reviews': [review_output(review, wanted_fields) for review in reviews],
+                'missing': missing_ids(review_ids, reviews)
+            }, 200
+
+        all_reviews = facade.list_reviews(wanted_fields)
         output = []
 
         for review in all_reviews:
-            output.append({
-                'id': str(review.id),
-                'text': review.text,
-                'rating': review.rating
-            })
+            output.append(review_output(review, wanted_fields))
 
         return output, 200
 
 @api.route('/<review_id>')
 class ReviewResource(Resource):
     @api.response(200, 'Review details retrieved successfully')
+    @api.response(400, 'Invalid fields')
     @api.response(404, 'Review not found')
+    @api.param('fields', 'Comma-separated fields to return, e.g. id,rating')
     def get(self, review_id):
         """Get review details by ID"""
-        review = facade.get_review(review_id)
+        try:
+            wanted_fields = parse_fields(request.args.get('fields'), REVIEW_FIELDS, REVIEW_FIELDS)
+        except ValueError as error:
+            return {'error': str(error)}, 400
+
+        review = facade.get_review(review_id, wanted_fields)
         if not review:
             return {'error': 'Review not found'}, 404
 
-        output = {
-            'id': str(review.id),
-            'text': review.text,
-            'rating': review.rating,
-            'user_id': review.user_id,
-            'place_id': review.place_id,
-        }
+        output = review_output(review, wanted_fields)
 
         return output, 200
 
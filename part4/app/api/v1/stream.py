@@ -0,0 +1,68 @@
+import json
+from flask import request, current_app, Response
+from flask_restx import Namespace, Resource
+from app.services import facade
+from app.api.v1.query_params import canonical_id
+from app.services.event_bus import ALL, DROPPED
+
+api = Namespace('stream', description='Live updates (Server-Sent Events)')
+
+# How long a browser waits before reconnecting after the stream ends
+RECONNECT_MS = 3000
+
+# Under WSGI, an open stream keeps the worker thread that serves it until the page
+# closes: a worker with N threads serves at most N streams, and nothing else once
+# they are all taken. STREAM_MAX_SUBSCRIBERS (HBNB_STREAM_MAX_SUBSCRIBERS) caps the
+# streams per worker and answers 503 beyond it; keep it below the worker's threads.
+
+
+def event_stream(subscription, heartbeat):
+    """
+    The text/event-stream body: one SSE message per event, a comment line when
+    nothing happened for `heartbeat` seconds (keeps proxies from closing the
+    connection), and the end of the stream if the subscriber gets dropped.
+    """
+    yield 'retry: {}\n\n'.format(RECONNECT_MS)
+    while True:
+        event = subscription.get(timeout=heartbeat)
+        if event is None:
+            yield ': heartbeat\n\n'
+            continue
+        if event is DROPPED:
+            # The page fell behind: it reconnects and reloads what it shows
+            yield 'event: dropped\ndata: {}\n\n'
+            return
+        event_id, event_type, data = event
+        yield 'id: {}\nevent: {}\ndata: {}\n\n'.format(event_id, event_type, json.dumps(data))
+
+
+@api.route('/')
+class Stream(Resource):
+    @api.response(200, 'Event stream (text/event-stream)')
+    @api.response(404, 'Place not found')
+    @api.response(503, 'Too many open streams')
+    @api.param('place_id', 'Only the changes of this place and its reviews (default: everything)')
+    def get(self):
+        """Stream place and review changes as they are committed"""
+        # In the browser: new EventSource('/api/v1/stream/?place_id=<place_id>')
+        # curl -N "http://localhost:5000/api/v1/stream/?place_id=<place_id>"
+        # Events are published under the canonical (lowercase) place id
+        place_id = request.args.get('place_id')
+        if place_id is not None:
+            place_id = canonical_id(place_id)
+        if place_id is not None and not facade.get_place(place_id, ['id']):
+            return {'error': 'Place not found'}, 404
+
+        subscription = facade.events.subscribe(place_id or ALL)
+        if subscription is None:
+            return {'error': 'Too many open streams, try again later'}, 503, {'Retry-After': '30'}
+
+        # No request context is kept for the generator: the DB session of this request
+        # is released right away instead of at the end of the stream
+        response = Response(event_stream(subscription, current_app.config['STREAM_HEARTBEAT']),
+                            mimetype='text/event-stream',
+                            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+        # The server closes the response however the stream ends, even when the client is
+        # gone before the first chunk (a generator's `finally` would never run then)
+        response.call_on_close(subscription.close)
+        return response
@@ -1,7 +1,10 @@
+from flask import request
 from flask_restx import Namespace, Resource, fields
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 # from app.services.facade import HBnBFacade
 from app.services import facade
+from app.api.idempotency import idempotency
+from app.api.v1.query_params import parse_id_list, missing_ids, parse_fields
 
 api = Namespace('users', description='User operations')
 
@@ -14,6 +17,17 @@ user_model = api.model('User', {
 
 # facade = HBnBFacade()
 
+# Sparse fieldsets: the fields a client may ask for with ?fields=
+USER_FIELDS = ['id', 'first_name', 'last_name', 'email']
+
+def user_output(user, fields):
+    """ Only the requested fields of a user """
+    output = {}
+    for field in fields:
+        value = getattr(user, field)
+        output[field] = str(value) if field == 'id' else value
+    return output
+
 @api.route('/')
 class UserList(Resource):
     @api.expect(user_model)
@@ -22,7 +36,11 @@ class UserList(Resource):
     @api.response(400, 'Invalid input data')
     @api.response(400, 'Setter validation failure')
     @api.response(403, 'Admin privileges required')
+    @api.response(409, 'Same Idempotency-Key still in progress')
+    @api.response(422, 'Idempotency-Key reused for another request')
+    @api.header('Idempotency-Key', 'Optional: retries with the same key get the first response back')
     @jwt_required()
+    @idempotency.idempotent
     def post(self):
         # Create the user
         # curl -X POST "http://127.0.0.1:5000/api/v1/users/" -H "Content-Type: application/json" -H "Authorization: Bearer <token_goes_here>" -d '{ "first_name": "John", "last_name": "Doe", "email": "john.doe@example.com", "password": "cowabunga", "is_admin": true}'
@@ -59,36 +77,56 @@ class UserList(Resource):
         return {'id': str(new_user.id), 'message': 'User created successfully'}, 201
 
     @api.response(200, 'Users list successfully retrieved')
+    @api.response(400, 'Too many ids requested')
+    @api.response(400, 'Invalid fields')
+    @api.param('ids', 'Comma-separated user ids: fetch several users in one request')
+    @api.param('fields', 'Comma-separated fields to return, e.g. id,first_name')
     def get(self):
         # curl -X GET http://localhost:5000/api/v1/users/
+        # curl -X GET "http://localhost:5000/api/v1/users/?ids=<user_id>,<user_id>"
+        # curl -X GET "http://localhost:5000/api/v1/users/?fields=id,first_name"
 
         """ Get list of all users """
-        all_users = facade.get_all_users()
+        try:
+            user_ids = parse_id_list(request.args.get('ids'))
+            wanted_fields = parse_fields(request.args.get('fields'), USER_FIELDS, USER_FIELDS)
+        except ValueError as error:
+            return {'error': str(error)}, 400
+        if user_ids is not None:
+            users = facade.get_users(user_ids, wanted_fields)
+            return {
+                'users': [user_output(user, wanted_fields) for user in users],
+                'missing': missing_ids(user_ids, users)
+            }, 200
+
+        all_users = facade.list_users(wanted_fields)
         output = []
         for user in all_users:
             # print(user)
-            output.append({
-                'id': str(user.id),
-                'first_name': user.first_name,
-                'last_name': user.last_name,
-                'email': user.email
-            })
+            output.append(user_output(user, wanted_fields))
 
         return output, 200
 
 @api.route('/<user_id>')
 class UserResource(Resource):
     @api.response(200, 'User details retrieved successfully')
+    @api.response(400, 'Invalid fields')
     @api.response(404, 'User not found')
+    @api.param('fields', 'Comma-separated fields to return, e.g. id,first_name')
     def get(self, user_id):
         # curl -X GET http://localhost:5000/api/v1/users/<user_id>
 
         """Get user details by ID"""
-        user = facade.get_user(user_id)
+        try:
+            wanted_fields = parse_fields(request.args.get('fields'), USER_FIELDS, USER_FIELDS)
+        except ValueError as error:
+            return {'error': str(error)}, 400
+
+        user = facade.get_user(user_id, wanted_fields)
         if not user:
             return {'error': 'User not found'}, 404
 
-        return {'id': str(user.id), 'first_name': user.first_name, 'last_name': user.last_name, 'email': user.email}, 200
+        return user_output(user, wanted_fields), 200
 
     @api.expect(user_model)
     @api.response(200, 'User details updated successfully')
@@ -179,18 +217,45 @@ class UserResource(Resource):
         return {'message': 'User deleted successfully'}, 200
 
 
+@api.route('/<user_id>/dashboard')
+class UserDashboard(Resource):
+    @api.response(200, 'Dashboard retrieved successfully')
+    @api.response(403, 'Unauthorized action')
+    @api.response(404, 'User not found')
+    @jwt_required()
+    def get(self, user_id):
+        # curl -X GET http://localhost:5000/api/v1/users/<user_id>/dashboard -H "Authorization: Bearer <token_goes_here>"
+
+        """Stats of every place the user hosts: review count, average rating, latest review, amenity count"""
+        current_user_id = get_jwt_identity()
+        if user_id != current_user_id:
+            current_user = facade.get_user(current_user_id, ['is_admin'])
+            if not current_user or not current_user.is_admin:
+                return {'error': 'Unauthorized action'}, 403
+
+        # Computed with one aggregate query, then cached until the user's places or their reviews change
+        dashboard = facade.get_host_dashboard(user_id)
+        if dashboard is None:
+            return {'error': 'User not found'}, 404
+        return dashboard, 200
+
+
 # Example endpoints to show how to use relationships
 # I'm calling it UserRelations because I can't think of a better name
 @api.route('/<user_id>/<relation>/')
 class UserRelations(Resource):
     @api.response(404, 'Unable to retrieve Places owned by specified user')
     @api.response(404, 'Unable to retrieve Reviews written by specified user')
+    @api.response(404, 'Unknown relation')
     def get(self, user_id, relation):
         """
         Depending on the term used in <relation>, we either retrieve 
         the Places owned by the User, or the Reviews they wrote
         """
 
+        if relation not in ('places', 'reviews'):
+            return {'error': 'Unknown relation: {}'.format(relation)}, 404
+
         output = []
 
         # === PLACES ===
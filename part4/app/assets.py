@@ -0,0 +1,192 @@
+""" The frontend: built into fingerprinted, precompressed files and served by the app itself """
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+
+try:
+    import brotli
+except ImportError:
+    # Optional: without it the build only writes the .gz copies
+    brotli = None
+
+FRONTEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'frontend')
+MANIFEST = 'manifest.json'
+
+# Fingerprinted files are served under this prefix and never change
+ASSETS_PREFIX = 'assets/'
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Content types worth compressing (images are compressed already)
+COMPRESSIBLE = ('.html', '.css', '.js', '.svg', '.json', '.txt')
+
+# Content-Encoding -> suffix of the precompressed copy, in order of preference
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def _compressors():
+    if brotli is not None:
+        yield 'br', lambda data: brotli.compress(data, quality=11)
+    # mtime=0 keeps the output the same from one build to the next
+    yield 'gzip', lambda data: gzip.compress(data, 9, mtime=0)
+
+
+def _asset_names(source):
+    """ Images first, then the stylesheet and the script that refer to them """
+    images = sorted(
+        'images/' + name for name in os.listdir(os.path.join(source, 'images'))
+        if not name.startswith('.'))
+    return images + [name for name in ('styles.css', 'scripts.js') if os.path.exists(os.path.join(source, name))]
+
+
+def _page_names(source):
+    return sorted(name for name in os.listdir(source) if name.endswith('.html'))
+
+
+def rewrite(text, urls):
+    """ Points the quoted (or url(...)) references to the assets in `urls` at their fingerprinted URLs """
+    if not urls:
+        return text
+    pattern = re.compile(r'(?<=["\'(])(?:\./)?({})(?=["\')])'.format(
+        '|'.join(re.escape(name) for name in sorted(urls, key=len, reverse=True))))
+    return pattern.sub(lambda match: urls[match.group(1)], text)
+
+
+def build(source=FRONTEND_DIR, target=None):
+    """
+    Writes the frontend in `source` to `target` (default: <source>/dist):
+
+    - every asset as assets/<name>.<content hash>.<ext>, so its URL changes
+      whenever its content does and it can be cached forever
+    - the pages, unhashed, with their references to the assets rewritten
+    - a .br (when the brotli module is installed) and a .gz copy of every
+      text file, so nothing is compressed while serving
+    - manifest.json, listing every file with its ETag and its encodings
+
+    The new build replaces the old one at once. Returns the manifest.
+    """
+    target = target or os.path.join(source, 'dist')
+    staging = target + '.tmp'
+    shutil.rmtree(staging, ignore_errors=True)
+    urls = {}
+    files = {}
+
+    def emit(name, data, immutable):
+        path = os.path.join(staging, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(data)
+
+        encodings = []
+        if name.endswith(COMPRESSIBLE):
+            for encoding, compress in _compressors():
+                packed = compress(data)
+                if len(packed) < len(data):
+                    with open(path + SUFFIXES[encoding], 'wb') as file:
+                        file.write(packed)
+                    encodings.append(encoding)
+        files[name] = {'etag': _digest(data), 'encodings': encodings, 'immutable': immutable}
+
+    for name in _asset_names(source):
+        with open(os.path.join(source, name), 'rb') as file:
+            data = file.read()
+        if name.endswith(COMPRESSIBLE):
+            data = rewrite(data.decode('utf-8'), urls).encode('utf-8')
+        stem, extension = os.path.splitext(name)
+        hashed = '{}{}.{}{}'.format(ASSETS_PREFIX, stem, _digest(data)[:10], extension)
+        emit(hashed, data, True)
+        urls[name] = '/' + hashed
+
+    for name in _page_names(source):
+        with open(os.path.join(source, name), encoding='utf-8') as file:
+            emit(name, rewrite(file.read(), urls).encode('utf-8'), False)
+
+    manifest = {'assets': urls, 'files': files}
+    with open(os.path.join(staging, MANIFEST), 'w') as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+
+    previous = target + '.old'
+    shutil.rmtree(previous, ignore_errors=True)
+    if os.path.exists(target):
+        os.rename(target, previous)
+    os.rename(staging, target)
+    shutil.rmtree(previous, ignore_errors=True)
+    return manifest
+
+
+def load_manifest(target):
+    """ The manifest of the build in `target`, or None if it wasn't built """
+    try:
+        with open(os.path.join(target, MANIFEST)) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def source_files(source=FRONTEND_DIR):
+    """ The unbuilt frontend as manifest entries: same paths, no compression, revalidated on every load """
+    entry = {'etag': None, 'encodings': [], 'immutable': False}
+    return {name: dict(entry) for name in _asset_names(source) + _page_names(source)}
+
+
+def send(root, name, entry):
+    """ Sends `name` from `root`, precompressed if the client accepts it, with the caching headers of its entry """
+    from flask import request, send_file
+
+    encoding = request.accept_encodings.best_match(entry['encodings'] + ['identity'], default='identity')
+    path = os.path.join(root, name)
+    etag = entry['etag']
+    if encoding in SUFFIXES:
+        path += SUFFIXES[encoding]
+        # Each encoding is a different representation, so it gets its own ETag
+        etag = etag and '{}-{}'.format(etag, encoding)
+
+    response = send_file(path, mimetype=mimetypes.guess_type(name)[0], etag=etag or True, conditional=True,
+                         max_age=IMMUTABLE_MAX_AGE if entry['immutable'] else None)
+    if entry['immutable']:
+        response.cache_control.immutable = True
+    else:
+        # Cached, but checked (cheaply, with If-None-Match) before every use
+        response.cache_control.no_cache = True
+    if entry['encodings']:
+        response.vary.add('Accept-Encoding')
+    if encoding in SUFFIXES and response.status_code != 304:
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_app(app, index=False):
+    """
+    Serves the frontend from the build in ASSETS_DIR (see build_assets.py), or
+    straight from the frontend/ sources if it wasn't built. With `index`, '/'
+    serves index.html too.
+    """
+    from flask import Blueprint
+
+    manifest = load_manifest(app.config['ASSETS_DIR'])
+    if manifest is None:
+        root, files = FRONTEND_DIR, source_files()
+        app.logger.info("No frontend build in %s, serving the sources uncompressed", app.config['ASSETS_DIR'])
+    else:
+        root, files = app.config['ASSETS_DIR'], manifest['files']
+
+    frontend = Blueprint('frontend', __name__)
+
+    def view(name):
+        return lambda: send(root, name, files[name])
+
+    # One rule per file, so that only the files of the build can be requested
+    for name in files:
+        frontend.add_url_rule('/' + name, endpoint=name.replace('.', '_'), view_func=view(name))
+    if index and 'index.html' in files:
+        frontend.add_url_rule('/', endpoint='index', view_func=view('index.html'))
+
+    app.register_blueprint(frontend)
@@ -1,7 +1,7 @@
 """ Amenity model """
 
 from app.persistence import Base
-import uuid
+from app.models.types import UUIDBinary, uuid7
 from datetime import datetime
 from sqlalchemy import Column, String, DateTime, Table, ForeignKey
 from sqlalchemy.orm import relationship
@@ -12,7 +12,7 @@ class Amenity(Base):
     """ Amenity class """
     __tablename__ = 'amenities'
 
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(UUIDBinary(), primary_key=True, default=uuid7)
     created_at = Column(DateTime, nullable=False, default=datetime.now())
     updated_at = Column(DateTime, nullable=False, default=datetime.now())
     _name = Column("name", String(50), nullable=False)
@@ -22,7 +22,7 @@ class Amenity(Base):
         if name is None:
             raise ValueError("Required attributes not specified!")
 
-        self.id = str(uuid.uuid4())
+        self.id = uuid7()
         self.created_at = datetime.now()
         self.updated_at = datetime.now()
         self.name = name
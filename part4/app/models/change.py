@@ -0,0 +1,42 @@
+""" Change model: one row of the change log """
+
+from app.persistence import Base
+from app.models.types import UUIDBinary
+from sqlalchemy import Column, String, DateTime, Integer, BigInteger, Index
+from app.persistence.change_log import utcnow
+
+
+class Change(Base):
+    """
+    Something was added, updated or deleted. Written by the repositories in the same
+    transaction as the change itself; `seq` orders the log and is the feed's cursor.
+    """
+    __tablename__ = 'changes'
+    # GET /changes?entity= reads one kind of entity after a given seq
+    __table_args__ = (
+        Index('idx_changes_entity_seq', 'entity', 'seq'),
+        # Pruning deletes by age
+        Index('idx_changes_changed_at', 'changed_at'),
+        # Never hand out a seq again, even once the newest changes were pruned
+        {'sqlite_autoincrement': True},
+    )
+
+    # SQLite only auto-increments an INTEGER PRIMARY KEY
+    seq = Column(BigInteger().with_variant(Integer, 'sqlite'), primary_key=True, autoincrement=True)
+    entity = Column(String(20), nullable=False)
+    entity_id = Column(UUIDBinary(), nullable=False)
+    action = Column(String(10), nullable=False)
+    changed_at = Column(DateTime, nullable=False, default=utcnow)  # UTC
+
+
+class ChangeLogState(Base):
+    """
+    How far the change log was pruned: every change up to `pruned_seq` is gone. One
+    row (id 1), raised by change_log.prune(). Seqs can have gaps (rolled-back inserts,
+    auto_increment_increment), so this is what readers' cursors are compared with,
+    not the oldest seq left.
+    """
+    __tablename__ = 'change_log_state'
+
+    id = Column(Integer, primary_key=True)
+    pruned_seq = Column(BigInteger, nullable=False, default=0)
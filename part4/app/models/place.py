@@ -1,25 +1,30 @@
 """ Place model """
 
 from app.persistence import Base
-import uuid
+from app.models.types import UUIDBinary, uuid7
 from datetime import datetime
 from app.models.user import User
-from sqlalchemy import Column, String, Float, Text, DateTime, Table, ForeignKey
+from sqlalchemy import Column, String, Float, Text, DateTime, Table, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
 # define the many-to-many table
 place_amenity = Table(
     'place_amenity',
     Base.metadata,
-    Column('place_id', String(60), ForeignKey('places.id'), primary_key=True),
-    Column('amenity_id', String(60), ForeignKey('amenities.id'), primary_key=True)
+    Column('place_id', UUIDBinary(), ForeignKey('places.id', ondelete='CASCADE'), primary_key=True),
+    Column('amenity_id', UUIDBinary(), ForeignKey('amenities.id', ondelete='CASCADE'), primary_key=True)
 )
 
 class Place(Base):
     """ Place class """
     __tablename__ = 'places'
+    # The listing filters on price and sorts on price / created_at (see PlaceRepository.list_places)
+    __table_args__ = (
+        Index('idx_places_price', 'price'),
+        Index('idx_places_created_at', 'created_at'),
+    )
 
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(UUIDBinary(), primary_key=True, default=uuid7)
     created_at = Column(DateTime, nullable=False, default=datetime.now())
     updated_at = Column(DateTime, nullable=False, default=datetime.now())
     _title = Column("title", String(100), nullable=False)
@@ -27,7 +32,7 @@ class Place(Base):
     _price = Column("price", Float, nullable=False)
     _latitude = Column("latitude", Float, nullable=False)
     _longitude = Column("longitude", Float, nullable=False)
-    _owner_id = Column("owner_id", String(60), ForeignKey('users.id'), nullable=False)
+    _owner_id = Column("owner_id", UUIDBinary(), ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     amenities_r = relationship("Amenity", secondary=place_amenity, back_populates = 'places_r')
     reviews_r = relationship("Review", back_populates="place_r")
     owner_r = relationship("User", back_populates="properties_r")
@@ -36,7 +41,7 @@ class Place(Base):
         if title is None or description is None or price is None or latitude is None or longitude is None or owner_id is None:
             raise ValueError("Required attributes not specified!")
 
-        self.id = str(uuid.uuid4())
+        self.id = uuid7()
         self.created_at = datetime.now()
         self.updated_at = datetime.now()
         self.title = title
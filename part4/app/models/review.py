@@ -1,22 +1,22 @@
 """ Review model """
 
 from app.persistence import Base
-import uuid
+from app.models.types import UUIDBinary, uuid7
 from datetime import datetime
-from sqlalchemy import Column, String, Integer, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, Text, DateTime, ForeignKey
 from sqlalchemy.orm import relationship
 
 class Review(Base):
     """ Place class """
     __tablename__ = 'reviews'
 
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(UUIDBinary(), primary_key=True, default=uuid7)
     created_at = Column(DateTime, nullable=False, default=datetime.now())
     updated_at = Column(DateTime, nullable=False, default=datetime.now())
     _text = Column("text", Text, nullable=False)
     _rating = Column("rating", Integer, nullable=False)
-    _place_id = Column("place_id", String(60), ForeignKey('places.id'), nullable=False)
-    _user_id = Column("user_id", String(60), ForeignKey('users.id'), nullable=False)
+    _place_id = Column("place_id", UUIDBinary(), ForeignKey('places.id', ondelete='CASCADE'), nullable=False)
+    _user_id = Column("user_id", UUIDBinary(), ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     place_r = relationship("Place", back_populates="reviews_r")
     user_r = relationship("User", back_populates="reviews_r")
 
@@ -24,7 +24,7 @@ class Review(Base):
         if text is None or rating is None or place_id is None or user_id is None:
             raise ValueError("Required attributes not specified!")
 
-        self.id = str(uuid.uuid4())
+        self.id = uuid7()
         self.created_at = datetime.now()
         self.updated_at = datetime.now()
         self.text = text
@@ -1,7 +1,7 @@
 """ User model """
 
 from app.persistence import Base
-import uuid
+from app.models.types import UUIDBinary, uuid7
 import re
 from datetime import datetime
 from flask_bcrypt import Bcrypt
@@ -17,7 +17,7 @@ class User(Base):
     # Remember: if you have getters & setters for any of the attributes
     # you can't use the same name for the attributes themselves
 
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(UUIDBinary(), primary_key=True, default=uuid7)
     created_at = Column(DateTime, nullable=False, default=datetime.now())
     updated_at = Column(DateTime, nullable=False, default=datetime.now())
     _first_name = Column("first_name", String(50), nullable=False)
@@ -35,7 +35,7 @@ class User(Base):
         if first_name is None or last_name is None or email is None:
             raise ValueError("Required attributes not specified!")
 
-        self.id = str(uuid.uuid4())
+        self.id = uuid7()
         self.created_at = datetime.now()
         self.updated_at = datetime.now()
         self.first_name = first_name
@@ -2,6 +2,7 @@ from os import getenv
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy import create_engine, text, select
 from sqlalchemy.orm import scoped_session, sessionmaker
+from app.persistence import query_monitor, routing, session_scope
 
 # Hardcoded credentials - PLEASE DON'T DO THIS IN PRODUCTION
 USER = "hbnb_evo_2"
@@ -11,10 +12,45 @@ DB = "hbnb_evo_2_db"
 
 Base = declarative_base()
 
-engine = create_engine('mysql+pymysql://{}:{}@{}/{}'.format(USER, PWD, HOST, DB))
-Base.metadata.create_all(engine)
+# Set HBNB_DATABASE_URL to point at another DB (e.g. a SQLite file for tests)
+DATABASE_URL = getenv('HBNB_DATABASE_URL', 'mysql+pymysql://{}:{}@{}/{}'.format(USER, PWD, HOST, DB))
+
+# Optional read replicas, comma-separated URLs. SELECTs are spread over them; writes, and
+# reads in the HBNB_REPLICA_LAG seconds after a write, go to the primary (see routing.py)
+REPLICA_URLS = [url.strip() for url in getenv('HBNB_REPLICA_URLS', '').split(',') if url.strip()]
+REPLICA_LAG = float(getenv('HBNB_REPLICA_LAG', '2'))
+
+# Optional cap on the number of objects a session keeps loaded (0 = no cap), for batch jobs
+# that work through many rows in one session; trimmed on every commit (see session_scope.py)
+MAX_IDENTITY_MAP = int(getenv('HBNB_MAX_IDENTITY_MAP', '0'))
+
+# create_engine() doesn't connect - the first query opens the first pooled connection
+engine = create_engine(DATABASE_URL)
+replica_engines = [create_engine(url) for url in REPLICA_URLS]
+router = routing.Router(engine, replica_engines, REPLICA_LAG)
+
 session_factory = sessionmaker(
-    bind=engine, expire_on_commit=False)
+    class_=routing.RoutingSession, router=router, bind=engine, expire_on_commit=False)
 session = scoped_session(session_factory)
+routing.install(router, session_factory)
+session_scope.install(session_factory, MAX_IDENTITY_MAP)
+
+# Count queries and lazy loads so that N+1 patterns can be flagged
+query_monitor.install(engine, session_factory, replica_engines)
+
+# One session per thread (the scoped_session proxies every call to it). Web requests drop
+# theirs when they end (see session_scope.init_app), so nothing a request loaded outlives it
+db_session = session
+
+
+def init_db():
+    """ Creates any missing tables. Called by the bootstrap step, never on import """
+    # The models must be imported so that their tables are registered on Base.metadata
+    import app.models.user
+    import app.models.place
+    import app.models.review
+    import app.models.amenity
+    import app.models.change
+
+    Base.metadata.create_all(engine)
 
-db_session = session()
@@ -0,0 +1,12 @@
+from sqlalchemy import select
+from app.models.amenity import Amenity
+from app.persistence import db_session
+from app.persistence.repository import SQLAlchemyRepository
+
+class AmenityRepository(SQLAlchemyRepository):
+    def __init__(self):
+        super().__init__(Amenity)
+
+    def get_catalog_rows(self):
+        # Only (id, name) pairs - no ORM objects are built for the catalog
+        return db_session.execute(select(Amenity.id, Amenity._name)).all()
@@ -0,0 +1,116 @@
+""" Change log: what was added, updated or deleted, in order, for clients that sync deltas """
+
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, insert, update, delete, func
+from app.persistence import db_session
+
+# Actions as they appear in the log (the repositories call them add / update / delete)
+ACTIONS = {'add': 'create', 'update': 'update', 'delete': 'delete'}
+
+# seq is handed out when a row is inserted, but transactions can commit out of that
+# order: a change is only read once it is this many seconds old, by which time every
+# transaction that logged a lower seq is expected to have committed (or rolled back).
+# Set with init_app (CHANGE_FEED_LAG); 0 when the DB has one writer at a time.
+VISIBILITY_LAG = float(os.getenv('HBNB_CHANGE_FEED_LAG', '2'))
+
+# Changes older than this are pruned, once every PRUNE_EVERY logged writes per worker
+RETENTION = timedelta(days=int(os.getenv('HBNB_CHANGE_LOG_RETENTION_DAYS', '30')))
+PRUNE_EVERY = 1000
+
+_writes = 0
+_writes_lock = threading.Lock()
+
+
+def init_app(app):
+    global VISIBILITY_LAG
+    VISIBILITY_LAG = app.config.get('CHANGE_FEED_LAG', VISIBILITY_LAG)
+
+
+def utcnow():
+    """ Current UTC time, naive like the other DateTime columns """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def record(model, action, obj_ids):
+    """
+    Logs `action` for every id, with one INSERT into the current transaction:
+    the log rows are committed (or rolled back) together with the change itself
+    """
+    from app.models.change import Change
+    global _writes
+
+    if not obj_ids:
+        return
+    entity = model.__name__.lower()
+    changed_at = utcnow()
+    db_session.execute(insert(Change), [
+        {'entity': entity, 'entity_id': obj_id, 'action': ACTIONS[action], 'changed_at': changed_at}
+        for obj_id in obj_ids])
+
+    with _writes_lock:
+        _writes += 1
+        prune_now = _writes % PRUNE_EVERY == 0
+    if prune_now:
+        prune(changed_at - RETENTION)
+
+
+def prune(before):
+    """
+    Deletes the changes logged before `before` (UTC), and everything with a lower seq,
+    then records the highest seq deleted: readers whose cursor is below it have to resync
+    """
+    from app.models.change import Change, ChangeLogState
+
+    up_to = db_session.execute(select(func.max(Change.seq)).where(Change.changed_at < before)).scalar()
+    if up_to is None:
+        return
+    db_session.execute(delete(Change).where(Change.seq <= up_to),
+                       execution_options={'synchronize_session': False})
+
+    if db_session.execute(select(ChangeLogState.id).where(ChangeLogState.id == 1)).scalar() is None:
+        db_session.execute(insert(ChangeLogState).values(id=1, pruned_seq=up_to))
+    else:
+        # Never lowered, should a worker with an older `before` prune at the same time
+        db_session.execute(update(ChangeLogState)
+                           .where(ChangeLogState.id == 1, ChangeLogState.pruned_seq < up_to)
+                           .values(pruned_seq=up_to),
+                           execution_options={'synchronize_session': False})
+
+
+def pruned_seq():
+    """ Every change up to this seq was pruned (0 if none ever was) """
+    from app.models.change import ChangeLogState
+
+    return db_session.execute(select(ChangeLogState.pruned_seq).where(ChangeLogState.id == 1)).scalar() or 0
+
+
+def settled_seq(lag=None):
+    """
+    The highest seq that readers can move past without missing anything: that of
+    the newest change logged at least `lag` seconds ago (0 if none). Walks the
+    primary key down from the top, so it only reads the changes of the last `lag`.
+    """
+    from app.models.change import Change
+
+    lag = VISIBILITY_LAG if lag is None else lag
+    query = select(Change.seq)
+    if lag:
+        query = query.where(Change.changed_at <= utcnow() - timedelta(seconds=lag))
+    return db_session.execute(query.order_by(Change.seq.desc()).limit(1)).scalar() or 0
+
+
+def read(since=0, limit=100, entities=None):
+    """
+    Up to `limit` changes with a seq above `since`, oldest first, optionally of some
+    entities only. Nothing above the settled seq is returned, so a reader never
+    moves its cursor past a change that is yet to commit.
+    """
+    from app.models.change import Change
+
+    query = select(Change.seq, Change.entity, Change.entity_id, Change.action, Change.changed_at) \
+        .where(Change.seq > since, Change.seq <= settled_seq())
+    if entities:
+        query = query.where(Change.entity.in_(entities))
+    return db_session.execute(query.order_by(Change.seq).limit(limit)).all()
@@ -0,0 +1,201 @@
+from collections import namedtuple
+from sqlalchemy import select, func
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.util import identity_key
+from app.models.amenity import Amenity
+from app.models.place import Place, place_amenity
+from app.models.review import Review
+from app.models.user import User
+from app.persistence import db_session, unit_of_work, change_log
+from app.persistence.repository import SQLAlchemyRepository
+
+# ?sort= of the listing -> ORDER BY. Each one is served by an index (or by the reviews
+# aggregate for 'rating'), and the id breaks ties so that pages never overlap.
+PLACE_SORTS = {
+    'price': Place._price.asc(),
+    '-price': Place._price.desc(),
+    'created': Place.created_at.desc(),
+}
+SORT_OPTIONS = list(PLACE_SORTS) + ['rating']
+
+# The owner that comes along with a listing row when ?fields= asks for it
+OwnerRow = namedtuple('OwnerRow', ['id', 'first_name', 'last_name', 'email'])
+
+class PlaceRepository(SQLAlchemyRepository):
+    def __init__(self):
+        super().__init__(Place)
+
+    def get_many(self, obj_ids, *options, fields=None):
+        # The owner is usually shown with a place, so it comes along in the same query
+        if fields is None or 'owner' in fields:
+            options = (joinedload(Place.owner_r),) + options
+        return super().get_many(obj_ids, *options, fields=fields)
+
+    def get_amenity_ids(self, place_ids):
+        """ Returns {place_id: [amenity_id, ...]} for all the given places in one query """
+        amenity_ids = {place_id: [] for place_id in place_ids}
+        if not amenity_ids:
+            return amenity_ids
+
+        rows = db_session.execute(
+            select(place_amenity.c.place_id, place_amenity.c.amenity_id)
+            .where(place_amenity.c.place_id.in_(list(amenity_ids)))
+            # Same order as in the snapshot (see data_snapshot.export)
+            .order_by(place_amenity.c.place_id, place_amenity.c.amenity_id)
+        )
+        for place_id, amenity_id in rows:
+            amenity_ids[place_id].append(amenity_id)
+        return amenity_ids
+
+    def get_snapshot_rows(self, place_ids=None):
+        """ (id, price, latitude, longitude, created_at) of every place, or of every one of place_ids """
+        query = select(Place.id, Place._price, Place._latitude, Place._longitude, Place.created_at)
+        if place_ids is not None:
+            query = query.where(Place.id.in_(list(place_ids)))
+        return db_session.execute(query).all()
+
+    def get_text_rows(self, place_ids=None):
+        """ (id, title, description) of every place, or of every one of place_ids """
+        query = select(Place.id, Place._title, Place._description)
+        if place_ids is not None:
+            query = query.where(Place.id.in_(list(place_ids)))
+        return db_session.execute(query).all()
+
+    def get_change_marker(self):
+        """ (number of places, latest updated_at): changes whenever places are added, updated or deleted """
+        return db_session.execute(select(func.count(Place.id), func.max(Place.updated_at))).one()
+
+    def get_amenity_links(self):
+        """ Every (place_id, amenity_id) pair in place_amenity, in order """
+        return db_session.execute(select(place_amenity.c.place_id, place_amenity.c.amenity_id)
+                                  .order_by(place_amenity.c.place_id, place_amenity.c.amenity_id)).all()
+
+    def get_host_stats(self, owner_id):
+        """
+        One row per place of the owner - id, title, price, review_count, average_rating,
+        latest_review_at, amenity_count - in a single query. Reviews and amenity links are
+        each aggregated with a GROUP BY before being joined, so neither multiplies the other.
+        """
+        owned = select(Place.id).where(Place._owner_id == owner_id)
+        reviews = (select(Review._place_id.label('place_id'),
+                          func.count(Review.id).label('review_count'),
+                          func.avg(Review._rating).label('average_rating'),
+                          func.max(Review.created_at).label('latest_review_at'))
+                   .where(Review._place_id.in_(owned))
+                   .group_by(Review._place_id)
+                   .subquery())
+        amenities = (select(place_amenity.c.place_id, func.count().label('amenity_count'))
+                     .where(place_amenity.c.place_id.in_(owned))
+                     .group_by(place_amenity.c.place_id)
+                     .subquery())
+        query = (select(Place.id,
+                        Place._title.label('title'),
+                        Place._price.label('price'),
+                        func.coalesce(reviews.c.review_count, 0).label('review_count'),
+                        reviews.c.average_rating,
+                        reviews.c.latest_review_at,
+                        func.coalesce(amenities.c.amenity_count, 0).label('amenity_count'))
+                 .outerjoin(reviews, reviews.c.place_id == Place.id)
+                 .outerjoin(amenities, amenities.c.place_id == Place.id)
+                 .where(Place._owner_id == owner_id)
+                 .order_by(Place.created_at, Place.id))
+        return db_session.execute(query).all()
+
+    def set_amenity_ids(self, place_id, amenity_ids):
+        """
+        Makes amenity_ids the place's full set of amenities. Only the difference with
+        what is stored is written: one INSERT for the new links, one DELETE for the old.
+        """
+        current = set(self.get_amenity_ids([place_id])[place_id])
+        wanted = set(amenity_ids)
+        added = wanted - current
+        removed = current - wanted
+
+        if added:
+            db_session.execute(place_amenity.insert(),
+                               [{'place_id': place_id, 'amenity_id': amenity_id} for amenity_id in added])
+        if removed:
+            db_session.execute(place_amenity.delete()
+                               .where(place_amenity.c.place_id == place_id)
+                               .where(place_amenity.c.amenity_id.in_(removed)))
+        if added or removed:
+            # Collections already loaded in the session no longer match the table
+            self._expire_loaded(Place, [place_id], 'amenities_r')
+            self._expire_loaded(Amenity, added | removed, 'places_r')
+            change_log.record(Place, 'update', [place_id])
+            unit_of_work.commit()
+        return added, removed
+
+    @staticmethod
+    def _expire_loaded(model, ids, attribute):
+        for obj_id in ids:
+            obj = db_session.identity_map.get(identity_key(model, obj_id))
+            if obj is not None:
+                db_session.expire(obj, [attribute])
+
+    def delete_amenity_links(self, place_ids):
+        """ Removes every amenity of the given places (ids or a SELECT of ids) with one DELETE """
+        db_session.execute(place_amenity.delete().where(place_amenity.c.place_id.in_(place_ids)))
+        # Amenities in the session may still list those places
+        for obj in list(db_session.identity_map.values()):
+            if isinstance(obj, Amenity):
+                db_session.expire(obj, ['places_r'])
+
+    def get_by_amenity(self, amenity_id):
+        """ Places that have the given amenity """
+        linked = select(place_amenity.c.place_id).where(place_amenity.c.amenity_id == amenity_id)
+        return db_session.query(Place).where(Place.id.in_(linked)).all()
+
+    def list_places(self, min_price=None, max_price=None, place_ids=None, sort=None,
+                    offset=0, limit=None, fields=None, with_total=False):
+        """
+        One page of places, filtered and sorted by the DB (see PLACE_SORTS for `sort`),
+        as read-only rows (see get_rows) with the columns in `fields`. If 'owner' is one
+        of the fields, each row also has an `owner_r` row, from the same query.
+        Returns (rows, total) where total is the number of matches over all pages,
+        or None unless with_total is set.
+        """
+        conditions = []
+        if min_price is not None:
+            conditions.append(Place._price >= min_price)
+        if max_price is not None:
+            conditions.append(Place._price <= max_price)
+        if place_ids is not None:
+            conditions.append(Place.id.in_(place_ids))
+
+        total = None
+        if with_total:
+            total = db_session.execute(select(func.count(Place.id)).where(*conditions)).scalar()
+
+        names = self.row_fields(fields)
+        places, users = Place.__table__, User.__table__
+        columns = [places.c[name] for name in names]
+        with_owner = fields is not None and 'owner' in fields
+        if with_owner:
+            columns += [users.c[name] for name in OwnerRow._fields]
+        statement = select(*columns).where(*conditions)
+        if with_owner:
+            statement = statement.join(users, users.c.id == places.c.owner_id)
+
+        if sort == 'rating':
+            # Best rated first, places without reviews last
+            ratings = (select(Review._place_id.label('place_id'), func.avg(Review._rating).label('average'))
+                       .group_by(Review._place_id).subquery())
+            statement = (statement.outerjoin(ratings, ratings.c.place_id == places.c.id)
+                         .order_by(ratings.c.average.is_(None), ratings.c.average.desc()))
+        elif sort is not None:
+            statement = statement.order_by(PLACE_SORTS[sort])
+        statement = statement.order_by(places.c.id)
+
+        if offset:
+            statement = statement.offset(offset)
+        if limit is not None:
+            statement = statement.limit(limit)
+
+        result = db_session.execute(statement)
+        if not with_owner:
+            return list(map(self.row_type(names)._make, result)), total
+
+        row_type = self.row_type(names + ('owner_r',))
+        split = len(names)
+        return [row_type(*row[:split], OwnerRow._make(row[split:])) for row in result], total
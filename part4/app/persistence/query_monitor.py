@@ -0,0 +1,149 @@
+""" N+1 query detector for development and tests """
+
+import warnings
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+
+# What the detector does when a relationship is lazy-loaded too often
+MODE_OFF = "off"
+MODE_WARN = "warn"
+MODE_RAISE = "raise"
+DEFAULT_THRESHOLD = 5
+
+# One QueryMonitor per request (or per `track_queries` block)
+_current_monitor = ContextVar("hbnb_query_monitor", default=None)
+
+
+class NPlusOneError(Exception):
+    """ Raised in 'raise' mode when a relationship is lazy-loaded too many times """
+
+
+class NPlusOneWarning(UserWarning):
+    """ Emitted in 'warn' mode when a relationship is lazy-loaded too many times """
+
+
+class QueryMonitor:
+    """ Counts the SQL statements and lazy loads issued while it is active """
+
+    def __init__(self, mode=MODE_WARN, threshold=DEFAULT_THRESHOLD, parent=None):
+        if mode not in (MODE_OFF, MODE_WARN, MODE_RAISE):
+            raise ValueError("Invalid N+1 detection mode: {}".format(mode))
+
+        self.mode = mode
+        self.threshold = threshold
+        self.query_count = 0
+        self.statements = []
+        self.lazy_loads = Counter()
+        self._reported = set()
+
+        # An enclosing monitor (e.g. a test wrapped around a request) sees everything we see
+        self.parent = parent
+
+    def record_query(self, statement):
+        """ Called for every statement sent to the DB """
+        self.query_count += 1
+        self.statements.append(statement)
+        if self.parent is not None:
+            self.parent.record_query(statement)
+
+    def record_lazy_load(self, relationship_name):
+        """ Called for every relationship lazy load; flags it once past the threshold """
+        if self.parent is not None:
+            self.parent.record_lazy_load(relationship_name)
+
+        self.lazy_loads[relationship_name] += 1
+        count = self.lazy_loads[relationship_name]
+
+        if self.mode == MODE_OFF or count <= self.threshold:
+            return
+        if relationship_name in self._reported:
+            return
+
+        self._reported.add(relationship_name)
+        message = "N+1 query detected: {} lazy-loaded {} times (threshold {})".format(
+            relationship_name, count, self.threshold)
+
+        if self.mode == MODE_RAISE:
+            raise NPlusOneError(message)
+        warnings.warn(message, NPlusOneWarning, stacklevel=2)
+
+
+def current_monitor():
+    """ Returns the QueryMonitor active in this context, or None """
+    return _current_monitor.get()
+
+
+@contextmanager
+def track_queries(mode=MODE_WARN, threshold=DEFAULT_THRESHOLD):
+    """
+    Tracks queries and lazy loads issued inside the block
+
+    with track_queries(mode="raise", threshold=3) as monitor:
+        ...
+    print(monitor.query_count)
+    """
+    monitor = QueryMonitor(mode, threshold, parent=_current_monitor.get())
+    token = _current_monitor.set(monitor)
+    try:
+        yield monitor
+    finally:
+        _current_monitor.reset(token)
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    monitor = _current_monitor.get()
+    if monitor is not None:
+        monitor.record_query(statement)
+
+
+def install(engine, session_factory, replicas=()):
+    """ Hooks the engines and session factory so active monitors see their traffic """
+    for each_engine in [engine, *replicas]:
+        event.listen(each_engine, "before_cursor_execute", _count_query)
+
+    @event.listens_for(session_factory, "do_orm_execute")
+    def _count_lazy_load(orm_execute_state):
+        monitor = _current_monitor.get()
+        # Bulk INSERT/UPDATE/DELETE statements have no loader state to look at
+        if monitor is None or not orm_execute_state.is_select:
+            return
+        if orm_execute_state.lazy_loaded_from is None:
+            return
+        if not orm_execute_state.is_relationship_load:
+            return
+
+        # The last element of the loader path is the relationship being loaded (e.g. Place.amenities_r)
+        path = orm_execute_state.loader_strategy_path
+        relationship_name = str(path[-1]) if path else "unknown"
+        monitor.record_lazy_load(relationship_name)
+
+
+def init_app(app):
+    """ Starts a QueryMonitor for every request when N_PLUS_ONE_MODE is enabled """
+    mode = app.config.get("N_PLUS_ONE_MODE", MODE_OFF)
+    threshold = app.config.get("N_PLUS_ONE_THRESHOLD", DEFAULT_THRESHOLD)
+    if mode == MODE_OFF:
+        return
+
+    from flask import g
+
+    @app.before_request
+    def _start_monitor():
+        monitor = QueryMonitor(mode, threshold, parent=_current_monitor.get())
+        g.query_monitor_token = _current_monitor.set(monitor)
+        g.query_monitor = monitor
+
+    @app.after_request
+    def _report_query_count(response):
+        monitor = g.get("query_monitor")
+        if monitor is not None:
+            response.headers["X-Query-Count"] = str(monitor.query_count)
+        return response
+
+    @app.teardown_request
+    def _stop_monitor(exc):
+        token = g.pop("query_monitor_token", None)
+        if token is not None:
+            _current_monitor.reset(token)
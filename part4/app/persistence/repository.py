@@ -1,4 +1,9 @@
+from collections import namedtuple
 from app.persistence import db_session
+from app.persistence import unit_of_work, change_log
+from sqlalchemy import select, delete
+from sqlalchemy.orm import load_only, MANYTOONE
+from sqlalchemy.orm.util import identity_key
 from abc import ABC, abstractmethod
 from app.models.user import User
 
@@ -11,6 +16,10 @@ class Repository(ABC):
     def get(self, obj_id):
         pass
 
+    @abstractmethod
+    def get_many(self, obj_ids):
+        pass
+
     @abstractmethod
     def get_all(self):
         pass
@@ -37,6 +46,9 @@ class InMemoryRepository(Repository):
     def get(self, obj_id):
         return self._storage.get(obj_id)
 
+    def get_many(self, obj_ids):
+        return [self._storage[obj_id] for obj_id in dict.fromkeys(obj_ids) if obj_id in self._storage]
+
     def get_all(self):
         return list(self._storage.values())
 
@@ -59,20 +71,94 @@ class InMemoryRepository(Repository):
         return next((obj for obj in self._storage.values() if getattr(obj, attr_name) == attr_value), None)
 
 class SQLAlchemyRepository(Repository):
+    # Columns that delete_where() passes to the change listeners on top of the id
+    # and the foreign keys
+    deleted_row_columns = ()
+
     def __init__(self, model):
         self.model = model
 
+        # Column name -> mapped attribute, e.g. 'title' -> Place._title
+        self.columns = {prop.columns[0].name: getattr(model, prop.key)
+                        for prop in model.__mapper__.column_attrs}
+
+        # Called with ('add' | 'update' | 'delete', obj) once a change is committed
+        self._change_listeners = []
+
+        # Column names -> namedtuple class for the read-only rows of get_rows()
+        self._row_types = {}
+
+    def on_change(self, listener):
+        """ Registers listener(action, obj) to be told about committed adds, updates and deletes """
+        self._change_listeners.append(listener)
+
+    def _changed(self, action, obj):
+        for listener in self._change_listeners:
+            unit_of_work.after_commit(lambda listener=listener: listener(action, obj))
+
+    def _query(self, fields=None, *options):
+        """
+        Base query for self.model. When `fields` is given, only those columns are
+        loaded (plus the primary key); names that aren't columns are ignored.
+        """
+        query = db_session.query(self.model)
+        if fields is not None:
+            wanted = [self.columns[name] for name in fields if name in self.columns]
+            query = query.options(load_only(self.model.id, *wanted))
+        return query.options(*options)
+
+    # --- Read-only rows ---
+    # Listings only copy column values into JSON, so they skip the ORM: a Core SELECT of
+    # just the wanted columns, returned as plain namedtuples - no instrumented instances,
+    # no identity-map entries, no property getters. The fields are named after the columns
+    # (row.first_name), so the API can render them like model objects.
+    def row_fields(self, fields=None):
+        """ The column names a row will have for `fields`: the id plus every field that is a column """
+        if fields is None:
+            fields = self.columns
+        return ('id',) + tuple(name for name in fields if name in self.columns and name != 'id')
+
+    def row_type(self, names):
+        """ The namedtuple class for rows with these column names """
+        row_type = self._row_types.get(names)
+        if row_type is None:
+            row_type = self._row_types[names] = namedtuple(self.model.__name__ + 'Row', names)
+        return row_type
+
+    def get_rows(self, fields=None, *criteria):
+        """ Rows (namedtuples) of every object matching criteria, with only the given fields """
+        names = self.row_fields(fields)
+        table = self.model.__table__
+        statement = select(*(table.c[name] for name in names)).where(*criteria)
+        return list(map(self.row_type(names)._make, db_session.execute(statement)))
+
+    # Changes are committed right away, unless they are part of a unit_of_work.transaction(),
+    # and every one is logged in the same transaction (see change_log.py)
     def add(self, obj):
         db_session.add(obj)
-        db_session.commit()
+        change_log.record(self.model, 'add', [obj.id])
+        unit_of_work.commit()
+        self._changed('add', obj)
 
-    def get(self, obj_id):
-        return db_session.query(self.model).get(obj_id)
+    def get(self, obj_id, fields=None):
+        return self._query(fields).get(obj_id)
         # return self.model.query.get(obj_id)
 
-    def get_all(self):
+    def get_many(self, obj_ids, *options, fields=None):
+        """ Fetches every object in obj_ids with a single IN query; missing ids are skipped """
+        obj_ids = list(dict.fromkeys(obj_ids))
+        if not obj_ids:
+            return []
+
+        found = self._query(fields, *options).where(self.model.id.in_(obj_ids)).all()
+
+        # Hand them back in the order they were asked for
+        found_by_id = {obj.id: obj for obj in found}
+        return [found_by_id[obj_id] for obj_id in obj_ids if obj_id in found_by_id]
+
+    def get_all(self, fields=None):
         # print(self.model)
-        return db_session.query(self.model).all()
+        return self._query(fields).all()
         # return self.model.query.all()
 
     def update(self, obj_id, data):
@@ -80,13 +166,62 @@ class SQLAlchemyRepository(Repository):
         if obj:
             for key, value in data.items():
                 setattr(obj, key, value)
-            db_session.commit()
+            obj.save()  # bumps updated_at
+            change_log.record(self.model, 'update', [obj.id])
+            unit_of_work.commit()
+            self._changed('update', obj)
 
     def delete(self, obj_id):
         obj = self.get(obj_id)
         if obj:
             db_session.delete(obj)
-            db_session.commit()
+            change_log.record(self.model, 'delete', [obj.id])
+            unit_of_work.commit()
+            self._changed('delete', obj)
+
+    def delete_where(self, *criteria):
+        """
+        Deletes every row matching criteria with one set-based DELETE, without loading
+        the objects (nor their ORM cascades - dependent rows are the caller's job).
+        Returns the number of rows deleted.
+
+        The change listeners still get one 'delete' per row, with a lightweight row
+        that carries the id, the foreign keys (e.g. review.place_id) and the
+        deleted_row_columns.
+        """
+        keys = [attribute.label(name) for name, attribute in self.columns.items()
+                if name == 'id' or name in self.deleted_row_columns
+                or attribute.property.columns[0].foreign_keys]
+        rows = db_session.execute(select(*keys).where(*criteria)).all()
+        if not rows:
+            return 0
+
+        obj_ids = [row.id for row in rows]
+        # By id rather than by criteria: a matching row inserted since the SELECT
+        # would be deleted without being logged or notified
+        db_session.execute(delete(self.model).where(self.model.id.in_(obj_ids)),
+                           execution_options={'synchronize_session': False})
+
+        # Objects already loaded in the session are gone from the DB, so drop them, and
+        # reload the collections that held them (e.g. place.reviews_r) on next access
+        for obj_id in obj_ids:
+            obj = db_session.identity_map.get(identity_key(self.model, obj_id))
+            if obj is not None:
+                db_session.expunge(obj)
+        for relationship in self.model.__mapper__.relationships:
+            if relationship.direction is not MANYTOONE or not relationship.back_populates:
+                continue
+            foreign_key = next(iter(relationship.local_columns)).name
+            for parent_id in {getattr(row, foreign_key) for row in rows}:
+                parent = db_session.identity_map.get(identity_key(relationship.mapper.class_, parent_id))
+                if parent is not None:
+                    db_session.expire(parent, [relationship.back_populates])
+
+        change_log.record(self.model, 'delete', obj_ids)
+        unit_of_work.commit()
+        for row in rows:
+            self._changed('delete', row)
+        return len(rows)
 
     def get_by_attribute(self, attr_name, attr_value):
         return db_session.query(self.model).where(getattr(self.model, attr_name) == attr_value).first()
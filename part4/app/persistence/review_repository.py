@@ -0,0 +1,54 @@
+from sqlalchemy import select, func
+from sqlalchemy.orm import joinedload
+from app.models.review import Review
+from app.models.user import User
+from app.persistence import db_session
+from app.persistence.repository import SQLAlchemyRepository
+
+class ReviewRepository(SQLAlchemyRepository):
+    # Review delete events carry the rating, for the pages that show the average
+    deleted_row_columns = ('rating',)
+
+    def __init__(self):
+        super().__init__(Review)
+
+    def _place_reviews(self, place_id):
+        # Reviews are always shown with their writer, so load both in one query
+        return (db_session.query(Review)
+                .options(joinedload(Review.user_r))
+                .where(Review._place_id == place_id)
+                .order_by(Review.created_at.desc(), Review.id))
+
+    def get_for_place(self, place_id):
+        return self._place_reviews(place_id).all()
+
+    def get_page_for_place(self, place_id, offset, limit):
+        return self._place_reviews(place_id).offset(offset).limit(limit).all()
+
+    def exists_for(self, user_id, place_id):
+        """ True if the user has reviewed the place (one indexed lookup) """
+        query = select(Review.id).where(Review._user_id == user_id, Review._place_id == place_id).limit(1)
+        return db_session.execute(query).first() is not None
+
+    def get_stats_for_place(self, place_id):
+        """ (number of reviews, average rating) for a place """
+        count, average = db_session.execute(
+            select(func.count(Review.id), func.avg(Review._rating)).where(Review._place_id == place_id)
+        ).one()
+        return count, (float(average) if average is not None else None)
+
+    def get_average_ratings(self, place_ids=None):
+        """ {place_id: average rating} for every place (or every one of place_ids) that has reviews """
+        query = select(Review._place_id, func.avg(Review._rating)).group_by(Review._place_id)
+        if place_ids is not None:
+            query = query.where(Review._place_id.in_(list(place_ids)))
+        rows = db_session.execute(query)
+        return {place_id: float(average) for place_id, average in rows}
+
+    def get_rows_with_writers(self):
+        """ (id, place_id, text, rating, user_id, first_name, last_name) of every review, newest first """
+        query = (select(Review.id, Review._place_id, Review._text, Review._rating, Review._user_id,
+                        User._first_name, User._last_name)
+                 .join(User, User.id == Review._user_id)
+                 .order_by(Review.created_at.desc(), Review.id))
+        return db_session.execute(query).all()
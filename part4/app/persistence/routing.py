@@ -0,0 +1,150 @@
+""" Send reads to read replicas and everything else to the primary DB """
+
+import itertools
+import math
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import Select
+from sqlalchemy.orm import Session
+
+# Set while a block (or a whole write request) must only talk to the primary
+_use_primary = ContextVar('use_primary', default=False)
+
+# When the client last wrote (Unix time), so that its next requests read from the primary,
+# whichever worker they land on
+LAST_WRITE_COOKIE = 'hbnb_last_write'
+
+
+def _request_state():
+    """ flask.g during a request, else None """
+    from flask import g, has_request_context
+
+    return g if has_request_context() else None
+
+
+class Router:
+    """
+    Holds the primary engine and the replica engines, and picks one for each statement.
+
+    Replicas lag behind the primary, so after a client writes, its reads go to the
+    primary for `lag` seconds - long enough for the replicas to have caught up,
+    and what gives it read-your-writes between its POST and its next GET. Within
+    a request, the time of the client's last write comes from its cookie (see
+    init_app) and other clients keep using the replicas; outside of requests
+    (scripts, the shell) any write pins every read of the process.
+    """
+
+    def __init__(self, primary, replicas=(), lag=2.0):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.lag = lag
+        self.last_write = None
+        self._next_replica = itertools.cycle(self.replicas)
+
+    def wrote(self):
+        """ Pins the reads of this client (or of the process, outside requests) to the primary for `lag` seconds """
+        state = _request_state()
+        if state is not None:
+            state.wrote_at = time.time()
+        else:
+            self.last_write = time.monotonic()
+
+    def pinned(self):
+        """ True if reads must go to the primary right now """
+        if _use_primary.get():
+            return True
+        state = _request_state()
+        if state is not None:
+            wrote_at = state.get('wrote_at') or state.get('client_wrote_at')
+            return wrote_at is not None and time.time() - wrote_at < self.lag
+        return self.last_write is not None and time.monotonic() - self.last_write < self.lag
+
+    def engine_for(self, statement, flushing=False):
+        """ The engine that should run this statement """
+        if not self.replicas:
+            return self.primary
+
+        # Only plain SELECTs may go to a replica: INSERT/UPDATE/DELETE and raw SQL stay on
+        # the primary. (Flushes are recorded once they are done, see install().)
+        if flushing or statement is None:
+            return self.primary
+        if not isinstance(statement, Select):
+            self.wrote()
+            return self.primary
+
+        if self.pinned():
+            return self.primary
+        return next(self._next_replica)
+
+
+class RoutingSession(Session):
+    """ Session that lets a Router pick the engine for each statement """
+
+    def __init__(self, *args, router=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.router = router
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.router is None:
+            return super().get_bind(mapper, clause=clause, **kwargs)
+        return self.router.engine_for(clause, self._flushing)
+
+
+def install(router, session_factory):
+    """ Records every flush so that the reads that follow see the new rows """
+    from sqlalchemy import event
+
+    @event.listens_for(session_factory, "after_flush")
+    def _pin_after_flush(session, flush_context):
+        router.wrote()
+
+
+@contextmanager
+def use_primary():
+    """
+    Sends every query in the block to the primary, e.g. to read a row that must be current:
+
+        with use_primary():
+            user = facade.get_user(user_id)
+    """
+    token = _use_primary.set(True)
+    try:
+        yield
+    finally:
+        _use_primary.reset(token)
+
+
+def init_app(app, router=None):
+    """
+    Requests that change data (anything but GET/HEAD/OPTIONS) only use the primary,
+    and a response to a request that wrote sets a cookie with the time, which sends
+    the client's reads to the primary until the replicas have caught up
+    """
+    from flask import g, request
+
+    if router is None:
+        from app.persistence import router
+
+    @app.before_request
+    def _pin_writes():
+        try:
+            g.client_wrote_at = float(request.cookies[LAST_WRITE_COOKIE])
+        except (KeyError, ValueError):
+            pass
+        if request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            g.use_primary_token = _use_primary.set(True)
+
+    @app.after_request
+    def _remember_write(response):
+        wrote_at = g.get('wrote_at')
+        if wrote_at is not None and router.replicas:
+            response.set_cookie(LAST_WRITE_COOKIE, repr(wrote_at), max_age=math.ceil(router.lag),
+                                httponly=True, samesite='Lax')
+        return response
+
+    @app.teardown_request
+    def _unpin_writes(exc):
+        token = g.pop('use_primary_token', None)
+        if token is not None:
+            _use_primary.reset(token)
@@ -0,0 +1,53 @@
+""" Keep the session, and everything its identity map holds, from growing for the life of a worker """
+
+from sqlalchemy import event
+
+
+def trim_identity_map(session, max_size):
+    """
+    Expunges the objects loaded longest ago until the identity map holds at most
+    90% of max_size (so that it isn't trimmed again on the very next commit).
+    Objects with pending changes are kept. Returns how many objects were evicted.
+
+    Evicted objects are detached: their loaded attributes can still be read, but
+    relationships that weren't loaded can no longer be.
+    """
+    identity_map = session.identity_map
+    if len(identity_map) <= max_size:
+        return 0
+
+    to_evict = len(identity_map) - max_size * 9 // 10
+    busy = {id(obj) for obj in (*session.new, *session.dirty, *session.deleted)}
+    evicted = 0
+    # The identity map keeps the order in which objects were loaded
+    for obj in list(identity_map.values()):
+        if evicted >= to_evict:
+            break
+        if id(obj) not in busy:
+            session.expunge(obj)
+            evicted += 1
+    return evicted
+
+
+def install(session_factory, max_identity_map=0):
+    """
+    With max_identity_map > 0, every commit trims the identity map back under
+    that size - for batch jobs and scripts that load many rows in one session.
+    """
+    if max_identity_map <= 0:
+        return
+
+    @event.listens_for(session_factory, "after_commit")
+    def _trim_after_commit(session):
+        trim_identity_map(session, max_identity_map)
+
+
+def init_app(app):
+    """ Every request starts with a fresh session, which is closed and dropped when it ends """
+    from app.persistence import session
+
+    @app.teardown_appcontext
+    def _remove_session(exc):
+        # Rolls back anything left open, returns the connection to the pool and
+        # lets go of every object the request loaded
+        session.remove()
@@ -0,0 +1,66 @@
+""" Unit of work: group several repository calls into one DB transaction """
+
+from contextlib import contextmanager
+from app.persistence import db_session
+
+# Kept in the session's info dict, next to the changes they apply to
+_DEPTH_KEY = 'uow_depth'
+_CALLBACKS_KEY = 'uow_after_commit'
+
+
+def in_transaction():
+    """ True while a transaction() block is open on this session """
+    return db_session.info.get(_DEPTH_KEY, 0) > 0
+
+
+def commit():
+    """
+    What the repositories call after a change: commits straight away, unless a
+    transaction() is open, in which case the commit is left to the end of the block
+    """
+    if not in_transaction():
+        db_session.commit()
+
+
+def after_commit(callback):
+    """ Runs callback once the current changes are committed (right away outside a transaction) """
+    if in_transaction():
+        db_session.info.setdefault(_CALLBACKS_KEY, []).append(callback)
+    else:
+        callback()
+
+
+@contextmanager
+def transaction():
+    """
+    Everything the repositories do inside the block is committed once at the end,
+    or rolled back if the block raises. Blocks can be nested; only the outermost
+    one commits.
+
+        with transaction():
+            place_repo.add(place)
+            ...
+    """
+    info = db_session.info
+    info[_DEPTH_KEY] = info.get(_DEPTH_KEY, 0) + 1
+    try:
+        yield db_session
+    except BaseException:
+        info[_DEPTH_KEY] -= 1
+        if info[_DEPTH_KEY] == 0:
+            info.pop(_CALLBACKS_KEY, None)
+            db_session.rollback()
+        raise
+
+    info[_DEPTH_KEY] -= 1
+    if info[_DEPTH_KEY] > 0:
+        return
+
+    callbacks = info.pop(_CALLBACKS_KEY, [])
+    try:
+        db_session.commit()
+    except BaseException:
+        db_session.rollback()
+        raise
+    for callback in callbacks:
+        callback()
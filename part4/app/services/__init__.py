@@ -1,7 +1,6 @@
 from app.services.facade import HBnBFacade
-from app.persistence.repository import InMemoryRepository
-from app.persistence.user_repository import UserRepository
 
+# Building the facade is cheap - the repositories don't touch the DB until they are used
 facade = HBnBFacade()
 
 ADMIN_EMAIL = "admin@hbnb.io"
@@ -14,25 +13,22 @@ admin_details = {
     "is_admin": True
 }
 
-# Task 4 - create a default admin user to overcome the chicken-and-egg problem
-# that will happen when the Create User has a @jwt_required slapped on top of it.
-# Check to ensure that we are still using InMemoryRepository or there will be an error
+def seed_admin():
+    """
+    Task 4/6 - create a default admin user to overcome the chicken-and-egg problem
+    that will happen when the Create User has a @jwt_required slapped on top of it.
 
-if isinstance(facade.user_repo, InMemoryRepository):
-    facade.create_user(admin_details)
-
-# Task 6 - Same as before, except we need to check the DB first to ensure that there 
-# isn't already a Super Admin inside. Unlike the InMemoryRepo, the data in the DB
-# will persist across sessions.
-
-if isinstance(facade.user_repo, UserRepository):
-    result = facade.user_repo.get_user_by_email(ADMIN_EMAIL)
+    We check the DB first to ensure that there isn't already a Super Admin inside,
+    since the data in the DB persists across sessions. This used to run on import;
+    it is now part of the explicit bootstrap step (see bootstrap.py).
+    """
+    result = facade.get_user_by_email(ADMIN_EMAIL)
 
     # If no Super Admin exists, create a new one
     if result is None:
-        facade.create_user(admin_details)
-    # else:
-    #     print('Super Admin user already exists. Moving on...')
+        result = facade.create_user(admin_details)
+
+    return result
 
 # With this default admin, we now will be able to log into the system to create more users.
 # curl -X POST "http://127.0.0.1:5000/api/v1/auth/login" -H "Content-Type: application/json" -d '{ "email": "admin@hbnb.io", "password": "admin1234" }'
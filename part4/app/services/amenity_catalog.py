@@ -0,0 +1,73 @@
+""" In-process cache of the amenity catalog (id <-> name) """
+
+import sys
+import threading
+
+
+class AmenityCatalog:
+    """
+    Amenities are a small catalog that rarely changes, so we keep all of them
+    in memory and resolve names without going to the DB. The catalog is loaded
+    on first use and reloaded whenever the version counter has been bumped,
+    which the facade does on every amenity create/update.
+    """
+
+    def __init__(self, amenity_repo):
+        self.amenity_repo = amenity_repo
+        self._lock = threading.Lock()
+        self._version = 0
+        self._loaded_version = None
+        self._names_by_id = {}
+        self._ids_by_name = {}
+
+    @staticmethod
+    def _name_key(name):
+        # MySQL compares names case-insensitively (utf8mb4_0900_ai_ci), so do we
+        return name.strip().casefold()
+
+    @property
+    def version(self):
+        """ Current version of the catalog """
+        return self._version
+
+    def invalidate(self):
+        """ Bump the version so that the next lookup reloads the catalog """
+        with self._lock:
+            self._version += 1
+
+    def _ensure_loaded(self):
+        """ (Re)load the catalog if it is missing or out of date """
+        if self._loaded_version == self._version:
+            return
+
+        with self._lock:
+            version = self._version
+            if self._loaded_version == version:
+                return
+
+            names_by_id = {}
+            ids_by_name = {}
+            for amenity_id, name in self.amenity_repo.get_catalog_rows():
+                # Interned so that every place listing shares the same string objects
+                name = sys.intern(name)
+                names_by_id[amenity_id] = name
+                ids_by_name.setdefault(self._name_key(name), amenity_id)
+
+            self._names_by_id = names_by_id
+            self._ids_by_name = ids_by_name
+            self._loaded_version = version
+
+    def name(self, amenity_id):
+        """ Name of the amenity, or None if there is no such amenity """
+        self._ensure_loaded()
+        return self._names_by_id.get(amenity_id)
+
+    def id_for_name(self, name):
+        """ Id of the amenity with that name, or None """
+        self._ensure_loaded()
+        return self._ids_by_name.get(self._name_key(name))
+
+    def all(self):
+        """ List of (id, name) pairs for the whole catalog """
+        self._ensure_loaded()
+        return list(self._names_by_id.items())
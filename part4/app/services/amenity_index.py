@@ -0,0 +1,122 @@
+""" In-process bitmap index: which places have which amenities """
+
+import threading
+
+MATCH_ANY = 'any'
+MATCH_ALL = 'all'
+
+
+class AmenityIndex:
+    """
+    Every place that has at least one amenity gets a row number, and every amenity
+    a bitmap (a Python int) with the bits of its places set. "Has wifi AND pool" is
+    then `bitmaps[wifi] & bitmaps[pool]`, worked out before any place row is fetched.
+
+    The index is loaded from place_amenity on first use and then kept up to date
+    by the facade; invalidate() makes the next lookup reload it from the DB.
+    """
+
+    def __init__(self, place_repo):
+        self.place_repo = place_repo
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._bitmaps = {}
+        self._row_of = {}
+        self._place_ids = []
+
+    def invalidate(self):
+        """ Drop everything; the next lookup reloads the index """
+        with self._lock:
+            self._loaded = False
+
+    def _row(self, place_id):
+        """ Row number of a place, assigning the next free one if it has none yet """
+        row = self._row_of.get(place_id)
+        if row is None:
+            row = len(self._place_ids)
+            self._row_of[place_id] = row
+            self._place_ids.append(place_id)
+        return row
+
+    def _ensure_loaded(self):
+        """ Caller must hold the lock """
+        if self._loaded:
+            return
+        self._bitmaps = {}
+        self._row_of = {}
+        self._place_ids = []
+        for place_id, amenity_id in self.place_repo.get_amenity_links():
+            bit = 1 << self._row(place_id)
+            self._bitmaps[amenity_id] = self._bitmaps.get(amenity_id, 0) | bit
+        self._loaded = True
+
+    def update_place(self, place_id, added=(), removed=()):
+        """ Records amenities added to / removed from a place """
+        with self._lock:
+            if not self._loaded:
+                return
+            bit = 1 << self._row(place_id)
+            for amenity_id in added:
+                self._bitmaps[amenity_id] = self._bitmaps.get(amenity_id, 0) | bit
+            for amenity_id in removed:
+                self._bitmaps[amenity_id] = self._bitmaps.get(amenity_id, 0) & ~bit
+
+    def _clear(self, place_ids):
+        """ Clears the bits of the places. Caller must hold the lock """
+        mask = 0
+        for place_id in place_ids:
+            row = self._row_of.get(place_id)
+            if row is not None:
+                mask |= 1 << row
+        if mask:
+            self._bitmaps = {amenity_id: bitmap & ~mask for amenity_id, bitmap in self._bitmaps.items()}
+
+    def remove_places(self, place_ids):
+        """ Clears the bits of deleted places (their row numbers are not reused) """
+        with self._lock:
+            if self._loaded:
+                self._clear(place_ids)
+
+    def refresh_places(self, place_ids):
+        """ Reloads the amenities of these places only, e.g. after another worker changed them """
+        if not self._loaded:
+            return
+        amenity_ids = self.place_repo.get_amenity_ids(place_ids)
+        with self._lock:
+            if not self._loaded:
+                return
+            self._clear(place_ids)
+            for place_id, ids in amenity_ids.items():
+                if ids:
+                    bit = 1 << self._row(place_id)
+                    for amenity_id in ids:
+                        self._bitmaps[amenity_id] = self._bitmaps.get(amenity_id, 0) | bit
+
+    def match(self, amenity_ids, mode=MATCH_ANY):
+        """
+        Ids of the places that have any (or, with MATCH_ALL, every one) of amenity_ids
+        """
+        if mode not in (MATCH_ANY, MATCH_ALL):
+            raise ValueError("mode must be '{}' or '{}'".format(MATCH_ANY, MATCH_ALL))
+
+        with self._lock:
+            self._ensure_loaded()
+            bitmaps = [self._bitmaps.get(amenity_id, 0) for amenity_id in dict.fromkeys(amenity_ids)]
+            place_ids = self._place_ids
+
+        if not bitmaps:
+            return []
+
+        result = bitmaps[0]
+        for bitmap in bitmaps[1:]:
+            if mode == MATCH_ALL:
+                result &= bitmap
+            else:
+                result |= bitmap
+
+        matched = []
+        while result:
+            lowest = result & -result
+            matched.append(place_ids[lowest.bit_length() - 1])
+            result ^= lowest
+        return matched
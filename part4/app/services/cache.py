@@ -0,0 +1,470 @@
+""" Cache with pluggable backends, and invalidation broadcast between the workers that share it """
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+
+class MemoryCache:
+    """
+    In-process LRU: the fastest, but every worker has its own copy. Values are
+    kept as they are (not copied), so callers must not modify what they get.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # key -> (value, expires or None)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self.get_many([key])[0]
+
+    def get_many(self, keys):
+        now = time.time()
+        values = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None or (entry[1] is not None and entry[1] <= now):
+                    values.append(None)
+                    continue
+                self._entries.move_to_end(key)
+                values.append(entry[0])
+        return values
+
+    def set(self, key, value, ttl=None):
+        self.set_many({key: value}, ttl)
+
+    def set_many(self, items, ttl=None):
+        expires = time.time() + ttl if ttl else None
+        with self._lock:
+            for key, value in items.items():
+                self._entries[key] = (value, expires)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def incr(self, key):
+        """ Adds one to the integer at key (0 if missing) and returns it """
+        with self._lock:
+            value = (self._entries.get(key) or (0, None))[0] + 1
+            self._entries[key] = (value, None)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCache:
+    """
+    A local SQLite file shared by every worker on the host (including workers
+    forked from the same parent: each process opens its own connections).
+    Values are stored as JSON.
+    """
+
+    # Expired entries are purged once every this many writes
+    PURGE_EVERY = 500
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._connect()
+        conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_expires ON cache (expires)")
+
+    def _connect(self):
+        # A connection must not cross a fork, so they are kept per thread and per process
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, key):
+        return self.get_many([key])[0]
+
+    def get_many(self, keys):
+        if not keys:
+            return []
+        rows = self._connect().execute(
+            "SELECT key, value FROM cache WHERE key IN ({}) AND (expires IS NULL OR expires > ?)".format(
+                ', '.join('?' * len(keys))), (*keys, time.time())).fetchall()
+        found = {key: json.loads(value) for key, value in rows}
+        return [found.get(key) for key in keys]
+
+    def set(self, key, value, ttl=None):
+        self.set_many({key: value}, ttl)
+
+    def set_many(self, items, ttl=None):
+        now = time.time()
+        expires = now + ttl if ttl else None
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+                             [(key, json.dumps(value), expires) for key, value in items.items()])
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                conn.execute("DELETE FROM cache WHERE expires <= ?", (now,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def delete(self, *keys):
+        if keys:
+            self._connect().execute("DELETE FROM cache WHERE key IN ({})".format(', '.join('?' * len(keys))), keys)
+
+    def incr(self, key):
+        """ Adds one to the integer at key (0 if missing) and returns it, atomically across workers """
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+            value = (json.loads(row[0]) if row else 0) + 1
+            conn.execute("INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, NULL)",
+                         (key, json.dumps(value)))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return value
+
+    def clear(self):
+        self._connect().execute("DELETE FROM cache")
+
+
+class RespError(Exception):
+    """ An error reply from the server """
+
+
+class RespCache:
+    """
+    A server that speaks the Redis protocol (RESP): Redis itself, or any local
+    stand-in for it. Only GET, MGET, SET, DEL, INCR, SCAN and SELECT are used, over
+    a plain socket, so no client library is needed. Keys are prefixed so that
+    several apps can share a server; values are stored as JSON.
+    """
+
+    def __init__(self, host='127.0.0.1', port=6379, db=0, prefix='hbnb:', timeout=2.0):
+        self.host, self.port, self.db = host, port, db
+        self.prefix = prefix
+        self.timeout = timeout
+        self._local = threading.local()
+
+    # --- Protocol ---
+    def _connect(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            sock = socket.create_connection((self.host, self.port), self.timeout)
+            connection = (sock, sock.makefile('rb'))
+            self._local.connection, self._local.pid = connection, os.getpid()
+            if self.db:
+                self._send(connection, [('SELECT', self.db)])
+        return connection
+
+    @staticmethod
+    def _encode(command):
+        parts = [str(arg).encode('utf-8') if not isinstance(arg, bytes) else arg for arg in command]
+        return b'*%d\r\n' % len(parts) + b''.join(b'$%d\r\n%s\r\n' % (len(part), part) for part in parts)
+
+    def _read(self, reader):
+        line = reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by the cache server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest.decode('utf-8')
+        if kind == b'-':
+            return RespError(rest.decode('utf-8'))
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            if int(rest) < 0:
+                return None
+            data = reader.read(int(rest) + 2)
+            return data[:-2].decode('utf-8')
+        if kind == b'*':
+            return None if int(rest) < 0 else [self._read(reader) for _ in range(int(rest))]
+        raise ConnectionError("Unexpected reply from the cache server: {!r}".format(line))
+
+    def _send(self, connection, commands):
+        sock, reader = connection
+        sock.sendall(b''.join(self._encode(command) for command in commands))
+        replies = [self._read(reader) for _ in commands]
+        for reply in replies:
+            if isinstance(reply, RespError):
+                raise reply
+        return replies
+
+    def _pipeline(self, *commands):
+        """ Sends the commands in one round trip, reconnecting once if the connection was lost """
+        for attempt in range(2):
+            try:
+                return self._send(self._connect(), commands)
+            except (OSError, ConnectionError):
+                self._local.connection = None
+                if attempt:
+                    raise
+
+    # --- Cache ---
+    def get(self, key):
+        return self.get_many([key])[0]
+
+    def get_many(self, keys):
+        if not keys:
+            return []
+        values = self._pipeline(('MGET', *(self.prefix + key for key in keys)))[0]
+        return [json.loads(value) if value is not None else None for value in values]
+
+    def set(self, key, value, ttl=None):
+        self.set_many({key: value}, ttl)
+
+    def set_many(self, items, ttl=None):
+        expiry = ('EX', int(ttl)) if ttl else ()
+        self._pipeline(*(('SET', self.prefix + key, json.dumps(value), *expiry) for key, value in items.items()))
+
+    def delete(self, *keys):
+        if keys:
+            self._pipeline(('DEL', *(self.prefix + key for key in keys)))
+
+    def incr(self, key):
+        return self._pipeline(('INCR', self.prefix + key))[0]
+
+    # Keys per SCAN step: the server answers each one quickly, unlike a KEYS over all of them
+    SCAN_COUNT = 500
+
+    def clear(self):
+        """ Deletes our keys (and only ours), a batch at a time """
+        cursor = '0'
+        while True:
+            cursor, keys = self._pipeline(('SCAN', cursor, 'MATCH', self.prefix + '*', 'COUNT', self.SCAN_COUNT))[0]
+            if keys:
+                self._pipeline(('DEL', *keys))
+            if cursor == '0':
+                return
+
+
+def create_cache(url):
+    """ 'memory://', 'sqlite:///path/to/file.db' or 'redis://host:port/db' """
+    if url == 'memory://':
+        return MemoryCache()
+    if url.startswith('sqlite:///'):
+        return SQLiteCache(url[len('sqlite:///'):])
+    if url.startswith('redis://'):
+        parsed = urlparse(url)
+        return RespCache(parsed.hostname or '127.0.0.1', parsed.port or 6379, int(parsed.path.strip('/') or 0))
+    raise ValueError("Unsupported cache: {}".format(url))
+
+
+# What the backends raise when the cache can't be reached (ConnectionError is an OSError)
+BACKEND_ERRORS = (OSError, sqlite3.Error, RespError)
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBroadcast:
+    """
+    Lets every worker sharing a cache know what another worker changed - which
+    kind of data ("place", "review", ...) and which ids of it - so that it can
+    update what it keeps in memory, entity by entity.
+
+    Each topic has a version counter in the cache. publish() bumps it and stores
+    the changed ids under the new version for CHANGE_TTL seconds. sync() reads
+    the counters (one cache read) and, for those another worker bumped since,
+    the ids (a second one), then calls on_remote_change(topic, ids). ids is None
+    when they can't be known (too many, the worker is too far behind, an entry is
+    gone): everything derived from the topic must then be reloaded. Our own
+    bumps are skipped: we already know about them. Inside a request, the ids are
+    published once, when it ends.
+
+    An unreachable cache never fails a request: the error is logged, and the
+    topics that couldn't be published are published again without ids (so the
+    other workers reload them) once the cache answers.
+    """
+
+    CHANGE_TTL = 600
+    # Beyond this many ids (or versions to catch up on) a worker reloads instead
+    MAX_IDS = 1000
+    MAX_CATCH_UP = 200
+    # Seconds between the syncs done before requests (set with init_app,
+    # CACHE_SYNC_INTERVAL): another worker's change shows up here within that long
+    SYNC_INTERVAL = 0.1
+
+    def __init__(self, cache, topics, on_remote_change):
+        self.cache = cache
+        self.topics = list(topics)
+        self.on_remote_change = on_remote_change
+        self._seen = {}
+        self._lock = threading.Lock()
+        self._token = uuid.uuid4().hex
+        self.sync_interval = self.SYNC_INTERVAL
+        self._next_sync = 0.0
+        self._unpublished = set()
+        self._failing = False
+
+    @staticmethod
+    def _key(topic):
+        return 'version:' + topic
+
+    @staticmethod
+    def _change_key(topic, version):
+        return 'changed:{}:{}'.format(topic, version)
+
+    def _publisher(self):
+        # Workers forked from one parent share the token, not the pid
+        return '{}:{}'.format(self._token, os.getpid())
+
+    def _pending(self):
+        """ {topic: changed ids, or None for unknown} of the current request, or None outside of one """
+        from flask import g, has_request_context
+
+        if not has_request_context():
+            return None
+        if 'changed_topics' not in g:
+            g.changed_topics = {}
+        return g.changed_topics
+
+    def publish(self, topic, entity_id=None):
+        """ Tells the other workers that `entity_id` (or, if None, any of the topic) changed """
+        pending = self._pending()
+        if pending is None:
+            self._publish_now(topic, None if entity_id is None else {entity_id})
+        elif entity_id is None:
+            pending[topic] = None
+        elif topic not in pending:
+            pending[topic] = {entity_id}
+        elif pending[topic] is not None:
+            pending[topic].add(entity_id)
+
+    def _bump(self, topic, ids):
+        if ids is not None and len(ids) > self.MAX_IDS:
+            ids = None
+        version = self.cache.incr(self._key(topic))
+        self.cache.set(self._change_key(topic, version),
+                       {'by': self._publisher(), 'ids': sorted(ids) if ids is not None else None}, self.CHANGE_TTL)
+        with self._lock:
+            # The first look only sets the baseline: nothing was loaded from before it
+            self._seen.setdefault(topic, version)
+
+    def _publish_now(self, topic, ids):
+        try:
+            self._bump(topic, ids)
+        except BACKEND_ERRORS as error:
+            self._backend_failed(error)
+            with self._lock:
+                self._unpublished.add(topic)
+
+    def _republish(self):
+        """ Publishes again, without ids, the topics that couldn't be published """
+        with self._lock:
+            topics, self._unpublished = self._unpublished, set()
+        for topic in sorted(topics):
+            try:
+                self._bump(topic, None)
+            except BACKEND_ERRORS:
+                with self._lock:
+                    self._unpublished.update(topics)
+                raise
+            topics.discard(topic)
+
+    def _backend_failed(self, error):
+        # Once per outage, not once per request
+        if not self._failing:
+            logger.warning("Cache unreachable, changes are not shared with the other workers: %s", error)
+        self._failing = True
+
+    def flush(self):
+        """ Publishes what the current request changed """
+        pending = self._pending()
+        for topic in sorted(pending or ()):
+            self._publish_now(topic, pending[topic])
+        if pending:
+            pending.clear()
+
+    def _remote_ids(self, topic, versions, entries):
+        """ The ids other workers changed in these versions of the topic, or None if unknown """
+        ids = set()
+        for version in versions:
+            entry = entries.get(self._change_key(topic, version))
+            if entry is None:
+                return None
+            if entry['by'] == self._publisher():
+                continue
+            if entry['ids'] is None:
+                return None
+            ids.update(entry['ids'])
+        return ids if len(ids) <= self.MAX_IDS else None
+
+    def sync(self):
+        """
+        Calls on_remote_change for every topic another worker changed since the last
+        sync. While the cache is unreachable nothing is synced; when it answers again,
+        the versions missed meanwhile are caught up on (or reloaded, if too many).
+        """
+        try:
+            self._republish()
+            self._sync()
+        except BACKEND_ERRORS as error:
+            self._backend_failed(error)
+            return
+        if self._failing:
+            logger.warning("Cache reachable again")
+            self._failing = False
+
+    def _sync(self):
+        versions = self.cache.get_many([self._key(topic) for topic in self.topics])
+        behind = {}
+        with self._lock:
+            for topic, version in zip(self.topics, versions):
+                version = version or 0
+                seen = self._seen.get(topic)
+                if seen == version:
+                    continue
+                self._seen[topic] = version
+                if seen is not None:
+                    behind[topic] = range(seen + 1, version + 1)
+        if not behind:
+            return
+
+        # The ids of every version we missed, in one read; a counter that went back
+        # (e.g. the cache was cleared) or too many versions and we reload
+        keys = [self._change_key(topic, version) for topic, missed in behind.items()
+                if 0 < len(missed) <= self.MAX_CATCH_UP for version in missed]
+        entries = dict(zip(keys, self.cache.get_many(keys)))
+        for topic, missed in behind.items():
+            ids = self._remote_ids(topic, missed, entries) if 0 < len(missed) <= self.MAX_CATCH_UP else None
+            if ids is None or ids:
+                self.on_remote_change(topic, ids)
+
+    def _sync_if_due(self):
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_sync:
+                return
+            self._next_sync = now + self.sync_interval
+        self.sync()
+
+    def init_app(self, app):
+        """ Sync before requests (at most once per sync_interval), publish after them """
+        self.sync_interval = app.config.get('CACHE_SYNC_INTERVAL', self.sync_interval)
+        app.before_request(self._sync_if_due)
+
+        @app.teardown_request
+        def _publish_changes(exc):
+            self.flush()
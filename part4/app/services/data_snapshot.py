@@ -0,0 +1,189 @@
+"""
+Read-only snapshot of the places (with their owner, amenities and reviews) in one
+memory-mapped file, so that anonymous GETs can be served without the DB.
+
+Layout (little-endian):
+
+    header   magic, format version, place count, export time, last change seq,
+             offset of the index
+    records  one compact JSON document per place, everything its pages show
+    index    (16-byte id, offset, length) per place, sorted by id - which is
+             also the default order of the listing, since ids are time-ordered
+
+Every worker maps the same file read-only, so the OS page cache holds it once for
+all of them, and a lookup is a binary search over the index without loading anything.
+"""
+
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import uuid
+
+MAGIC = b'HBNBSNAP'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<8sIIdQQ')   # magic, version, count, exported_at, change seq, index offset
+INDEX_ENTRY = struct.Struct('<16sQI')  # id, offset, length
+
+# Columns of a place record, besides owner, amenities and reviews
+PLACE_COLUMNS = ['id', 'title', 'description', 'price', 'latitude', 'longitude', 'owner_id']
+
+
+def export(path, place_repo, amenity_repo, review_repo, change_seq=0):
+    """
+    Writes the snapshot of every place to `path` (replacing the previous one at
+    once: workers that still map the old file keep reading it) from four queries.
+    Returns the number of places written.
+    """
+    places, _ = place_repo.list_places(fields=PLACE_COLUMNS + ['owner'])
+    amenity_names = dict(amenity_repo.get_catalog_rows())
+    amenities = {}
+    for place_id, amenity_id in place_repo.get_amenity_links():
+        amenities.setdefault(place_id, []).append([amenity_id, amenity_names.get(amenity_id)])
+    reviews = {}
+    for review_id, place_id, text, rating, user_id, first_name, last_name in review_repo.get_rows_with_writers():
+        reviews.setdefault(place_id, []).append({
+            'id': review_id, 'text': text, 'rating': rating, 'user_id': user_id,
+            'user': {'id': user_id, 'first_name': first_name, 'last_name': last_name},
+        })
+
+    staging = '{}.{}.tmp'.format(path, os.getpid())
+    index = []
+    with open(staging, 'wb') as snapshot_file:
+        snapshot_file.write(b'\0' * HEADER.size)
+        # list_places returns them in id order, i.e. the order of the index
+        for place in places:
+            place_reviews = reviews.get(place.id, [])
+            record = {column: getattr(place, column) for column in PLACE_COLUMNS}
+            record.update(
+                owner=place.owner_r._asdict(),
+                amenities=amenities.get(place.id, []),
+                reviews=place_reviews,
+                review_count=len(place_reviews),
+                average_rating=(sum(review['rating'] for review in place_reviews) / len(place_reviews)
+                                if place_reviews else None),
+            )
+            data = json.dumps(record, separators=(',', ':')).encode('utf-8')
+            index.append(INDEX_ENTRY.pack(uuid.UUID(place.id).bytes, snapshot_file.tell(), len(data)))
+            snapshot_file.write(data)
+
+        index_offset = snapshot_file.tell()
+        snapshot_file.write(b''.join(index))
+        snapshot_file.seek(0)
+        snapshot_file.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(index), time.time(), change_seq, index_offset))
+    os.replace(staging, path)
+    return len(index)
+
+
+class _MappedSnapshot:
+    """ One mapped version of the file """
+
+    def __init__(self, snapshot_file):
+        self.map = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count, self.exported_at, self.change_seq, self.index_offset = \
+            HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("Not a snapshot file (or an older format)")
+
+    def entry(self, position):
+        return INDEX_ENTRY.unpack_from(self.map, self.index_offset + position * INDEX_ENTRY.size)
+
+    def record(self, offset, length):
+        return json.loads(self.map[offset:offset + length])
+
+    def find(self, key):
+        """ Binary search of the index for a 16-byte id """
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            position = self.index_offset + middle * INDEX_ENTRY.size
+            if self.map[position:position + 16] < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count:
+            entry_id, offset, length = self.entry(low)
+            if entry_id == key:
+                return self.record(offset, length)
+        return None
+
+
+class SnapshotReader:
+    """
+    Serves place records from the snapshot at `path`. The file is checked for a
+    newer export at most every CHECK_INTERVAL seconds and remapped when it was
+    replaced. Every lookup returns None when there is no snapshot (or the place
+    isn't in it), and the caller falls back to the DB.
+    """
+
+    CHECK_INTERVAL = 1.0
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._file_id = None
+        self._next_check = 0
+
+    def _current(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return self._snapshot
+
+        with self._lock:
+            if now >= self._next_check:
+                self._next_check = now + self.CHECK_INTERVAL
+                self._reload()
+        return self._snapshot
+
+    def _reload(self):
+        """ Maps the file again if it was replaced. Caller must hold the lock """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self._snapshot, self._file_id = None, None
+            return
+        file_id = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if file_id == self._file_id:
+            return
+        with open(self.path, 'rb') as snapshot_file:
+            # The old mapping isn't closed: requests still reading it keep it alive
+            self._snapshot = _MappedSnapshot(snapshot_file)
+        self._file_id = file_id
+
+    def exported_at(self):
+        """ When the snapshot being served was written (Unix time), or None """
+        snapshot = self._current()
+        return snapshot.exported_at if snapshot else None
+
+    def get(self, place_id):
+        """ The record of a place, or None """
+        snapshot = self._current()
+        if snapshot is None:
+            return None
+        try:
+            key = uuid.UUID(place_id).bytes
+        except (ValueError, TypeError, AttributeError):
+            return None
+        return snapshot.find(key)
+
+    def get_many(self, place_ids):
+        """ The records of every one of place_ids, or None if any of them is missing """
+        records = []
+        for place_id in dict.fromkeys(place_ids):
+            record = self.get(place_id)
+            if record is None:
+                return None
+            records.append(record)
+        return records
+
+    def page(self, offset=0, limit=None):
+        """ (records, total) of the listing in its default order, or None without a snapshot """
+        snapshot = self._current()
+        if snapshot is None:
+            return None
+        stop = snapshot.count if limit is None else min(snapshot.count, offset + limit)
+        records = [snapshot.record(*snapshot.entry(position)[1:]) for position in range(offset, stop)]
+        return records, snapshot.count
@@ -0,0 +1,98 @@
+""" In-process publish/subscribe for pushing live updates to open pages """
+
+import itertools
+import queue
+import threading
+
+# Topic that receives every event, whatever its own topic
+ALL = '*'
+
+# Put in a subscriber's queue when it was dropped for falling behind
+DROPPED = object()
+
+
+class Subscription:
+    """ One listener's bounded queue of events. Iterate get() until it returns DROPPED """
+
+    def __init__(self, bus, topic, max_queued):
+        self.bus = bus
+        self.topic = topic
+        self.dropped = False
+        self._queue = queue.Queue(max_queued)
+
+    def get(self, timeout=None):
+        """ The next event, DROPPED once the subscription was dropped, or None after `timeout` seconds """
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _offer(self, event):
+        """ Queues the event; returns False if the queue is full. Called by the bus """
+        try:
+            self._queue.put_nowait(event)
+            return True
+        except queue.Full:
+            return False
+
+    def _drop(self):
+        """ Replaces whatever is queued by DROPPED, so the reader finds out right away """
+        self.dropped = True
+        with self._queue.mutex:
+            self._queue.queue.clear()
+            self._queue.queue.append(DROPPED)
+            self._queue.not_empty.notify()
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    """
+    Topics (e.g. a place id) with any number of subscribers, each with its own
+    bounded queue. publish() never blocks: a subscriber whose queue is full is
+    too slow to keep up, so it is dropped (and told so) rather than holding up
+    everyone else or growing without limit. Its client reconnects and resyncs.
+    """
+
+    def __init__(self, max_queued=100, max_subscribers=1000):
+        self.max_queued = max_queued
+        self.max_subscribers = max_subscribers
+        self._lock = threading.Lock()
+        self._topics = {}   # topic -> set of Subscription
+        self._count = 0
+        self._ids = itertools.count(1)
+
+    def subscribe(self, topic=ALL):
+        """ A new Subscription to `topic`, or None if max_subscribers are already listening """
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                return None
+            subscription = Subscription(self, topic, self.max_queued)
+            self._topics.setdefault(topic, set()).add(subscription)
+            self._count += 1
+            return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._topics.get(subscription.topic)
+            if subscribers is None or subscription not in subscribers:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._topics[subscription.topic]
+            self._count -= 1
+
+    def subscriber_count(self):
+        return self._count
+
+    def publish(self, topic, event_type, data):
+        """ Sends (event id, event_type, data) to the subscribers of `topic` and of ALL """
+        with self._lock:
+            subscribers = list(self._topics.get(topic, ())) + list(self._topics.get(ALL, ()))
+            event = (next(self._ids), event_type, data)
+
+        for subscription in subscribers:
+            if not subscription._offer(event):
+                subscription._drop()
+                self.unsubscribe(subscription)
@@ -1,16 +1,133 @@
-from app.persistence.repository import SQLAlchemyRepository
+import os
+import tempfile
+from sqlalchemy import select, or_
 from app.persistence.user_repository import UserRepository
+from app.persistence.amenity_repository import AmenityRepository
+from app.persistence.place_repository import PlaceRepository
+from app.persistence.review_repository import ReviewRepository
+from app.persistence import unit_of_work, change_log
+from app.services.amenity_catalog import AmenityCatalog
+from app.services.amenity_index import AmenityIndex, MATCH_ANY
+from app.services.place_snapshot import PlaceSnapshot
+from app.services.place_text_index import PlaceTextIndex
+from app.services.event_bus import EventBus
+from app.services.host_dashboard import HostDashboards
+from app.services.cache import create_cache, CacheBroadcast
+from app.services import data_snapshot
 from app.models.user import User
 from app.models.amenity import Amenity
 from app.models.place import Place
 from app.models.review import Review
 
+# Where the keyword search index is saved between runs (see PlaceTextIndex)
+SEARCH_INDEX_PATH = os.getenv('HBNB_SEARCH_INDEX_PATH',
+                              os.path.join(tempfile.gettempdir(), 'hbnb-search-index.json'))
+
+# Live updates (see GET /api/v1/stream): events buffered per open page before it counts
+# as too slow and is dropped, and how many pages may listen at once per worker
+STREAM_QUEUE_SIZE = int(os.getenv('HBNB_STREAM_QUEUE_SIZE', '100'))
+STREAM_MAX_SUBSCRIBERS = int(os.getenv('HBNB_STREAM_MAX_SUBSCRIBERS', '1000'))
+
+# Cache shared by the workers (see app/services/cache.py): 'memory://' (this worker only),
+# 'sqlite:///<path>' (every worker on the host) or 'redis://host:port/db'
+CACHE_URL = os.getenv('HBNB_CACHE_URL', 'memory://')
+
+# Read-only snapshot file (see app/services/data_snapshot.py and export_snapshot.py). When
+# set, anonymous place GETs are served from it, without the DB
+SNAPSHOT_PATH = os.getenv('HBNB_SNAPSHOT_PATH')
+
+# Most ids put in one IN (...) when places are loaded by id
+ROWS_PER_QUERY = 500
+
 class HBnBFacade:
     def __init__(self):
         self.user_repo = UserRepository()
-        self.amenity_repo = SQLAlchemyRepository(Amenity)
-        self.place_repo = SQLAlchemyRepository(Place)
-        self.review_repo = SQLAlchemyRepository(Review)
+        self.amenity_repo = AmenityRepository()
+        self.place_repo = PlaceRepository()
+        self.review_repo = ReviewRepository()
+
+        # Writes are broadcast to the other workers sharing the cache, which then update
+        # what they derived from that data (see _reload_changed). A review is published
+        # as its place: the place's average rating is what the others keep
+        self.cache = create_cache(CACHE_URL)
+        self.broadcast = CacheBroadcast(self.cache, ['user', 'amenity', 'place', 'review'], self._reload_changed)
+        for topic, repo in (('user', self.user_repo), ('amenity', self.amenity_repo), ('place', self.place_repo)):
+            repo.on_change(lambda action, obj, topic=topic: self.broadcast.publish(topic, obj.id))
+        self.review_repo.on_change(lambda action, review: self.broadcast.publish('review', review.place_id))
+
+        # Amenity names are resolved from memory instead of the amenities table
+        self.amenity_catalog = AmenityCatalog(self.amenity_repo)
+        # ... and amenity filters are answered from bitmaps before any place is fetched
+        self.amenity_index = AmenityIndex(self.place_repo)
+        self.place_repo.on_change(self._place_changed)
+
+        # Price / location / rating filters run on NumPy arrays instead of the places table
+        self.place_snapshot = PlaceSnapshot(self.place_repo, self.review_repo)
+
+        # Keyword search over titles and descriptions, ranked with BM25
+        self.place_text_index = PlaceTextIndex(self.place_repo, SEARCH_INDEX_PATH)
+
+        # Per-place stats of each host, computed in one query and kept until their places change
+        self.host_dashboards = HostDashboards(self.user_repo, self.place_repo, self.review_repo, self.cache)
+
+        # Anonymous place pages straight from the memory-mapped snapshot, if there is one
+        self.read_snapshot = data_snapshot.SnapshotReader(SNAPSHOT_PATH) if SNAPSHOT_PATH else None
+
+        # Committed place and review changes are pushed to the pages showing them
+        self.events = EventBus(STREAM_QUEUE_SIZE, STREAM_MAX_SUBSCRIBERS)
+        self.place_repo.on_change(self._publish_place)
+        self.review_repo.on_change(self._publish_review)
+
+    def _reload_changed(self, topic, ids):
+        """
+        Another worker changed `topic` data: the in-memory indexes built from it update
+        the places in `ids`, or reload on next use when ids is None (unknown)
+        """
+        if topic == 'amenity':
+            # The whole catalog is one small query
+            self.amenity_catalog.invalidate()
+        elif topic == 'place' and ids is None:
+            self.amenity_index.invalidate()
+            self.place_snapshot.invalidate()
+            self.place_text_index.invalidate()
+        elif topic == 'place':
+            place_ids = sorted(ids)
+            self.amenity_index.refresh_places(place_ids)
+            self.place_snapshot.refresh_places(place_ids)
+            self.place_text_index.refresh_places(place_ids)
+        elif topic == 'review' and ids is None:
+            self.place_snapshot.invalidate()
+        elif topic == 'review':
+            # Only their average ratings
+            self.place_snapshot.refresh_ratings(ids)
+
+    def _place_changed(self, action, place):
+        if action == 'delete':
+            self.amenity_index.remove_places([place.id])
+
+    def _publish_place(self, action, place):
+        data = {'action': change_log.ACTIONS[action], 'id': place.id}
+        if action != 'delete':
+            data.update(title=place.title, description=place.description, price=place.price)
+        self.events.publish(place.id, 'place', data)
+
+    def _publish_review(self, action, review):
+        # The rating even on delete: pages showing the average take it out
+        data = {'action': change_log.ACTIONS[action], 'id': review.id, 'place_id': review.place_id,
+                'rating': review.rating}
+        if action != 'delete':
+            data.update(user_id=review.user_id, text=review.text)
+        self.events.publish(review.place_id, 'review', data)
+
+    def transaction(self):
+        """
+        Groups several facade calls into one commit (or one rollback on error):
+
+            with facade.transaction():
+                place = facade.create_place(...)
+                facade.create_review(...)
+        """
+        return unit_of_work.transaction()
 
     # In case anyone is curious about the **
     # https://www.geeksforgeeks.org/what-does-the-double-star-operator-mean-in-python/
@@ -22,22 +139,43 @@ class HBnBFacade:
         self.user_repo.add(user)
         return user
 
-    def get_user(self, user_id):
-        return self.user_repo.get(user_id)
+    def get_user(self, user_id, fields=None):
+        return self.user_repo.get(user_id, fields)
+
+    def get_users(self, user_ids, fields=None):
+        return self.user_repo.get_many(user_ids, fields=fields)
 
     def get_user_by_email(self, email):
         return self.user_repo.get_user_by_email(email)
 
-    def get_all_users(self):
-        return self.user_repo.get_all()
+    def get_all_users(self, fields=None):
+        return self.user_repo.get_all(fields)
+
+    def list_users(self, fields=None):
+        """ Read-only rows of every user, for listings """
+        return self.user_repo.get_rows(fields)
 
     def update_user(self, user_id, user_data):
         self.user_repo.update(user_id, user_data)
 
     def delete_user(self, user_id):
-        self.user_repo.delete(user_id)
+        """
+        Deletes the user along with their places (and every review of those) and their reviews.
+        Done with a few set-based DELETEs in one transaction, however many rows that is,
+        instead of loading every place and review to delete them one at a time.
+        """
+        with self.transaction():
+            owned_places = select(Place.id).where(Place._owner_id == user_id).scalar_subquery()
+            self.review_repo.delete_where(or_(Review._user_id == user_id, Review._place_id.in_(owned_places)))
+            self.place_repo.delete_amenity_links(owned_places)
+            self.place_repo.delete_where(Place._owner_id == user_id)
+            self.user_repo.delete_where(User.id == user_id)
 
     # --- User Relationship methods ---
+    def get_host_dashboard(self, user_id):
+        """ Review count, average rating, latest review and amenity count of each place of the user """
+        return self.host_dashboards.get(user_id)
+
     def get_user_places(self, user_id):
         owner = self.user_repo.get(user_id)
         return owner.properties_r
@@ -50,11 +188,33 @@ class HBnBFacade:
     # --- Amenities ---
     # Used during record insertion to prevent duplicate amenities
     def get_amenity_by_name(self, name):
-        return self.amenity_repo.get_by_attribute('name', name)
+        # The catalog answers "no such amenity" without a query
+        amenity_id = self.amenity_catalog.id_for_name(name)
+        if amenity_id is None:
+            return None
+        return self.amenity_repo.get(amenity_id)
+
+    def get_amenity_name(self, amenity_id):
+        """
+        Name of the amenity, or None if there is no such amenity. An id the catalog
+        doesn't know may have been added by another worker before its broadcast got
+        here: if the DB has it, the catalog is reloaded once
+        """
+        name = self.amenity_catalog.name(amenity_id)
+        if name is None and self.amenity_repo.get(amenity_id, ['id']) is not None:
+            self.amenity_catalog.invalidate()
+            name = self.amenity_catalog.name(amenity_id)
+        return name
+
+    def get_amenity_catalog(self):
+        """ All amenities as (id, name) pairs, straight from memory """
+        return self.amenity_catalog.all()
 
     def create_amenity(self, amenity_data):
         amenity = Amenity(**amenity_data)
         self.amenity_repo.add(amenity)
+        # Only reload the catalog once the new amenity is visible to everyone
+        unit_of_work.after_commit(self.amenity_catalog.invalidate)
         return amenity
 
     def get_amenity(self, amenity_id):
@@ -65,36 +225,167 @@ class HBnBFacade:
 
     def update_amenity(self, amenity_id, amenity_data):
         self.amenity_repo.update(amenity_id, amenity_data)
+        unit_of_work.after_commit(self.amenity_catalog.invalidate)
 
     # --- Amenity Relationship methods ---
     def get_places_with_specific_amenity(self, amenity_id):
-        amenity = self.amenity_repo.get(amenity_id)
-        return amenity.places_r
+        return self.place_repo.get_by_amenity(amenity_id)
 
 
     # --- Places ---
-    def create_place(self, place_data):
-        place = Place(**place_data)
-        self.place_repo.add(place)
+    def create_place(self, place_data, amenity_ids=None):
+        """ Creates the place and links its amenities, all in one commit """
+        with self.transaction():
+            place = Place(**place_data)
+            self.place_repo.add(place)
+            if amenity_ids:
+                place.amenities_r.extend(self.amenity_repo.get_many(amenity_ids))
+                unit_of_work.after_commit(lambda: self.amenity_index.update_place(
+                    place.id, added=[amenity.id for amenity in place.amenities_r]))
         return place
 
-    def get_place(self, place_id):
-        return self.place_repo.get(place_id)
+    # `fields` (column names) limits which columns are loaded - see SQLAlchemyRepository._query
+    def get_place(self, place_id, fields=None):
+        return self.place_repo.get(place_id, fields)
+
+    def get_places(self, place_ids, fields=None):
+        """ Places (with their owner already loaded) for all the ids that exist """
+        return self.place_repo.get_many(place_ids, fields=fields)
 
-    def get_all_places(self):
-        return self.place_repo.get_all()
+    def get_all_places(self, fields=None):
+        return self.place_repo.get_all(fields)
 
     def update_place(self, place_id, place_data):
         self.place_repo.update(place_id, place_data)
 
+    def delete_place(self, place_id):
+        """ Deletes the place with its reviews and amenity links, in one transaction """
+        with self.transaction():
+            self.review_repo.delete_where(Review._place_id == place_id)
+            self.place_repo.delete_amenity_links([place_id])
+            return self.place_repo.delete_where(Place.id == place_id) > 0
+
+    def search_places(self, name=None, min_price=None, amenity_names=None, match=MATCH_ANY):
+        """
+        Places matching the keywords in `name` (best match first), that cost at least min_price
+        and have the amenities. `match` says whether places need any (MATCH_ANY) or all
+        (MATCH_ALL) of the amenities.
+        """
+        place_ids = None
+        if amenity_names:
+            amenity_ids = [self.amenity_catalog.id_for_name(name) for name in amenity_names]
+            # No place can have an amenity that doesn't exist
+            if match != MATCH_ANY and None in amenity_ids:
+                return []
+            amenity_ids = [amenity_id for amenity_id in amenity_ids if amenity_id is not None]
+            place_ids = self.amenity_index.match(amenity_ids, match)
+            if not place_ids:
+                return []
+        if min_price:
+            place_ids = self.place_snapshot.filter(min_price=min_price, place_ids=place_ids)
+            if not place_ids:
+                return []
+        if name and name.strip():
+            ranked = self.place_text_index.search(name, place_ids)
+            return self.place_repo.get_many([place_id for place_id, _ in ranked])
+        if place_ids is None:
+            return self.place_repo.get_all()
+        return self.place_repo.get_many(place_ids)
+
+    def list_places(self, min_price=None, max_price=None, place_ids=None, sort=None,
+                    page=None, per_page=None, fields=None):
+        """
+        Places filtered, sorted and paged by the DB, as read-only rows. Without a page,
+        every match is returned. Returns (rows, total number of matches or None when not paging).
+        """
+        if page is None:
+            return self.place_repo.list_places(min_price, max_price, place_ids, sort, fields=fields)
+        return self.place_repo.list_places(min_price, max_price, place_ids, sort,
+                                           offset=(page - 1) * per_page, limit=per_page,
+                                           fields=fields, with_total=True)
+
+    def _places_with_amenities(self, amenity_names, match):
+        """ Ids of the places with the named amenities, or None when there is no amenity filter """
+        if not amenity_names:
+            return None
+        amenity_ids = [self.amenity_catalog.id_for_name(name) for name in amenity_names]
+        if match != MATCH_ANY and None in amenity_ids:
+            return []
+        return self.amenity_index.match([amenity_id for amenity_id in amenity_ids if amenity_id is not None], match)
+
+    def filter_places(self, min_price=None, max_price=None, bbox=None, min_rating=None,
+                      amenity_names=None, match=MATCH_ANY):
+        """
+        Ids of the places that pass the price / bounding box / rating / amenity filters,
+        worked out in memory (see PlaceSnapshot) without querying the places table
+        """
+        place_ids = self._places_with_amenities(amenity_names, match)
+        return self.place_snapshot.filter(min_price, max_price, bbox, min_rating, place_ids)
+
+    def filter_places_page(self, min_price=None, max_price=None, bbox=None, min_rating=None,
+                           amenity_names=None, match=MATCH_ANY, sort=None, page=None, per_page=None):
+        """
+        Same as filter_places(), but sorted (see PLACE_SORTS) and paged in memory too:
+        returns (ids of the page, in order, total number of matches or None when not paging)
+        """
+        place_ids = self._places_with_amenities(amenity_names, match)
+        offset, limit = ((page - 1) * per_page, per_page) if page is not None else (0, None)
+        page_ids, total = self.place_snapshot.page(min_price, max_price, bbox, min_rating, place_ids,
+                                                   sort, offset, limit)
+        return page_ids, total if page is not None else None
+
+    def get_place_rows(self, place_ids, fields=None):
+        """
+        Read-only rows (see list_places) of the places, in the order of place_ids,
+        loaded ROWS_PER_QUERY at a time so that no IN list gets too long
+        """
+        rows = {}
+        for start in range(0, len(place_ids), ROWS_PER_QUERY):
+            chunk, _ = self.place_repo.list_places(place_ids=place_ids[start:start + ROWS_PER_QUERY], fields=fields)
+            rows.update((row.id, row) for row in chunk)
+        # A place deleted since the snapshot was read is left out
+        return [rows[place_id] for place_id in place_ids if place_id in rows]
+
     # --- Place Relationship methods ---
     def get_place_amenities(self, place_id):
         place = self.place_repo.get(place_id)
         return place.amenities_r
 
+    def get_amenities_for_places(self, place_ids):
+        """
+        Returns {place_id: [(amenity_id, name), ...]} using one query on place_amenity;
+        the names come from the in-memory catalog
+        """
+        amenity_ids = self.place_repo.get_amenity_ids(place_ids)
+        catalog = self.amenity_catalog
+
+        # An id we don't know was added by another worker - reload the catalog once
+        if any(catalog.name(amenity_id) is None for ids in amenity_ids.values() for amenity_id in ids):
+            catalog.invalidate()
+
+        return {
+            place_id: [(amenity_id, catalog.name(amenity_id)) for amenity_id in ids]
+            for place_id, ids in amenity_ids.items()
+        }
+
+    def set_place_amenities(self, place_id, amenity_ids):
+        """ Replaces the place's amenities with amenity_ids; returns the new [(id, name), ...] """
+        amenity_ids = list(dict.fromkeys(amenity_ids))
+        added, removed = self.place_repo.set_amenity_ids(place_id, amenity_ids)
+        unit_of_work.after_commit(lambda: self.amenity_index.update_place(place_id, added, removed))
+        unit_of_work.after_commit(lambda: self.host_dashboards.invalidate_place(place_id))
+        unit_of_work.after_commit(lambda: self.broadcast.publish('place', place_id))
+        return [(amenity_id, self.amenity_catalog.name(amenity_id)) for amenity_id in amenity_ids]
+
     def get_place_reviews(self, place_id):
-        place = self.place_repo.get(place_id)
-        return place.reviews_r
+        # Writers are loaded along with the reviews (no lazy load per review)
+        return self.review_repo.get_for_place(place_id)
+
+    def get_place_reviews_page(self, place_id, page, per_page):
+        """ One page of a place's reviews (newest first) plus the count and average rating """
+        reviews = self.review_repo.get_page_for_place(place_id, (page - 1) * per_page, per_page)
+        total, average_rating = self.review_repo.get_stats_for_place(place_id)
+        return reviews, total, average_rating
 
     def get_place_owner(self, place_id):
         place = self.place_repo.get(place_id)
@@ -107,11 +398,21 @@ class HBnBFacade:
         self.review_repo.add(review)
         return review
 
-    def get_review(self, review_id):
-        return self.review_repo.get(review_id)
+    def get_review(self, review_id, fields=None):
+        return self.review_repo.get(review_id, fields)
+
+    def get_reviews(self, review_ids, fields=None):
+        return self.review_repo.get_many(review_ids, fields=fields)
+
+    def get_all_reviews(self, fields=None):
+        return self.review_repo.get_all(fields)
+
+    def list_reviews(self, fields=None):
+        """ Read-only rows of every review, for listings """
+        return self.review_repo.get_rows(fields)
 
-    def get_all_reviews(self):
-        return self.review_repo.get_all()
+    def has_reviewed(self, user_id, place_id):
+        return self.review_repo.exists_for(user_id, place_id)
 
     def get_reviews_by_place(self, place_id):
         return self.review_repo.get_by_attribute('place_id', place_id)
@@ -129,4 +430,26 @@ class HBnBFacade:
 
     def get_reviewed_place(self, review_id):
         review = self.review_repo.get(review_id)
-        return review.place_r
\ No newline at end of file
+        return review.place_r
+
+    # --- Read-only snapshot ---
+    def export_snapshot(self, path, since_seq=None):
+        """
+        Writes the snapshot file of every place (see data_snapshot.export), unless nothing
+        changed since the export made at change seq `since_seq`. Returns the change seq
+        the export is up to date with.
+        """
+        # Read before the data, so that a write made during the export triggers the next one
+        seq = change_log.settled_seq()
+        if seq != since_seq or not os.path.exists(path):
+            data_snapshot.export(path, self.place_repo, self.amenity_repo, self.review_repo, seq)
+        return seq
+
+    # --- Change feed ---
+    def get_changes(self, since=0, limit=100, entities=None):
+        """ [(seq, entity, entity_id, action, changed_at), ...] logged after `since`, oldest first """
+        return change_log.read(since, limit, entities)
+
+    def get_pruned_change_seq(self):
+        """ The seq up to which changes were pruned from the log (0 if none were) """
+        return change_log.pruned_seq()
@@ -0,0 +1,102 @@
+""" Cache of the host dashboards (per-place review and amenity stats) """
+
+import threading
+
+
+class HostDashboards:
+    """
+    A host's dashboard is computed with one aggregate query (see
+    PlaceRepository.get_host_stats) and then kept in the cache (see cache.py),
+    shared by every worker using it, until one of their places or a review of
+    one of them changes - which the change hooks of the repositories tell us.
+    Next to each dashboard, the cache maps its places to their owner.
+    """
+
+    # Bounds how long a dashboard computed by one worker while another one changed
+    # its data can be served
+    TTL = 3600
+
+    def __init__(self, user_repo, place_repo, review_repo, cache):
+        self.user_repo = user_repo
+        self.place_repo = place_repo
+        self.cache = cache
+        self._lock = threading.Lock()
+        # Bumped by every invalidation, so that a dashboard computed while its data
+        # changed (in this worker) isn't cached
+        self._generation = 0
+
+        user_repo.on_change(self._user_changed)
+        place_repo.on_change(self._place_changed)
+        review_repo.on_change(self._review_changed)
+
+    def get(self, owner_id):
+        """ The dashboard of the user, or None if there is no such user """
+        with self._lock:
+            generation = self._generation
+        dashboard = self.cache.get('dashboard:' + owner_id)
+        if dashboard is not None:
+            return dashboard
+
+        rows = self.place_repo.get_host_stats(owner_id)
+        if not rows and self.user_repo.get(owner_id, ['id']) is None:
+            return None
+        dashboard = self._build(owner_id, rows)
+
+        with self._lock:
+            if generation == self._generation:
+                entries = {'dashboard-owner:' + place['id']: owner_id for place in dashboard['places']}
+                entries['dashboard:' + owner_id] = dashboard
+                self.cache.set_many(entries, self.TTL)
+        return dashboard
+
+    @staticmethod
+    def _build(owner_id, rows):
+        places = [{
+            'id': row.id,
+            'title': row.title,
+            'price': row.price,
+            'review_count': row.review_count,
+            'average_rating': float(row.average_rating) if row.average_rating is not None else None,
+            'latest_review_at': row.latest_review_at.isoformat() if row.latest_review_at else None,
+            'amenity_count': row.amenity_count,
+        } for row in rows]
+
+        review_count = sum(place['review_count'] for place in places)
+        rating_total = sum(place['average_rating'] * place['review_count']
+                           for place in places if place['review_count'])
+        latest = [place['latest_review_at'] for place in places if place['latest_review_at']]
+        return {
+            'user_id': owner_id,
+            'place_count': len(places),
+            'review_count': review_count,
+            'average_rating': rating_total / review_count if review_count else None,
+            'latest_review_at': max(latest) if latest else None,
+            'places': places,
+        }
+
+    # --- Invalidation ---
+    def invalidate(self, owner_id):
+        """ The next get() recomputes the user's dashboard """
+        with self._lock:
+            self._generation += 1
+        self.cache.delete('dashboard:' + owner_id)
+
+    def invalidate_place(self, place_id):
+        """ Recompute the dashboard that shows this place, if one is cached """
+        with self._lock:
+            self._generation += 1
+        owner_id = self.cache.get('dashboard-owner:' + place_id)
+        if owner_id is not None:
+            self.cache.delete('dashboard:' + owner_id, 'dashboard-owner:' + place_id)
+
+    def _user_changed(self, action, user):
+        if action == 'delete':
+            self.invalidate(user.id)
+
+    def _place_changed(self, action, place):
+        # A row from a bulk delete carries owner_id too
+        self.invalidate(place.owner_id)
+        self.invalidate_place(place.id)
+
+    def _review_changed(self, action, review):
+        self.invalidate_place(review.place_id)
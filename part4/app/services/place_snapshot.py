@@ -0,0 +1,224 @@
+""" In-process columnar copy of the places table for fast numeric filtering """
+
+import threading
+
+# NumPy is imported by the methods that use it: importing it takes longer than the
+# rest of create_app(), and the snapshot is only loaded on first use anyway
+
+
+class PlaceSnapshot:
+    """
+    Keeps price, latitude, longitude, creation time and average rating of every
+    place in NumPy arrays (one row per place), so that "price between X and Y
+    inside this map box rated 4+" is a handful of vectorized comparisons instead
+    of a table scan. The matches are sorted and paged here too, and only the ids
+    of the page are then fetched from the DB.
+
+    The snapshot is loaded on first use and kept current through the change
+    hooks of the place and review repositories; invalidate() forces a reload.
+    """
+
+    INITIAL_CAPACITY = 64
+
+    def __init__(self, place_repo, review_repo):
+        self.place_repo = place_repo
+        self.review_repo = review_repo
+        self._lock = threading.Lock()
+        self._loaded = False
+
+        place_repo.on_change(self._place_changed)
+        review_repo.on_change(self._review_changed)
+
+    def invalidate(self):
+        """ The next lookup reloads the snapshot from the DB """
+        with self._lock:
+            self._loaded = False
+
+    # --- Storage ---
+    def _allocate(self, capacity):
+        import numpy as np
+        self._price = np.zeros(capacity)
+        self._latitude = np.zeros(capacity)
+        self._longitude = np.zeros(capacity)
+        self._created = np.zeros(capacity)
+        self._rating = np.full(capacity, np.nan)
+        # Rows of deleted places stay behind as dead rows
+        self._alive = np.zeros(capacity, dtype=bool)
+
+    def _grow(self):
+        """ Doubles the capacity of every column """
+        size = self._size
+        old = (self._price, self._latitude, self._longitude, self._created, self._rating, self._alive)
+        self._allocate(max(self.INITIAL_CAPACITY, 2 * len(self._alive)))
+        for new_column, old_column in zip((self._price, self._latitude, self._longitude, self._created,
+                                           self._rating, self._alive), old):
+            new_column[:size] = old_column[:size]
+
+    def _ensure_loaded(self):
+        """ Caller must hold the lock """
+        if self._loaded:
+            return
+        import numpy as np
+
+        rows = self.place_repo.get_snapshot_rows()
+        ratings = self.review_repo.get_average_ratings()
+
+        self._size = len(rows)
+        self._allocate(max(self.INITIAL_CAPACITY, self._size))
+        self._place_ids = [row[0] for row in rows]
+        self._row_of = {place_id: row for row, place_id in enumerate(self._place_ids)}
+
+        if rows:
+            columns = np.array([row[1:4] for row in rows], dtype=float)
+            self._price[:self._size] = columns[:, 0]
+            self._latitude[:self._size] = columns[:, 1]
+            self._longitude[:self._size] = columns[:, 2]
+            self._created[:self._size] = [row[4].timestamp() for row in rows]
+            self._alive[:self._size] = True
+        for place_id, rating in ratings.items():
+            row = self._row_of.get(place_id)
+            if row is not None:
+                self._rating[row] = rating
+
+        self._stale_ratings = set()
+        self._loaded = True
+
+    def _set_row(self, place_id, price, latitude, longitude, created_at):
+        """ Adds or updates the row of a place. Caller must hold the lock """
+        row = self._row_of.get(place_id)
+        if row is None:
+            if self._size == len(self._alive):
+                self._grow()
+            row = self._size
+            self._size += 1
+            self._place_ids.append(place_id)
+            self._row_of[place_id] = row
+
+        self._price[row] = price
+        self._latitude[row] = latitude
+        self._longitude[row] = longitude
+        self._created[row] = created_at.timestamp()
+        self._alive[row] = True
+
+    def _kill_row(self, place_id):
+        """ Caller must hold the lock """
+        row = self._row_of.get(place_id)
+        if row is not None:
+            self._alive[row] = False
+
+    # --- Change hooks ---
+    def _place_changed(self, action, place):
+        with self._lock:
+            if not self._loaded:
+                return
+            if action == 'delete':
+                self._kill_row(place.id)
+            else:
+                self._set_row(place.id, place.price, place.latitude, place.longitude, place.created_at)
+
+    def _review_changed(self, action, review):
+        # Only noted here: the averages are recomputed by the DB on the next lookup (so they
+        # can't drift), in one query however many reviews changed - e.g. all of a deleted user's
+        with self._lock:
+            if self._loaded:
+                self._stale_ratings.add(review.place_id)
+
+    # --- Changes made by other workers ---
+    def refresh_places(self, place_ids):
+        """ Reloads the rows of these places only (deleted ones go), and their ratings on next lookup """
+        if not self._loaded:
+            return
+        rows = self.place_repo.get_snapshot_rows(place_ids)
+        with self._lock:
+            if not self._loaded:
+                return
+            for place_id in set(place_ids) - {row[0] for row in rows}:
+                self._kill_row(place_id)
+            for row in rows:
+                self._set_row(*row)
+            self._stale_ratings.update(place_ids)
+
+    def refresh_ratings(self, place_ids):
+        """ The average ratings of these places are recomputed on the next lookup """
+        with self._lock:
+            if self._loaded:
+                self._stale_ratings.update(place_ids)
+
+    def _refresh_ratings(self):
+        """ Caller must hold the lock """
+        if not self._stale_ratings:
+            return
+        import numpy as np
+        place_ids, self._stale_ratings = self._stale_ratings, set()
+        ratings = self.review_repo.get_average_ratings(place_ids)
+        for place_id in place_ids:
+            row = self._row_of.get(place_id)
+            if row is not None:
+                self._rating[row] = ratings.get(place_id, np.nan)
+
+    # --- Queries ---
+    def _matching_rows(self, min_price, max_price, bbox, min_rating, place_ids):
+        """ Caller must hold the lock """
+        import numpy as np
+        self._ensure_loaded()
+        self._refresh_ratings()
+        size = self._size
+        mask = self._alive[:size].copy()
+
+        if min_price is not None:
+            mask &= self._price[:size] >= min_price
+        if max_price is not None:
+            mask &= self._price[:size] <= max_price
+        if bbox is not None:
+            min_latitude, min_longitude, max_latitude, max_longitude = bbox
+            latitude = self._latitude[:size]
+            longitude = self._longitude[:size]
+            mask &= (latitude >= min_latitude) & (latitude <= max_latitude)
+            mask &= (longitude >= min_longitude) & (longitude <= max_longitude)
+        if min_rating is not None:
+            mask &= self._rating[:size] >= min_rating
+        if place_ids is not None:
+            wanted = np.zeros(size, dtype=bool)
+            wanted[[self._row_of[place_id] for place_id in place_ids if place_id in self._row_of]] = True
+            mask &= wanted
+        return np.flatnonzero(mask)
+
+    def filter(self, min_price=None, max_price=None, bbox=None, min_rating=None, place_ids=None):
+        """
+        Ids of the places that match every filter given:
+            min_price / max_price - inclusive bounds on the price
+            bbox                  - (min_latitude, min_longitude, max_latitude, max_longitude)
+            min_rating            - average rating at least this (unreviewed places never match)
+            place_ids             - only consider these places
+        """
+        with self._lock:
+            rows = self._matching_rows(min_price, max_price, bbox, min_rating, place_ids)
+            place_id_list = self._place_ids
+
+        return [place_id_list[row] for row in rows]
+
+    def page(self, min_price=None, max_price=None, bbox=None, min_rating=None, place_ids=None,
+             sort=None, offset=0, limit=None):
+        """
+        (ids of one page of the places matching the filters (see filter), number of matches),
+        in the order the DB gives the listing (see PLACE_SORTS): by `sort`, then by id
+        """
+        import numpy as np
+        with self._lock:
+            rows = self._matching_rows(min_price, max_price, bbox, min_rating, place_ids)
+            # np.lexsort sorts by the last key first; the id breaks ties, as in the DB
+            keys = [np.array([self._place_ids[row] for row in rows], dtype=str)]
+            if sort == 'price':
+                keys.append(self._price[rows])
+            elif sort == '-price':
+                keys.append(-self._price[rows])
+            elif sort == 'created':
+                keys.append(-self._created[rows])
+            elif sort == 'rating':
+                # Best rated first, places without reviews last
+                rating = self._rating[rows]
+                keys += [-np.nan_to_num(rating), np.isnan(rating)]
+
+        order = np.lexsort(keys)
+        stop = None if limit is None else offset + limit
+        return [str(place_id) for place_id in keys[0][order[offset:stop]]], len(rows)
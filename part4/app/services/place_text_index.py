@@ -0,0 +1,265 @@
+""" In-process full-text index over place titles and descriptions, ranked with BM25 """
+
+import bisect
+import heapq
+import json
+import math
+import os
+import re
+import sys
+import threading
+import unicodedata
+from collections import Counter
+
+# Common words that say nothing about a place
+STOP_WORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or the this to with
+""".split())
+
+# Title words count this many times, so a match in the title outranks one in the description
+TITLE_WEIGHT = 2
+
+# BM25 parameters (the usual defaults)
+K1 = 1.2
+B = 0.75
+
+FILE_FORMAT_VERSION = 1
+
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """
+    Lower-cased, accent-free words of `text`, without stop words and with a
+    plural 's' dropped, so that "Cozy Cafés" and "cozy cafe" give the same terms
+    """
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char)).casefold()
+
+    terms = []
+    for word in _WORD.findall(text):
+        if word in STOP_WORDS or len(word) < 2:
+            continue
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+
+class PlaceTextIndex:
+    """
+    Inverted index: for every term, the places it appears in and how often.
+    Queries are scored with BM25 and the best places come first.
+
+    The index is built from the places table on first use (or loaded from
+    `path` if the file still matches the table), kept current through the
+    place repository's change hooks, and written back to `path` by save().
+    """
+
+    def __init__(self, place_repo, path=None):
+        self.place_repo = place_repo
+        self.path = path
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._dirty = False
+
+        place_repo.on_change(self._place_changed)
+
+    # --- Building ---
+    def _reset(self):
+        self._postings = {}       # term -> {place_id: term frequency}
+        self._doc_terms = {}      # place_id -> distinct terms, to undo its postings
+        self._doc_lengths = {}    # place_id -> number of terms
+        self._total_length = 0
+        self._sorted_terms = None
+        self._norms = None
+
+    def _add(self, place_id, title, description):
+        """ Caller must hold the lock """
+        place_id = sys.intern(place_id)
+        counts = Counter(tokenize(title) * TITLE_WEIGHT + tokenize(description))
+        for term, frequency in counts.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[sys.intern(term)] = {}
+                self._sorted_terms = None
+            postings[place_id] = frequency
+
+        length = sum(counts.values())
+        self._norms = None
+        self._doc_terms[place_id] = list(counts)
+        self._doc_lengths[place_id] = length
+        self._total_length += length
+
+    def _remove(self, place_id):
+        """ Caller must hold the lock """
+        for term in self._doc_terms.pop(place_id, ()):
+            postings = self._postings[term]
+            del postings[place_id]
+            if not postings:
+                del self._postings[term]
+                self._sorted_terms = None
+        self._total_length -= self._doc_lengths.pop(place_id, 0)
+        self._norms = None
+
+    def _ensure_loaded(self):
+        """ Caller must hold the lock """
+        if self._loaded:
+            return
+
+        if not self._load_file(self._fingerprint()):
+            self._reset()
+            for place_id, title, description in self.place_repo.get_text_rows():
+                self._add(place_id, title, description)
+            self._dirty = True
+        self._loaded = True
+
+    def _fingerprint(self):
+        """ Changes whenever a place is added, updated or deleted """
+        count, last_update = self.place_repo.get_change_marker()
+        return [count, last_update.isoformat() if last_update else None]
+
+    def invalidate(self):
+        """ The next lookup rebuilds the index from the DB """
+        with self._lock:
+            self._loaded = False
+
+    def warm_up(self):
+        """ Builds (or loads) the index now instead of on the first search """
+        with self._lock:
+            self._ensure_loaded()
+
+    # --- Persistence ---
+    def _load_file(self, fingerprint):
+        """ Loads the index saved by save() if it was built from the same data. Caller must hold the lock """
+        if not self.path or not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, encoding='utf-8') as index_file:
+                data = json.load(index_file)
+        except (OSError, ValueError):
+            return False
+        if data.get('version') != FILE_FORMAT_VERSION or data.get('fingerprint') != fingerprint:
+            return False
+
+        self._reset()
+        for term, postings in data['postings'].items():
+            term = sys.intern(term)
+            self._postings[term] = {sys.intern(place_id): frequency for place_id, frequency in postings}
+            for place_id, _ in postings:
+                self._doc_terms.setdefault(sys.intern(place_id), []).append(term)
+        self._doc_lengths = {sys.intern(place_id): length for place_id, length in data['lengths'].items()}
+        self._total_length = sum(self._doc_lengths.values())
+        self._norms = None
+        self._dirty = False
+        return True
+
+    def save(self):
+        """ Writes the index to `path` (if set and changed) so the next start can skip the rebuild """
+        if not self.path:
+            return
+        with self._lock:
+            if not self._loaded or not self._dirty:
+                return
+            data = {
+                'version': FILE_FORMAT_VERSION,
+                'fingerprint': self._fingerprint(),
+                'lengths': self._doc_lengths,
+                'postings': {term: list(postings.items()) for term, postings in self._postings.items()},
+            }
+            self._dirty = False
+
+        # Written next to the target and renamed over it, so readers never see half a file
+        temp_path = '{}.{}.tmp'.format(self.path, os.getpid())
+        with open(temp_path, 'w', encoding='utf-8') as index_file:
+            json.dump(data, index_file, separators=(',', ':'))
+        os.replace(temp_path, self.path)
+
+    # --- Change hook ---
+    def _place_changed(self, action, place):
+        with self._lock:
+            if not self._loaded:
+                return
+            self._remove(place.id)
+            if action != 'delete':
+                self._add(place.id, place.title, place.description)
+            self._dirty = True
+
+    def refresh_places(self, place_ids):
+        """ Reindexes these places only (deleted ones go), e.g. after another worker changed them """
+        if not self._loaded:
+            return
+        rows = self.place_repo.get_text_rows(place_ids)
+        with self._lock:
+            if not self._loaded:
+                return
+            for place_id in place_ids:
+                self._remove(place_id)
+            for place_id, title, description in rows:
+                self._add(place_id, title, description)
+            self._dirty = True
+
+    # --- Queries ---
+    def _expand_prefix(self, prefix):
+        """ Indexed terms starting with prefix. Caller must hold the lock """
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self._postings)
+        terms = []
+        position = bisect.bisect_left(self._sorted_terms, prefix)
+        while position < len(self._sorted_terms) and self._sorted_terms[position].startswith(prefix):
+            terms.append(self._sorted_terms[position])
+            position += 1
+        return terms
+
+    def search(self, query, place_ids=None, limit=None):
+        """
+        [(place_id, score), ...] of the places matching any word of `query`, best first.
+        The last word also matches as a prefix ("coz" finds "cozy"), for search-as-you-type.
+        `place_ids` restricts the candidates (e.g. to those that passed other filters).
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        allowed = set(place_ids) if place_ids is not None else None
+
+        with self._lock:
+            self._ensure_loaded()
+            doc_count = len(self._doc_lengths)
+            if not doc_count:
+                return []
+            length_norms = self._length_norms()
+
+            query_terms = set(terms)
+            if len(terms[-1]) >= 3:
+                query_terms.update(self._expand_prefix(terms[-1]))
+
+            scores = {}
+            for term in query_terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for place_id, frequency in postings.items():
+                    if allowed is not None and place_id not in allowed:
+                        continue
+                    scores[place_id] = scores.get(place_id, 0.0) + \
+                        idf * frequency * (K1 + 1) / (frequency + length_norms[place_id])
+
+        def rank(item):
+            return -item[1], item[0]
+        if limit:
+            return heapq.nsmallest(limit, scores.items(), key=rank)
+        return sorted(scores.items(), key=rank)
+
+    def _length_norms(self):
+        """
+        The document-length part of BM25 for every place, kept until the next change.
+        Caller must hold the lock.
+        """
+        if self._norms is None:
+            # 1 when no place has a single term (e.g. stop words only): nothing can match then
+            average_length = (self._total_length / len(self._doc_lengths)) or 1
+            self._norms = {place_id: K1 * (1 - B + B * length / average_length)
+                           for place_id, length in self._doc_lengths.items()}
+        return self._norms
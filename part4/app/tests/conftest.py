@@ -0,0 +1,88 @@
+""" Shared pytest fixtures for the HBnB test suite """
+
+import uuid
+from contextlib import contextmanager
+import pytest
+from app.persistence.query_monitor import track_queries, MODE_OFF
+
+
+@pytest.fixture(scope='session')
+def app():
+    """ A single app instance shared by the whole test session """
+    from app import create_app
+    from app.models.user import bcrypt
+    from bootstrap import bootstrap
+
+    # The minimum bcrypt cost keeps the many user creations and logins fast
+    bcrypt._log_rounds = 4
+
+    # The test DB (see ../../conftest.py) starts empty
+    bootstrap()
+    return create_app('testing')
+
+
+@pytest.fixture
+def client(app):
+    """ Flask test client """
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers(client):
+    """ Returns a function that logs a user in and builds the Authorization header """
+    def login(email='admin@hbnb.io', password='admin1234'):
+        response = client.post('/api/v1/auth/login', json={'email': email, 'password': password})
+        token = response.get_json()['access_token']
+        return {'Authorization': 'Bearer {}'.format(token)}
+    return login
+
+
+@pytest.fixture
+def make_user(app):
+    """
+    Returns a function that creates a user with a unique email (see user.email)
+
+    host = make_user('Host', password='dashboard')
+    """
+    from app.services import facade
+
+    def create(first_name='Test', last_name='User', password='password'):
+        return facade.create_user({'first_name': first_name, 'last_name': last_name, 'password': password,
+                                   'email': 'user.{}@example.com'.format(uuid.uuid4().hex)})
+    return create
+
+
+@pytest.fixture
+def make_place(app):
+    """
+    Returns a function that creates a place of `owner`, with defaults for the fields
+    not given (tests that search by location pass their own latitude and longitude)
+
+    place = make_place(host, price=40.0, latitude=9.0, amenity_ids=[wifi.id])
+    """
+    from app.services import facade
+
+    def create(owner, amenity_ids=None, **fields):
+        place_data = {'title': 'Test place', 'description': 'test', 'price': 10.0,
+                      'latitude': 0.0, 'longitude': 0.0}
+        place_data.update(fields, owner_id=owner.id)
+        return facade.create_place(place_data, amenity_ids)
+    return create
+
+
+@pytest.fixture
+def assert_max_queries():
+    """
+    Fails the test if the block issues more SQL statements than allowed
+
+    with assert_max_queries(2):
+        client.get('/api/v1/places/')
+    """
+    @contextmanager
+    def checker(max_queries):
+        with track_queries(mode=MODE_OFF) as monitor:
+            yield monitor
+        assert monitor.query_count <= max_queries, \
+            "Expected at most {} queries, got {}:\n{}".format(
+                max_queries, monitor.query_count, "\n".join(monitor.statements))
+    return checker
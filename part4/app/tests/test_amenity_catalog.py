@@ -0,0 +1,100 @@
+#!/usr/bin/python3
+""" Tests for the in-memory amenity catalog """
+
+import uuid
+import pytest
+
+
+@pytest.fixture
+def facade(app):
+    from app.services import facade
+    return facade
+
+
+def test_name_lookups_skip_the_db(facade, assert_max_queries):
+    """ Once loaded, the catalog answers name lookups without a query """
+    amenity = facade.create_amenity({'name': 'Catalog Sauna {}'.format(uuid.uuid4().hex[:8])})
+    facade.get_amenity_catalog()
+
+    with assert_max_queries(0):
+        assert facade.get_amenity_name(amenity.id) == amenity.name
+        assert facade.amenity_catalog.id_for_name(amenity.name.upper()) == amenity.id
+        assert facade.get_amenity_by_name('No such amenity {}'.format(uuid.uuid4().hex)) is None
+
+
+def test_amenities_of_other_workers_are_found(facade, client, auth_headers, make_user, make_place):
+    """ An amenity the catalog hasn't heard of yet is looked up, then the catalog reloads once """
+    from app.models.amenity import Amenity
+
+    facade.get_amenity_catalog()
+    # Created by another worker: the change hasn't reached this catalog
+    amenity = Amenity(name='Catalog Elsewhere {}'.format(uuid.uuid4().hex[:8]))
+    facade.amenity_repo.add(amenity)
+    version = facade.amenity_catalog.version
+
+    response = client.get('/api/v1/amenities/{}'.format(amenity.id))
+    assert response.status_code == 200 and response.get_json()['name'] == amenity.name
+    assert facade.amenity_catalog.version == version + 1
+
+    owner = make_user('Cat', 'Alog', password='catalog')
+    place = make_place(owner, title='Catalog elsewhere', latitude=2.5, longitude=2.5)
+    response = client.put('/api/v1/places/{}/amenities'.format(place.id), json={'amenities': [amenity.id]},
+                          headers=auth_headers(owner.email, 'catalog'))
+    assert response.status_code == 200
+
+    # An id that no worker knows costs one lookup and no reload
+    assert facade.get_amenity_name(str(uuid.uuid4())) is None
+    assert facade.amenity_catalog.version == version + 1
+
+
+def test_writes_bump_the_version(facade):
+    """ Creating or renaming an amenity refreshes the catalog """
+    amenity = facade.create_amenity({'name': 'Catalog Hot Tub {}'.format(uuid.uuid4().hex[:8])})
+    assert facade.get_amenity_name(amenity.id) == amenity.name
+
+    version = facade.amenity_catalog.version
+    new_name = 'Catalog Jacuzzi {}'.format(uuid.uuid4().hex[:8])
+    facade.update_amenity(amenity.id, {'name': new_name})
+
+    assert facade.amenity_catalog.version == version + 1
+    assert facade.get_amenity_name(amenity.id) == new_name
+
+
+def test_place_listing_query_count_is_flat(facade, client, assert_max_queries, make_user, make_place):
+    """ Listing places costs the same number of queries however many places there are """
+    from app.persistence import db_session
+
+    owner = make_user('Cat', 'Alog')
+    amenity = facade.create_amenity({'name': 'Catalog Wi-Fi {}'.format(uuid.uuid4().hex[:8])})
+    for i in range(8):
+        place = make_place(owner, title='Catalog place {}'.format(i), price=20.0, latitude=2.0, longitude=2.0)
+        place.amenities_r.append(amenity)
+    db_session.commit()
+    facade.get_amenity_catalog()
+
+    with assert_max_queries(2):
+        response = client.get('/api/v1/places/')
+
+    assert response.status_code == 200
+    listed = [place for place in response.get_json() if place['title'].startswith('Catalog place')]
+    assert all(amenity.name in place['amenities'] for place in listed)
+
+
+def test_search_by_amenity_name(facade, client, make_user, make_place):
+    """ The search endpoint resolves amenity names through the catalog """
+    from app.persistence import db_session
+
+    owner = make_user('Sea', 'Rch')
+    amenity = facade.create_amenity({'name': 'Search Pool {}'.format(uuid.uuid4().hex[:8])})
+    place = make_place(owner, title='Searchable hut', price=30.0, latitude=3.0, longitude=3.0)
+    place.amenities_r.append(amenity)
+    db_session.commit()
+
+    response = client.post('/api/v1/places/search', json={
+        'name': 'Searchable', 'price': 0, 'amenities': [amenity.name.lower()]})
+    assert [found['place_id'] for found in response.get_json()] == [place.id]
+    assert response.get_json()[0]['amenities'] == [amenity.name]
+
+    response = client.post('/api/v1/places/search', json={
+        'name': 'Searchable', 'price': 0, 'amenities': ['No such amenity']})
+    assert response.get_json() == []
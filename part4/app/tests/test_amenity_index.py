@@ -0,0 +1,93 @@
+#!/usr/bin/python3
+""" Tests for the amenity bitmap index and the amenity filters of the place search """
+
+import uuid
+import pytest
+from app.services.amenity_index import AmenityIndex, MATCH_ALL, MATCH_ANY
+
+
+class FakePlaceRepository:
+    def __init__(self, links):
+        self.links = links
+        self.loads = 0
+
+    def get_amenity_links(self):
+        self.loads += 1
+        return list(self.links)
+
+
+def test_any_and_all():
+    repo = FakePlaceRepository([('p1', 'wifi'), ('p1', 'pool'), ('p2', 'wifi'), ('p3', 'pool')])
+    index = AmenityIndex(repo)
+
+    assert sorted(index.match(['wifi', 'pool'], MATCH_ANY)) == ['p1', 'p2', 'p3']
+    assert index.match(['wifi', 'pool'], MATCH_ALL) == ['p1']
+    assert index.match(['wifi', 'sauna'], MATCH_ALL) == []
+    assert index.match([], MATCH_ANY) == []
+    assert repo.loads == 1
+
+
+def test_incremental_updates():
+    repo = FakePlaceRepository([('p1', 'wifi'), ('p2', 'wifi')])
+    index = AmenityIndex(repo)
+    index.match(['wifi'])
+
+    index.update_place('p3', added=['wifi', 'pool'])
+    index.update_place('p1', removed=['wifi'])
+    index.remove_places(['p2'])
+
+    assert index.match(['wifi']) == ['p3']
+    assert index.match(['wifi', 'pool'], MATCH_ALL) == ['p3']
+    assert repo.loads == 1
+
+    index.invalidate()
+    assert sorted(index.match(['wifi'])) == ['p1', 'p2']
+    assert repo.loads == 2
+
+
+@pytest.fixture
+def searchable_places(make_user, make_place):
+    """ Three places: one with wifi and a pool, one with wifi only, one with nothing """
+    from app.services import facade
+
+    tag = uuid.uuid4().hex[:8]
+    owner = make_user('Bitmap', 'Owner')
+    wifi = facade.create_amenity({'name': 'Bitmap wifi {}'.format(tag)})
+    pool = facade.create_amenity({'name': 'Bitmap pool {}'.format(tag)})
+
+    def place(title, amenities):
+        return make_place(owner, [amenity.id for amenity in amenities], title='{} {}'.format(title, tag),
+                          description='bitmap', price=100.0, latitude=1.0, longitude=1.0)
+
+    places = {'both': place('Both', [wifi, pool]), 'wifi': place('Wifi', [wifi]), 'none': place('None', [])}
+    return tag, wifi, pool, places
+
+
+def search(client, tag, amenities, match=None):
+    payload = {'name': tag, 'price': '0', 'amenities': amenities}
+    if match:
+        payload['amenities_match'] = match
+    response = client.post('/api/v1/places/search', json=payload)
+    assert response.status_code == 200
+    return sorted(place['title'].split()[0] for place in response.get_json())
+
+
+def test_search_any_and_all(client, searchable_places):
+    tag, wifi, pool, places = searchable_places
+
+    assert search(client, tag, [wifi.name, pool.name]) == ['Both', 'Wifi']
+    assert search(client, tag, [wifi.name, pool.name], 'all') == ['Both']
+    assert search(client, tag, [wifi.name, 'No such amenity'], 'all') == []
+    assert search(client, tag, []) == ['Both', 'None', 'Wifi']
+
+
+def test_search_follows_amenity_changes(client, searchable_places):
+    from app.services import facade
+    tag, wifi, pool, places = searchable_places
+
+    assert search(client, tag, [pool.name]) == ['Both']
+    facade.set_place_amenities(places['none'].id, [pool.id])
+    facade.set_place_amenities(places['both'].id, [wifi.id])
+
+    assert search(client, tag, [pool.name]) == ['None']
+    assert search(client, tag, [wifi.name, pool.name], 'all') == []
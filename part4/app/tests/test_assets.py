@@ -0,0 +1,98 @@
+#!/usr/bin/python3
+""" Tests for the frontend build and how the app serves it """
+
+import gzip
+import os
+import pytest
+from flask import Flask
+from app import assets
+
+
+@pytest.fixture(scope='module')
+def dist(tmp_path_factory):
+    target = str(tmp_path_factory.mktemp('frontend') / 'dist')
+    return target, assets.build(target=target)
+
+
+def frontend_client(assets_dir):
+    app = Flask(__name__)
+    app.config['ASSETS_DIR'] = assets_dir
+    assets.init_app(app, index=True)
+    return app.test_client()
+
+
+def test_build_fingerprints_and_precompresses(dist):
+    target, manifest = dist
+    script = manifest['assets']['scripts.js']
+    assert script.startswith('/assets/scripts.') and script.endswith('.js')
+
+    entry = manifest['files'][script[1:]]
+    assert entry['immutable'] and 'gzip' in entry['encodings']
+    with open(os.path.join(target, script[1:]), 'rb') as file:
+        data = file.read()
+    with open(os.path.join(target, script[1:] + '.gz'), 'rb') as file:
+        assert gzip.decompress(file.read()) == data
+
+    # The pages and the script point at the fingerprinted files
+    with open(os.path.join(target, 'index.html')) as file:
+        page = file.read()
+    assert manifest['assets']['styles.css'] in page and script in page
+    assert 'href="styles.css"' not in page
+    assert manifest['assets']['images/icon.png'].encode() in data
+
+    # PNGs are already compressed
+    logo = manifest['files'][manifest['assets']['images/logo.png'][1:]]
+    assert logo['encodings'] == []
+
+
+def test_build_is_reproducible(dist, tmp_path):
+    _, manifest = dist
+    assert assets.build(target=str(tmp_path / 'again')) == manifest
+
+
+def test_assets_are_immutable_and_negotiated(dist):
+    target, manifest = dist
+    client = frontend_client(target)
+    url = manifest['assets']['styles.css']
+
+    response = client.get(url, headers={'Accept-Encoding': 'gzip, deflate'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.mimetype == 'text/css'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert response.cache_control.immutable and response.cache_control.max_age == assets.IMMUTABLE_MAX_AGE
+    with open(os.path.join(target, url[1:]), 'rb') as file:
+        assert gzip.decompress(response.data) == file.read()
+
+    plain = client.get(url)
+    assert 'Content-Encoding' not in plain.headers
+    assert plain.headers['ETag'] != response.headers['ETag']
+
+    again = client.get(url, headers={'Accept-Encoding': 'gzip', 'If-None-Match': response.headers['ETag']})
+    assert again.status_code == 304 and again.data == b''
+
+    assert client.get('/assets/styles.css').status_code == 404
+    assert client.get('/assets/../config.py').status_code == 404
+
+
+def test_pages_are_revalidated(dist):
+    target, _ = dist
+    client = frontend_client(target)
+
+    response = client.get('/place.html')
+    assert response.status_code == 200 and response.mimetype == 'text/html'
+    assert response.cache_control.no_cache and not response.cache_control.immutable
+    assert client.get('/place.html', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+    assert client.get('/').data == client.get('/index.html').data
+
+
+def test_unbuilt_frontend_is_served_from_sources(tmp_path):
+    client = frontend_client(str(tmp_path / 'missing'))
+
+    response = client.get('/styles.css', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200 and 'Content-Encoding' not in response.headers
+    assert response.cache_control.no_cache
+    with open(os.path.join(assets.FRONTEND_DIR, 'styles.css'), 'rb') as file:
+        assert response.data == file.read()
+    assert client.get('/images/logo.png').status_code == 200
+    assert b'href="styles.css"' in client.get('/index.html').data
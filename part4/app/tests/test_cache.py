@@ -0,0 +1,304 @@
+#!/usr/bin/python3
+""" Tests for the cache backends and the invalidation broadcast between workers """
+
+import multiprocessing
+import socketserver
+import threading
+import time
+import uuid
+import pytest
+from app.services.cache import MemoryCache, SQLiteCache, RespCache, CacheBroadcast, create_cache
+
+
+class RespStandIn(socketserver.ThreadingTCPServer):
+    """ Just enough of a Redis server for RespCache, on a free local port """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.Lock()
+        super().__init__(('127.0.0.1', 0), RespHandler)
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        command = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            command.append(self.rfile.read(length + 2)[:-2].decode('utf-8'))
+        return command
+
+    @staticmethod
+    def bulk(value):
+        if value is None:
+            return b'$-1\r\n'
+        value = str(value).encode('utf-8')
+        return b'$%d\r\n%s\r\n' % (len(value), value)
+
+    def handle(self):
+        data = self.server.data
+        while True:
+            command = self.read_command()
+            if command is None:
+                return
+            name, args = command[0].upper(), command[1:]
+            with self.server.lock:
+                if name == 'GET':
+                    reply = self.bulk(data.get(args[0]))
+                elif name == 'MGET':
+                    reply = b'*%d\r\n' % len(args) + b''.join(self.bulk(data.get(key)) for key in args)
+                elif name == 'SET':
+                    data[args[0]] = args[1]
+                    reply = b'+OK\r\n'
+                elif name == 'DEL':
+                    reply = b':%d\r\n' % sum(data.pop(key, None) is not None for key in args)
+                elif name == 'INCR':
+                    data[args[0]] = str(int(data.get(args[0], 0)) + 1)
+                    reply = b':%s\r\n' % data[args[0]].encode()
+                elif name == 'SCAN':
+                    # Walks the keys in sorted order, COUNT at a time; the cursor is the last key
+                    # returned, so keys deleted meanwhile don't make it skip any
+                    after, prefix, count = args[0], args[2].rstrip('*'), int(args[4])
+                    remaining = sorted(key for key in data if after == '0' or key > after)
+                    keys = remaining[:count]
+                    cursor = keys[-1] if len(remaining) > count else 0
+                    matched = [key for key in keys if key.startswith(prefix)]
+                    reply = (b'*2\r\n' + self.bulk(cursor) + b'*%d\r\n' % len(matched)
+                             + b''.join(self.bulk(key) for key in matched))
+                else:
+                    reply = b'-ERR unknown command\r\n'
+            self.wfile.write(reply)
+
+
+@pytest.fixture(scope='module')
+def resp_server():
+    server = RespStandIn()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(params=['memory', 'sqlite', 'resp'])
+def cache(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryCache()
+    if request.param == 'sqlite':
+        return create_cache('sqlite:///{}'.format(tmp_path / 'cache.db'))
+    server = request.getfixturevalue('resp_server')
+    return create_cache('redis://127.0.0.1:{}/0'.format(server.server_address[1]))
+
+
+def test_backends(cache):
+    cache.clear()
+    assert cache.get('dashboard:1') is None
+
+    cache.set('dashboard:1', {'places': [{'id': 'a', 'review_count': 2}]})
+    cache.set_many({'owner:a': '1', 'owner:b': '1'}, ttl=60)
+    assert cache.get('dashboard:1') == {'places': [{'id': 'a', 'review_count': 2}]}
+    assert cache.get_many(['owner:a', 'missing', 'owner:b']) == ['1', None, '1']
+
+    cache.delete('owner:a', 'missing')
+    assert cache.get('owner:a') is None
+    assert [cache.incr('version:place') for _ in range(3)] == [1, 2, 3]
+
+    cache.set_many({'bulk:{}'.format(i): i for i in range(1200)})
+    cache.clear()
+    assert cache.get_many(['dashboard:1', 'owner:b', 'version:place', 'bulk:0', 'bulk:1199']) == [None] * 5
+
+
+def test_expiry_and_lru():
+    cache = MemoryCache(max_entries=2)
+    cache.set('a', 1, ttl=0.05)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    # 'b' was used longest ago
+    assert cache.get_many(['a', 'b', 'c']) == [1, None, 3]
+    time.sleep(0.06)
+    assert cache.get('a') is None
+
+
+def _incr_many(url, times):
+    cache = create_cache(url)
+    for _ in range(times):
+        cache.incr('version:review')
+
+
+def test_sqlite_cache_is_shared_by_forked_workers(tmp_path):
+    url = 'sqlite:///{}'.format(tmp_path / 'cache.db')
+    cache = create_cache(url)
+    cache.incr('version:review')
+
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=_incr_many, args=(url, 50)) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert cache.get('version:review') == 151
+
+
+def test_broadcast_reaches_the_other_workers():
+    cache = MemoryCache()
+    changes = {'a': [], 'b': []}
+    first = CacheBroadcast(cache, ['place', 'review'], lambda topic, ids: changes['a'].append((topic, ids)))
+    second = CacheBroadcast(cache, ['place', 'review'], lambda topic, ids: changes['b'].append((topic, ids)))
+    first.sync()
+    second.sync()
+
+    first.publish('place', 'p1')
+    first.sync()
+    second.sync()
+    # Our own writes don't count, the other worker's do, with what they changed
+    assert changes == {'a': [], 'b': [('place', {'p1'})]}
+
+    second.publish('review', 'p2')
+    first.publish('review', 'p3')
+    first.publish('review', 'p4')
+    first.sync()
+    second.sync()
+    assert changes['a'] == [('review', {'p2'})]
+    assert changes['b'][1:] == [('review', {'p3', 'p4'})]
+
+    # Without ids, or once they are gone from the cache, everything has to be reloaded
+    first.publish('place')
+    second.publish('place', 'p5')
+    cache.delete('changed:place:3')
+    first.sync()
+    second.sync()
+    assert changes['a'][1:] == [('place', None)] and changes['b'][2:] == [('place', None)]
+
+
+def test_facade_updates_what_other_workers_changed(client, make_user, make_place):
+    from sqlalchemy import update
+    from app.models.place import Place
+    from app.persistence import db_session
+    from app.services import facade
+
+    tag = uuid.uuid4().hex[:8]
+    place = make_place(make_user('Remote', 'Broadcast'), title='Remote {}'.format(tag), price=10.0,
+                       latitude=11.75, longitude=-140.5)
+    bbox = '11.7,-140.6,11.8,-140.4'
+    assert client.get('/api/v1/places/?fields=id,price&bbox=' + bbox).get_json() == [{'id': place.id, 'price': 10.0}]
+
+    # Another worker on the same cache changes the place (here, behind our back)
+    db_session.execute(update(Place).where(Place.id == place.id).values(_price=500.0, _title='Moved ' + tag))
+    db_session.commit()
+    other_worker = CacheBroadcast(facade.cache, facade.broadcast.topics, lambda topic, ids: None)
+    other_worker.publish('place', place.id)
+
+    loads = []
+    original = facade.place_repo.get_snapshot_rows
+    facade.place_repo.get_snapshot_rows = lambda place_ids=None: loads.append(place_ids) or original(place_ids)
+    try:
+        listed = client.get('/api/v1/places/?fields=id,price&bbox={}&min_price=400'.format(bbox)).get_json()
+    finally:
+        facade.place_repo.get_snapshot_rows = original
+    assert listed == [{'id': place.id, 'price': 500.0}]
+    # Only that place was reloaded, in every index
+    assert loads == [[place.id]]
+    assert [found.id for found in facade.search_places(name='Moved ' + tag)] == [place.id]
+
+
+def test_facade_drops_what_other_workers_changed(client, auth_headers):
+    from app.services import facade
+
+    catalog = facade.amenity_catalog
+    facade.get_amenity_catalog()
+    client.get('/api/v1/amenities/')
+    loaded = catalog._loaded_version
+
+    # Another worker on the same cache creates an amenity
+    other_worker = CacheBroadcast(facade.cache, facade.broadcast.topics, lambda topic, ids: None)
+    other_worker.publish('amenity')
+
+    client.get('/api/v1/places/?fields=id')
+    assert catalog.version != loaded
+
+
+def test_a_request_publishes_each_topic_once(client, auth_headers, monkeypatch, make_user, make_place):
+    from app.services import facade
+
+    host = make_user('Bulk', 'Broadcast', password='broadcast')
+    guests = [make_user('Guest', 'Broadcast') for _ in range(3)]
+    place = make_place(host, title='Broadcast', description='bulk', latitude=11.5, longitude=-140.25)
+    for guest in guests:
+        facade.create_review({'text': 'Ok', 'rating': 3, 'place_id': place.id, 'user_id': guest.id})
+
+    bumped = []
+    incr = facade.cache.incr
+    monkeypatch.setattr(facade.cache, 'incr', lambda key: bumped.append(key) or incr(key))
+
+    response = client.delete('/api/v1/places/{}'.format(place.id), headers=auth_headers(host.email, 'broadcast'))
+    assert response.status_code == 200
+    assert sorted(bumped) == ['version:place', 'version:review']
+
+
+class UnreachableCache(MemoryCache):
+    """ MemoryCache that fails like a dead Redis while down is set """
+
+    down = False
+
+    def get_many(self, keys):
+        if self.down:
+            raise ConnectionRefusedError('cache is down')
+        return super().get_many(keys)
+
+    def incr(self, key):
+        if self.down:
+            raise ConnectionRefusedError('cache is down')
+        return super().incr(key)
+
+
+def test_broadcast_survives_an_unreachable_cache():
+    cache = UnreachableCache()
+    changes = []
+    first = CacheBroadcast(cache, ['place'], lambda topic, ids: None)
+    second = CacheBroadcast(cache, ['place'], lambda topic, ids: changes.append((topic, ids)))
+    first.sync()
+    second.sync()
+
+    cache.down = True
+    first.publish('place', 'p1')
+    first.sync()
+    second.sync()
+    assert changes == []
+
+    # Once the cache is back, what couldn't be published is reloaded by the others
+    cache.down = False
+    first.sync()
+    second.sync()
+    assert changes == [('place', None)]
+
+
+def test_requests_succeed_without_the_cache(client, auth_headers, monkeypatch):
+    from app.services import facade
+
+    def unreachable(*args):
+        raise ConnectionRefusedError('cache is down')
+    monkeypatch.setattr(facade.cache, 'incr', unreachable)
+    monkeypatch.setattr(facade.cache, 'get_many', unreachable)
+
+    response = client.post('/api/v1/amenities/', json={'name': 'Sauna {}'.format(uuid.uuid4().hex[:8])},
+                           headers=auth_headers())
+    assert response.status_code == 201
+    assert client.get('/api/v1/amenities/').status_code == 200
+
+
+def test_syncs_are_throttled():
+    cache = MemoryCache()
+    broadcast = CacheBroadcast(cache, ['place'], lambda topic, ids: None)
+    broadcast.sync_interval = 60
+    reads = []
+    get_many = cache.get_many
+    cache.get_many = lambda keys: reads.append(keys) or get_many(keys)
+
+    broadcast._sync_if_due()
+    broadcast._sync_if_due()
+    assert len(reads) == 1
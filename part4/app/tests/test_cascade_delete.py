@@ -0,0 +1,83 @@
+#!/usr/bin/python3
+""" Tests for deleting users and places along with everything that depends on them """
+
+import uuid
+import pytest
+
+
+@pytest.fixture
+def host(make_user, make_place):
+    """
+    A host with many places (each reviewed by a guest, each with amenities), who also
+    reviewed a place of someone else
+    """
+    from app.services import facade
+
+    tag = uuid.uuid4().hex[:8]
+    host, guest, neighbour = [make_user(name, 'Cascade', password='cascade') for name in ('Host', 'Guest', 'Neighbour')]
+    amenity_ids = [facade.create_amenity({'name': 'Cascade {} {}'.format(i, tag)}).id for i in range(2)]
+
+    with facade.transaction():
+        places = [make_place(host, amenity_ids, title='Cascade {}'.format(tag), price=50.0,
+                             latitude=7.0, longitude=-170.0)
+                  for _ in range(25)]
+        for place in places:
+            facade.create_review({'text': 'Nice', 'rating': 4, 'place_id': place.id, 'user_id': guest.id})
+
+    other_place = make_place(neighbour, title='Neighbour {}'.format(tag), price=60.0, latitude=7.5, longitude=-170.0)
+    facade.create_review({'text': 'Meh', 'rating': 1, 'place_id': other_place.id, 'user_id': host.id})
+    facade.create_review({'text': 'Good', 'rating': 5, 'place_id': other_place.id, 'user_id': guest.id})
+
+    return tag, host, [place.id for place in places], other_place, amenity_ids
+
+
+def test_delete_user_is_set_based(app, host, assert_max_queries):
+    from app.services import facade
+
+    tag, user, place_ids, other_place, amenity_ids = host
+    # Load the in-memory indexes, so that the deletes have to reach them too
+    assert len(facade.filter_places(bbox=(6, -171, 8, -169))) == 26
+    assert set(facade.amenity_index.match(amenity_ids)) == set(place_ids)
+    assert len(facade.search_places(name=tag)) == 26
+
+    other_page = facade.events.subscribe(other_place.id)
+
+    # The same handful of statements however many places and reviews the host has
+    # (a SELECT and a DELETE per table, plus one change-log INSERT for each)
+    with assert_max_queries(10):
+        facade.delete_user(user.id)
+
+    # Pages showing the other place are told which rating left its average
+    _, event_type, data = other_page.get(timeout=0)
+    other_page.close()
+    assert event_type == 'review' and data['action'] == 'delete' and data['rating'] == 1
+
+    assert facade.get_user(user.id) is None
+    assert facade.get_places(place_ids) == []
+    assert facade.place_repo.get_amenity_ids(place_ids) == {place_id: [] for place_id in place_ids}
+    # The guest's reviews of the host's places went with them, and so did the host's own review
+    assert facade.review_repo.get_average_ratings(place_ids) == {}
+    assert [review.rating for review in facade.get_place_reviews(other_place.id)] == [5]
+
+    assert facade.filter_places(bbox=(6, -171, 8, -169)) == [other_place.id]
+    assert facade.filter_places(bbox=(6, -171, 8, -169), min_rating=5) == [other_place.id]
+    assert facade.amenity_index.match(amenity_ids) == []
+    assert [place.id for place in facade.search_places(name=tag)] == [other_place.id]
+
+
+def test_delete_place_endpoint(client, host, auth_headers, make_user):
+    from app.services import facade
+
+    _, user, place_ids, _, _ = host
+    place_id = place_ids[0]
+    url = '/api/v1/places/{}'.format(place_id)
+
+    stranger = make_user('Stranger', 'Cascade', password='cascade')
+    assert client.delete(url, headers=auth_headers(stranger.email, 'cascade')).status_code == 403
+
+    owner_headers = auth_headers(user.email, 'cascade')
+    assert client.delete(url, headers=owner_headers).status_code == 200
+    assert client.get(url).status_code == 404
+    assert facade.review_repo.get_average_ratings([place_id]) == {}
+    assert facade.place_repo.get_amenity_ids([place_id]) == {place_id: []}
+    assert client.delete(url, headers=owner_headers).status_code == 404
@@ -0,0 +1,109 @@
+#!/usr/bin/python3
+""" Tests for the change log and GET /api/v1/changes/ """
+
+import uuid
+from sqlalchemy import text
+
+
+def feed(client, query):
+    response = client.get('/api/v1/changes/?' + query)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_changes_are_logged_in_order(client, make_user, make_place):
+    from app.services import facade
+    from app.persistence import change_log
+
+    start = feed(client, 'since={}&limit=1000'.format(change_log.pruned_seq()))
+    while start['has_more']:
+        start = feed(client, 'since={}&limit=1000'.format(start['next']))
+    since = start['next']
+
+    owner = make_user('Feed', 'Owner')
+    place = make_place(owner, title='Feed', price=10.0, latitude=1.0, longitude=1.0)
+    facade.update_place(place.id, {'title': 'Feed again'})
+    facade.delete_place(place.id)
+
+    body = feed(client, 'since={}'.format(since))
+    assert [(change['entity'], change['id'], change['action']) for change in body['changes']] == [
+        ('user', owner.id, 'create'),
+        ('place', place.id, 'create'),
+        ('place', place.id, 'update'),
+        ('place', place.id, 'delete'),
+    ]
+    assert body['next'] == body['changes'][-1]['seq'] and not body['has_more']
+
+    # Paging with the cursor, and only one kind of entity
+    first = feed(client, 'since={}&limit=1&entity=place'.format(since))
+    assert first['has_more'] and first['changes'][0]['action'] == 'create'
+    second = feed(client, 'since={}&limit=2&entity=place'.format(first['next']))
+    assert [change['action'] for change in second['changes']] == ['update', 'delete']
+    assert feed(client, 'since={}'.format(body['next']))['changes'] == []
+
+
+def test_rolled_back_changes_are_not_logged(client, app):
+    from app.services import facade
+    from app.persistence import change_log
+
+    since = max([0] + [change.seq for change in change_log.read(0, 100000)])
+    try:
+        with facade.transaction():
+            facade.create_amenity({'name': 'Rolled back {}'.format(uuid.uuid4().hex[:8])})
+            raise RuntimeError('abort')
+    except RuntimeError:
+        pass
+    assert feed(client, 'since={}'.format(since))['changes'] == []
+
+
+def test_invalid_parameters(client):
+    assert client.get('/api/v1/changes/?since=abc').status_code == 400
+    assert client.get('/api/v1/changes/?limit=0').status_code == 400
+    assert client.get('/api/v1/changes/?entity=booking').status_code == 400
+
+
+def test_recent_changes_wait_for_the_lag(client, app, monkeypatch):
+    """ A change younger than the lag isn't handed out yet, so no cursor can move past it """
+    from datetime import datetime, timezone
+    from app.services import facade
+    from app.persistence import change_log
+
+    since = change_log.settled_seq()
+    amenity = facade.create_amenity({'name': 'Lagging {}'.format(uuid.uuid4().hex[:8])})
+
+    monkeypatch.setattr(change_log, 'VISIBILITY_LAG', 60)
+    body = feed(client, 'since={}'.format(since))
+    assert body['changes'] == [] and body['next'] == since
+
+    monkeypatch.setattr(change_log, 'VISIBILITY_LAG', 0)
+    change = feed(client, 'since={}'.format(since))['changes'][-1]
+    assert change['id'] == amenity.id
+    # Logged in UTC, and said so
+    changed_at = datetime.fromisoformat(change['changed_at'])
+    assert abs((datetime.now(timezone.utc) - changed_at).total_seconds()) < 60
+
+
+def test_pruned_changes(client, app):
+    from app.services import facade
+    from app.persistence import change_log, db_session
+
+    facade.create_amenity({'name': 'Pruned {}'.format(uuid.uuid4().hex[:8])})
+    since = change_log.settled_seq()
+    facade.create_amenity({'name': 'Kept {}'.format(uuid.uuid4().hex[:8])})
+    facade.create_amenity({'name': 'Kept {}'.format(uuid.uuid4().hex[:8])})
+
+    # Everything logged so far goes
+    change_log.prune(change_log.utcnow())
+    db_session.commit()
+    pruned = change_log.pruned_seq()
+    assert pruned > since and change_log.read(0, 10) == []
+
+    # Seqs may skip values (rolled-back inserts, auto_increment_increment > 1)
+    db_session.execute(text("UPDATE sqlite_sequence SET seq = seq + 10 WHERE name = 'changes'"))
+    db_session.commit()
+    facade.create_amenity({'name': 'After {}'.format(uuid.uuid4().hex[:8])})
+
+    assert client.get('/api/v1/changes/?since={}'.format(since)).status_code == 410
+    assert client.get('/api/v1/changes/?since=0').status_code == 410
+    # A client that had read everything before the prune is still up to date
+    assert [change['seq'] for change in feed(client, 'since={}'.format(pruned))['changes']] == [pruned + 11]
@@ -0,0 +1,106 @@
+#!/usr/bin/python3
+""" Tests for serving anonymous place GETs from the memory-mapped snapshot """
+
+import os
+import uuid
+import pytest
+from app.services.data_snapshot import SnapshotReader
+
+
+@pytest.fixture
+def snapshot(tmp_path, monkeypatch, make_user, make_place):
+    """ A place with amenities and reviews, exported to a snapshot that the app serves """
+    from app.services import facade
+
+    tag = uuid.uuid4().hex[:8]
+    host = make_user('Host', 'Snapshot', password='snapshot')
+    guests = [make_user('Guest{}'.format(i), 'Snapshot') for i in range(3)]
+    amenity_ids = [facade.create_amenity({'name': 'Snapshot {} {}'.format(i, tag)}).id for i in range(2)]
+    with facade.transaction():
+        place = make_place(host, amenity_ids, title='Snapshot {}'.format(tag), description='mapped', price=70.0,
+                           latitude=12.5, longitude=-130.75)
+        for rating, guest in enumerate(guests, 3):
+            facade.create_review({'text': 'Stay {}'.format(rating), 'rating': rating,
+                                  'place_id': place.id, 'user_id': guest.id})
+
+    path = str(tmp_path / 'places.snapshot')
+    seq = facade.export_snapshot(path)
+    reader = SnapshotReader(path)
+    reader.CHECK_INTERVAL = 0
+    monkeypatch.setattr(facade, 'read_snapshot', reader)
+    return place.id, host, path, seq
+
+
+def test_place_page_without_queries(client, auth_headers, snapshot, assert_max_queries):
+    place_id, host, _, _ = snapshot
+    url = '/api/v1/places/{}?include=reviews,owner,amenities&reviews_per_page=2'.format(place_id)
+
+    with assert_max_queries(0):
+        served = client.get(url)
+        reviews = client.get('/api/v1/places/{}/reviews/'.format(place_id))
+        owner = client.get('/api/v1/places/{}/owner/'.format(place_id))
+    assert served.status_code == reviews.status_code == owner.status_code == 200
+
+    # Same answer as the DB gives a logged-in user
+    from_db = client.get(url, headers=auth_headers(host.email, 'snapshot'))
+    assert served.data == from_db.data
+    assert 'X-Snapshot-Exported-At' in served.headers and 'X-Snapshot-Exported-At' not in from_db.headers
+    assert served.get_json()['reviews']['total'] == 3 and served.get_json()['reviews']['average_rating'] == 4.0
+    assert [review['rating'] for review in reviews.get_json()] == [5, 4, 3]
+    assert owner.get_json()['email'] == host.email
+
+
+def test_listing_without_queries(client, auth_headers, snapshot, assert_max_queries):
+    place_id, host, _, _ = snapshot
+
+    with assert_max_queries(0):
+        served = client.get('/api/v1/places/?page=1&per_page=100&fields=id,title,price,amenities')
+        several = client.get('/api/v1/places/?ids={}'.format(place_id))
+    assert several.get_json()['places'][0]['id'] == place_id
+
+    from_db = client.get('/api/v1/places/?page=1&per_page=100&fields=id,title,price,amenities',
+                         headers=auth_headers(host.email, 'snapshot'))
+    assert served.headers['X-Total-Count'] == from_db.headers['X-Total-Count']
+    assert served.data == from_db.data
+
+    # Filters still go to the DB
+    with assert_max_queries(10) as monitor:
+        client.get('/api/v1/places/?min_price=69&max_price=71')
+    assert monitor.query_count > 0
+
+
+def test_misses_fall_back_to_the_db(client, snapshot, make_place):
+    from app.services import facade
+
+    _, host, path, seq = snapshot
+    newer = make_place(host, title='After the export', price=75.0, latitude=12.75, longitude=-130.5)
+    assert client.get('/api/v1/places/{}'.format(newer.id)).status_code == 200
+    assert client.get('/api/v1/places/{}'.format(uuid.uuid4())).status_code == 404
+
+    # The next export picks it up, and the workers remap the new file
+    assert facade.export_snapshot(path, seq) != seq
+    assert facade.read_snapshot.get(newer.id)['title'] == 'After the export'
+
+
+def test_no_cache_reads_the_db(client, snapshot, assert_max_queries):
+    from app.services import facade
+
+    place_id, _, _, _ = snapshot
+    facade.update_place(place_id, {'title': 'Renamed since the export'})
+    url = '/api/v1/places/{}'.format(place_id)
+
+    assert client.get(url).get_json()['title'].startswith('Snapshot ')
+    with assert_max_queries(10) as monitor:
+        current = client.get(url, headers={'Cache-Control': 'no-cache'})
+    assert monitor.query_count > 0
+    assert current.get_json()['title'] == 'Renamed since the export'
+    assert 'X-Snapshot-Exported-At' not in current.headers
+
+
+def test_export_skips_when_nothing_changed(snapshot):
+    from app.services import facade
+
+    _, _, path, seq = snapshot
+    modified = os.stat(path).st_mtime_ns
+    assert facade.export_snapshot(path, seq) == seq
+    assert os.stat(path).st_mtime_ns == modified
@@ -0,0 +1,94 @@
+#!/usr/bin/python3
+""" Tests for the host dashboard and its cache """
+
+import uuid
+import pytest
+
+
+@pytest.fixture
+def host(make_user, make_place):
+    """ A host with three places: two reviewed (one with amenities), one without reviews """
+    from app.services import facade
+
+    tag = uuid.uuid4().hex[:8]
+    owner, guest, other_guest = [make_user(name, 'Dashboard', password='dashboard')
+                                 for name in ('Host', 'Guest', 'Other')]
+    amenity_ids = [facade.create_amenity({'name': 'Dashboard {} {}'.format(i, tag)}).id for i in range(3)]
+
+    with facade.transaction():
+        places = [make_place(owner, amenity_ids if i == 0 else None, title='Dashboard {} {}'.format(i, tag),
+                             price=40.0 + i, latitude=9.0 + i / 10, longitude=-150.0)
+                  for i in range(3)]
+        facade.create_review({'text': 'Great', 'rating': 5, 'place_id': places[0].id, 'user_id': guest.id})
+        facade.create_review({'text': 'Fine', 'rating': 3, 'place_id': places[0].id, 'user_id': other_guest.id})
+        facade.create_review({'text': 'Poor', 'rating': 2, 'place_id': places[1].id, 'user_id': guest.id})
+
+    return owner, guest, [place.id for place in places], amenity_ids
+
+
+def test_dashboard_is_aggregated(client, auth_headers, host, assert_max_queries):
+    owner, _, place_ids, _ = host
+    headers = auth_headers(owner.email, 'dashboard')
+
+    # The stats of every place come from one query, whatever the number of places and reviews
+    with assert_max_queries(1):
+        response = client.get('/api/v1/users/{}/dashboard'.format(owner.id), headers=headers)
+    assert response.status_code == 200
+    dashboard = response.get_json()
+
+    assert dashboard['place_count'] == 3 and dashboard['review_count'] == 3
+    assert dashboard['average_rating'] == pytest.approx(10 / 3)
+    by_id = {place['id']: place for place in dashboard['places']}
+    assert list(by_id) == place_ids
+    assert (by_id[place_ids[0]]['review_count'], by_id[place_ids[0]]['average_rating']) == (2, 4.0)
+    assert by_id[place_ids[0]]['amenity_count'] == 3
+    assert by_id[place_ids[1]]['amenity_count'] == 0
+    assert by_id[place_ids[2]] == dict(by_id[place_ids[2]], review_count=0, average_rating=None,
+                                       latest_review_at=None)
+    assert dashboard['latest_review_at'] == max(place['latest_review_at']
+                                                for place in dashboard['places'] if place['latest_review_at'])
+
+
+def test_dashboard_is_cached_until_a_change(client, auth_headers, host, assert_max_queries):
+    from app.services import facade
+
+    owner, guest, place_ids, amenity_ids = host
+    headers = auth_headers(owner.email, 'dashboard')
+    url = '/api/v1/users/{}/dashboard'.format(owner.id)
+    client.get(url, headers=headers)
+
+    with assert_max_queries(0):
+        assert client.get(url, headers=headers).get_json()['review_count'] == 3
+
+    # A new review of one of the places
+    facade.create_review({'text': 'Good', 'rating': 4, 'place_id': place_ids[2], 'user_id': guest.id})
+    dashboard = client.get(url, headers=headers).get_json()
+    assert dashboard['review_count'] == 4 and dashboard['places'][2]['average_rating'] == 4.0
+
+    # Amenities of a place
+    facade.set_place_amenities(place_ids[1], amenity_ids[:1])
+    assert client.get(url, headers=headers).get_json()['places'][1]['amenity_count'] == 1
+
+    # A place going away (its reviews with it)
+    facade.delete_place(place_ids[0])
+    dashboard = client.get(url, headers=headers).get_json()
+    assert (dashboard['place_count'], dashboard['review_count']) == (2, 2)
+
+
+def test_dashboard_access(client, auth_headers, host):
+    owner, guest, _, _ = host
+    url = '/api/v1/users/{}/dashboard'.format(owner.id)
+
+    assert client.get(url).status_code == 401
+    assert client.get(url, headers=auth_headers(guest.email, 'dashboard')).status_code == 403
+    assert client.get(url, headers=auth_headers()).status_code == 200
+
+    # A user without places has an empty dashboard; an unknown user has none
+    dashboard = client.get('/api/v1/users/{}/dashboard'.format(guest.id),
+                           headers=auth_headers(guest.email, 'dashboard')).get_json()
+    assert (dashboard['place_count'], dashboard['places'], dashboard['average_rating']) == (0, [], None)
+    assert client.get('/api/v1/users/{}/dashboard'.format(uuid.uuid4()),
+                      headers=auth_headers()).status_code == 404
+
+    # With a trailing slash it isn't taken for a relation of the user
+    assert client.get(url + '/', headers=auth_headers()).status_code == 404
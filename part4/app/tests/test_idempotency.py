@@ -0,0 +1,117 @@
+#!/usr/bin/python3
+""" Tests for Idempotency-Key handling of POST endpoints """
+
+import threading
+import time
+import uuid
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager
+from flask_restx import Api, Resource
+from app.api.idempotency import IdempotencyKeys, SQLiteResponseStore, NEW, BUSY, DONE, MISMATCH
+
+
+def place_payload(tag):
+    return {'title': 'Retry {}'.format(tag), 'description': 'idempotent', 'price': 80.0,
+            'latitude': 8.25, 'longitude': -160.5}
+
+
+def test_retried_post_is_replayed(client, auth_headers, assert_max_queries):
+    from app.services import facade
+
+    tag = uuid.uuid4().hex[:8]
+    headers = dict(auth_headers(), **{'Idempotency-Key': 'create-' + tag})
+    first = client.post('/api/v1/places/', json=place_payload(tag), headers=headers)
+    assert first.status_code == 201
+
+    # The retry runs nothing: no validation, no lookup, no INSERT
+    with assert_max_queries(0):
+        retry = client.post('/api/v1/places/', json=place_payload(tag), headers=headers)
+    assert retry.status_code == 201
+    assert retry.get_json() == first.get_json()
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert len(facade.search_places(name=tag)) == 1
+
+    # Same key, another body: refused rather than silently answered with the other place
+    other = client.post('/api/v1/places/', json=dict(place_payload(tag), price=90.0), headers=headers)
+    assert other.status_code == 422
+
+    # Another key is another request
+    headers['Idempotency-Key'] = 'create-again-' + tag
+    assert client.post('/api/v1/places/', json=place_payload(tag), headers=headers).status_code == 201
+    assert len(facade.search_places(name=tag)) == 2
+
+
+def test_errors_are_replayed_but_not_server_errors(client, auth_headers):
+    headers = dict(auth_headers(), **{'Idempotency-Key': 'bad-' + uuid.uuid4().hex})
+    payload = {'text': 'Nope', 'rating': 3, 'place_id': str(uuid.uuid4())}
+
+    first = client.post('/api/v1/reviews/', json=payload, headers=headers)
+    assert first.status_code == 400
+    retry = client.post('/api/v1/reviews/', json=payload, headers=headers)
+    assert retry.status_code == 400 and retry.headers.get('Idempotent-Replayed') == 'true'
+
+    assert client.post('/api/v1/reviews/', json=payload,
+                       headers=dict(headers, **{'Idempotency-Key': 'x' * 256})).status_code == 400
+
+
+@pytest.fixture
+def slow_app():
+    """ A tiny app whose POST takes a while and counts how often it really ran """
+    keys = IdempotencyKeys()
+    calls = []
+    app = Flask(__name__)
+    app.config['JWT_SECRET_KEY'] = 'test'
+    JWTManager(app)
+    api = Api(app)
+
+    @api.route('/things')
+    class Things(Resource):
+        @keys.idempotent
+        def post(self):
+            calls.append(1)
+            time.sleep(0.1)
+            if len(calls) > 1:
+                return {'error': 'ran twice'}, 500
+            return {'id': 'thing-1'}, 201, {'Location': '/things/thing-1'}
+
+    return app, calls
+
+
+def test_concurrent_duplicates_run_once(slow_app):
+    app, calls = slow_app
+    responses = []
+
+    def post():
+        responses.append(app.test_client().post('/things', json={'name': 'x'},
+                                                headers={'Idempotency-Key': 'same'}))
+
+    threads = [threading.Thread(target=post) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert [response.status_code for response in responses] == [201] * 5
+    assert all(response.headers['Location'].endswith('/things/thing-1') for response in responses)
+    assert sum('Idempotent-Replayed' in response.headers for response in responses) == 4
+
+
+def test_sqlite_store_is_shared(tmp_path):
+    """ Two stores on the same file (i.e. two workers) see each other's claims and responses """
+    path = str(tmp_path / 'idempotency.db')
+    first, second = SQLiteResponseStore(path), SQLiteResponseStore(path)
+
+    assert first.begin('user:POST /x:key', 'abc') == (NEW, None)
+    assert second.begin('user:POST /x:key', 'abc') == (BUSY, None)
+    assert second.begin('user:POST /x:key', 'def') == (MISMATCH, None)
+
+    record = {'status': 201, 'body': {'id': '1'}, 'headers': {}}
+    first.finish('user:POST /x:key', record, ttl=60)
+    assert second.begin('user:POST /x:key', 'abc') == (DONE, record)
+
+    # A claim that is given up can be taken again
+    assert first.begin('user:POST /y:key', 'abc') == (NEW, None)
+    first.abandon('user:POST /y:key')
+    assert second.begin('user:POST /y:key', 'abc') == (NEW, None)
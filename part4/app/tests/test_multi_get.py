@@ -0,0 +1,56 @@
+#!/usr/bin/python3
+""" Tests for the ?ids= multi-get endpoints """
+
+import pytest
+
+
+@pytest.fixture
+def places(make_user, make_place):
+    """ An owner with three places """
+    owner = make_user('Multi', 'Get')
+    return [make_place(owner, title='Multi-get place {}'.format(i), price=40.0, latitude=4.0, longitude=4.0)
+            for i in range(3)]
+
+
+def test_places_multi_get(client, places, assert_max_queries):
+    """ Several places, their owners and amenities come back from a fixed number of queries """
+    ids = ','.join([places[2].id, 'no-such-place', places[0].id])
+
+    with assert_max_queries(2):
+        response = client.get('/api/v1/places/?ids={}'.format(ids))
+
+    body = response.get_json()
+    assert response.status_code == 200
+    assert [place['id'] for place in body['places']] == [places[2].id, places[0].id]
+    assert body['places'][0]['owner']['id'] == places[2].owner_id
+    assert body['missing'] == ['no-such-place']
+
+
+def test_users_and_reviews_multi_get(client, places):
+    """ Users and reviews support the same parameter """
+    owner_id = places[0].owner_id
+
+    response = client.get('/api/v1/users/?ids={},nobody'.format(owner_id))
+    assert [user['id'] for user in response.get_json()['users']] == [owner_id]
+    assert response.get_json()['missing'] == ['nobody']
+
+    response = client.get('/api/v1/reviews/?ids=nothing')
+    assert response.get_json() == {'reviews': [], 'missing': ['nothing']}
+
+
+def test_ids_in_any_case(client, places):
+    """ An id written in uppercase (or braced) is the same id """
+    ids = '{},{{{}}}'.format(places[0].id.upper(), places[1].id)
+    body = client.get('/api/v1/places/?ids={}'.format(ids)).get_json()
+    assert [place['id'] for place in body['places']] == [places[0].id, places[1].id]
+    assert body['missing'] == []
+
+    owner_id = places[0].owner_id
+    body = client.get('/api/v1/users/?ids={}'.format(owner_id.upper())).get_json()
+    assert [user['id'] for user in body['users']] == [owner_id] and body['missing'] == []
+
+
+def test_too_many_ids(client):
+    """ Oversized batches are rejected """
+    ids = ','.join(str(i) for i in range(101))
+    assert client.get('/api/v1/places/?ids={}'.format(ids)).status_code == 400
@@ -0,0 +1,63 @@
+#!/usr/bin/python3
+""" Tests for PUT /api/v1/places/<place_id>/amenities """
+
+import uuid
+import pytest
+
+
+@pytest.fixture
+def owned_place(auth_headers, make_user, make_place):
+    """ A place owned by a fresh user, that user's auth headers and a few amenities """
+    from app.services import facade
+
+    owner = make_user('Amenity', 'Owner', password='amenities')
+    amenity_ids = [facade.create_amenity({'name': 'Bulk amenity {}'.format(uuid.uuid4().hex[:8])}).id
+                   for _ in range(4)]
+    place = make_place(owner, amenity_ids[:2], title='Amenity place', price=40.0, latitude=4.0, longitude=4.0)
+    return place, auth_headers(owner.email, 'amenities'), amenity_ids
+
+
+def test_replace_amenities(client, owned_place, assert_max_queries):
+    """ Only the difference is written: one INSERT and one DELETE (plus the change-log entry) """
+    place, headers, amenity_ids = owned_place
+    wanted = [amenity_ids[1], amenity_ids[2], amenity_ids[3]]
+    url = '/api/v1/places/{}/amenities'.format(place.id)
+
+    with assert_max_queries(7) as monitor:
+        response = client.put(url, json={'amenities': wanted}, headers=headers)
+
+    assert response.status_code == 200
+    assert [amenity['id'] for amenity in response.get_json()['amenities']] == wanted
+    writes = [s for s in monitor.statements if s.lstrip().upper().startswith(('INSERT', 'DELETE'))
+              and 'changes' not in s]
+    assert len(writes) == 2
+
+    listed = client.get(url + '/').get_json()
+    assert sorted(amenity['id'] for amenity in listed) == sorted(wanted)
+
+
+def test_unchanged_set_writes_nothing(client, owned_place, assert_max_queries):
+    place, headers, amenity_ids = owned_place
+
+    with assert_max_queries(6) as monitor:
+        response = client.put('/api/v1/places/{}/amenities/'.format(place.id),
+                              json={'amenities': amenity_ids[:2]}, headers=headers)
+
+    assert response.status_code == 200
+    assert not [s for s in monitor.statements if s.lstrip().upper().startswith(('INSERT', 'DELETE'))]
+
+
+def test_rejected_requests(client, owned_place, auth_headers, make_user):
+    place, headers, amenity_ids = owned_place
+    url = '/api/v1/places/{}/amenities'.format(place.id)
+
+    assert client.put(url, json={'amenities': ['no-such-amenity']}, headers=headers).status_code == 400
+    assert client.put(url, json=amenity_ids, headers=headers).status_code == 400
+    assert client.put('/api/v1/places/no-such-place/amenities', json={'amenities': []},
+                      headers=headers).status_code == 404
+
+    stranger = make_user('Not', 'Owner', password='stranger')
+    assert client.put(url, json={'amenities': []}, headers=auth_headers(stranger.email, 'stranger')).status_code == 403
+
+    # The admin may edit anyone's place
+    assert client.put(url, json={'amenities': []}, headers=auth_headers()).status_code == 200
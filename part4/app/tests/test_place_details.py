@@ -0,0 +1,63 @@
+#!/usr/bin/python3
+""" Tests for the aggregate place details endpoint (?include=) """
+
+import uuid
+import pytest
+
+
+@pytest.fixture
+def reviewed_place(make_user, make_place):
+    """ A place with an amenity and three reviews from three different users """
+    from app.services import facade
+    from app.persistence import db_session
+
+    owner = make_user('Owner')
+    place = make_place(owner, title='Detailed place', price=60.0, latitude=6.0, longitude=6.0)
+    place.amenities_r.append(facade.create_amenity({'name': 'Details Wi-Fi {}'.format(uuid.uuid4().hex[:8])}))
+    db_session.commit()
+    for rating in (2, 4, 5):
+        reviewer = make_user('Reviewer')
+        facade.create_review({'text': 'Rated {}'.format(rating), 'rating': rating,
+                              'place_id': place.id, 'user_id': reviewer.id})
+    db_session.expunge_all()
+    facade.get_amenity_catalog()
+    return place
+
+
+def test_everything_in_one_request(client, reviewed_place, assert_max_queries):
+    """ Owner, amenities and a page of reviews (with writers) from a fixed number of queries """
+    url = '/api/v1/places/{}?include=reviews,owner,amenities&reviews_per_page=2'.format(reviewed_place.id)
+    with assert_max_queries(4):
+        response = client.get(url)
+
+    body = response.get_json()
+    assert response.status_code == 200
+    assert body['owner']['id'] == reviewed_place.owner_id
+    assert len(body['amenities']) == 1
+    assert body['reviews']['total'] == 3
+    assert body['reviews']['average_rating'] == pytest.approx(11 / 3)
+    assert len(body['reviews']['items']) == 2
+    assert all(review['user']['first_name'] == 'Reviewer' for review in body['reviews']['items'])
+
+    second_page = client.get(url + '&reviews_page=2').get_json()['reviews']['items']
+    assert len(second_page) == 1
+
+
+def test_reviews_relation_loads_writers_up_front(client, reviewed_place, assert_max_queries):
+    """ The /reviews/ relation no longer lazy-loads each writer """
+    with assert_max_queries(1):
+        response = client.get('/api/v1/places/{}/reviews/'.format(reviewed_place.id))
+
+    assert len(response.get_json()) == 3
+
+
+def test_bad_include(client, reviewed_place):
+    response = client.get('/api/v1/places/{}?include=neighbours'.format(reviewed_place.id))
+    assert response.status_code == 400
+
+
+def test_id_in_uppercase(client, reviewed_place):
+    """ The place is found however its id is written """
+    response = client.get('/api/v1/places/{}?include=owner'.format(reviewed_place.id.upper()))
+    assert response.status_code == 200
+    assert response.get_json()['id'] == reviewed_place.id
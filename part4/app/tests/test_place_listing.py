@@ -0,0 +1,66 @@
+#!/usr/bin/python3
+""" Tests for sorting, price ranges and paging on GET /api/v1/places/ """
+
+import uuid
+import pytest
+from sqlalchemy import text
+
+
+@pytest.fixture
+def listing(make_user, make_place):
+    """ Four places in their own patch of the map (so bbox isolates them), two of them reviewed """
+    from app.services import facade
+
+    tag = uuid.uuid4().hex[:8]
+    owner, reviewer = make_user('Listing', 'Owner'), make_user('Listing', 'Reviewer')
+    latitude = 70.0 + (int(tag, 16) % 1000) / 100
+
+    places = {}
+    for price in (40.0, 10.0, 90.0, 60.0):
+        places[price] = make_place(owner, title='Listing {}'.format(price), description=tag, price=price,
+                                   latitude=latitude, longitude=-170.0)
+    for price, rating in ((90.0, 3), (40.0, 5)):
+        facade.create_review({'text': 'Ok', 'rating': rating, 'place_id': places[price].id,
+                              'user_id': reviewer.id})
+    return '{},-171,{},-169'.format(latitude - 0.001, latitude + 0.001)
+
+
+def prices(client, bbox, query):
+    response = client.get('/api/v1/places/?fields=id,price&bbox={}&{}'.format(bbox, query))
+    assert response.status_code == 200, response.get_json()
+    return [place['price'] for place in response.get_json()], response.headers
+
+
+def test_sorting(client, listing):
+    assert prices(client, listing, 'sort=price')[0] == [10.0, 40.0, 60.0, 90.0]
+    assert prices(client, listing, 'sort=-price')[0] == [90.0, 60.0, 40.0, 10.0]
+    assert prices(client, listing, 'sort=created')[0][0] == 60.0
+    assert prices(client, listing, 'sort=rating')[0][:2] == [40.0, 90.0]
+    assert client.get('/api/v1/places/?sort=cheapest').status_code == 400
+
+
+def test_price_range_and_pages(client, listing):
+    assert prices(client, listing, 'min_price=20&max_price=60&sort=price')[0] == [40.0, 60.0]
+
+    first, headers = prices(client, listing, 'sort=price&per_page=3')
+    second, _ = prices(client, listing, 'sort=price&per_page=3&page=2')
+    assert first == [10.0, 40.0, 60.0] and second == [90.0]
+    assert headers['X-Total-Count'] == '4'
+    assert client.get('/api/v1/places/?page=0').status_code == 400
+
+
+def test_price_filter_uses_the_index(app):
+    from app.persistence import engine
+    with engine.connect() as connection:
+        plan = connection.execute(text(
+            "EXPLAIN QUERY PLAN SELECT id FROM places WHERE price >= 10 AND price <= 20")).all()
+    assert any('idx_places_price' in str(row) for row in plan)
+
+
+def test_filtered_listing_only_loads_the_page(client, listing, assert_max_queries):
+    """ The matches are sorted and paged in memory: the query only asks for the page's ids """
+    # (plus one for the ratings of the places reviewed by the fixture)
+    with assert_max_queries(2) as monitor:
+        page, headers = prices(client, listing, 'sort=-price&per_page=2&page=2')
+    assert page == [40.0, 10.0] and headers['X-Total-Count'] == '4'
+    assert 'FROM places' in monitor.statements[-1] and monitor.statements[-1].count('?') == 2
@@ -0,0 +1,65 @@
+#!/usr/bin/python3
+""" Tests for the in-memory place snapshot and the listing filters it serves """
+
+import itertools
+import pytest
+
+# Every fixture gets its own patch of the map, far away from what the other tests use
+_areas = itertools.count()
+
+
+@pytest.fixture
+def priced_places(make_user, make_place):
+    """ Three places of one owner at different prices and spots, one of them reviewed """
+    from app.services import facade
+
+    owner, reviewer = make_user('Snapshot', 'Owner'), make_user('Snapshot', 'Reviewer')
+    longitude = 100.0 + 2 * next(_areas)
+
+    def place(price, latitude, offset):
+        return make_place(owner, title='Snapshot {}'.format(price), price=price,
+                          latitude=latitude, longitude=longitude + offset)
+
+    places = {'cheap': place(20.0, -60.0, 0), 'mid': place(80.0, -60.5, 0.5), 'dear': place(300.0, -61.0, 1)}
+    facade.create_review({'text': 'Great', 'rating': 5, 'place_id': places['mid'].id, 'user_id': reviewer.id})
+    bbox = '-62,{},-59,{}'.format(longitude - 0.5, longitude + 1.5)
+    return places, reviewer, bbox
+
+
+def listed(client, bbox, query):
+    response = client.get('/api/v1/places/?bbox={}&fields=id,price&{}'.format(bbox, query))
+    assert response.status_code == 200
+    return sorted(place['price'] for place in response.get_json())
+
+
+def test_listing_filters(client, priced_places):
+    places, reviewer, bbox = priced_places
+    assert listed(client, bbox, '') == [20.0, 80.0, 300.0]
+    assert listed(client, bbox, 'max_price=100') == [20.0, 80.0]
+    assert listed(client, bbox, 'min_price=50&max_price=100') == [80.0]
+    assert listed(client, bbox, 'min_rating=4') == [80.0]
+    assert client.get('/api/v1/places/?bbox=1,2,3').status_code == 400
+    assert client.get('/api/v1/places/?max_price=cheap').status_code == 400
+
+
+def test_snapshot_follows_writes(client, priced_places):
+    """ Adds, updates, deletes and new reviews show up without reloading the snapshot """
+    from app.services import facade
+    places, reviewer, bbox = priced_places
+    loads = []
+    original = facade.place_repo.get_snapshot_rows
+    facade.place_repo.get_snapshot_rows = lambda: loads.append(1) or original()
+    facade.place_snapshot.invalidate()
+    try:
+        assert listed(client, bbox, 'max_price=100') == [20.0, 80.0]
+
+        facade.update_place(places['mid'].id, {'price': 95.0})
+        facade.create_review({'text': 'Fine', 'rating': 4, 'place_id': places['cheap'].id,
+                              'user_id': reviewer.id})
+        facade.place_repo.delete(places['dear'].id)
+
+        assert listed(client, bbox, 'max_price=1000') == [20.0, 95.0]
+        assert listed(client, bbox, 'min_rating=4') == [20.0, 95.0]
+        assert loads == [1]
+    finally:
+        facade.place_repo.get_snapshot_rows = original
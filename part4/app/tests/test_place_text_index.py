@@ -0,0 +1,93 @@
+#!/usr/bin/python3
+""" Tests for the BM25 keyword index behind the place search """
+
+import datetime
+import uuid
+from app.services.place_text_index import PlaceTextIndex, tokenize
+
+
+class FakePlaceRepository:
+    def __init__(self, rows):
+        self.rows = rows
+        self.builds = 0
+        self.marker = (len(rows), datetime.datetime(2024, 1, 1))
+
+    def on_change(self, listener):
+        self.listener = listener
+
+    def get_text_rows(self):
+        self.builds += 1
+        return self.rows
+
+    def get_change_marker(self):
+        return self.marker
+
+
+ROWS = [
+    ('p1', 'Cozy cabin', 'A small wooden cabin in the woods'),
+    ('p2', 'Beach villa', 'Large villa with a pool, a short walk from a cozy cafe'),
+    ('p3', 'City loft', 'Modern loft downtown'),
+]
+
+
+def test_tokenize():
+    assert tokenize('The Cozy Cafés, by the Sea!') == ['cozy', 'cafe', 'sea']
+    assert tokenize('glass houses') == ['glass', 'house']
+
+
+def test_ranking_and_prefix():
+    index = PlaceTextIndex(FakePlaceRepository(ROWS))
+
+    ranked = [place_id for place_id, _ in index.search('cozy')]
+    assert ranked == ['p1', 'p2']  # a title match beats a description match
+    assert [place_id for place_id, _ in index.search('lof')] == ['p3']
+    assert index.search('cozy', place_ids=['p2'])[0][0] == 'p2'
+    assert index.search('the') == []
+
+
+def test_places_without_terms():
+    """ Places whose text is all stop words are indexed with no terms, and searches still answer """
+    index = PlaceTextIndex(FakePlaceRepository([('p1', 'The A', 'a b c of the')]))
+    assert index.search('cozy') == []
+
+
+def test_warm_start_from_file(tmp_path):
+    path = str(tmp_path / 'index.json')
+    repo = FakePlaceRepository(ROWS)
+    first = PlaceTextIndex(repo, path)
+    expected = first.search('villa pool')
+    first.save()
+
+    second = PlaceTextIndex(repo, path)
+    assert second.search('villa pool') == expected
+    assert repo.builds == 1
+
+    # Once the places table has changed, the saved file is ignored
+    repo.marker = (4, datetime.datetime(2024, 1, 2))
+    third = PlaceTextIndex(repo, path)
+    third.search('villa')
+    assert repo.builds == 2
+
+
+def test_search_endpoint_is_ranked_and_follows_updates(client, make_user, make_place):
+    from app.services import facade
+
+    tag = uuid.uuid4().hex[:8]
+    owner = make_user('Text', 'Owner')
+
+    def place(title, description):
+        return make_place(owner, title=title, description=description, latitude=1.0, longitude=1.0)
+
+    mentioned = place('Quiet flat', 'Near the {} market'.format(tag))
+    titled = place('{} house'.format(tag), 'Spacious')
+
+    def search(words):
+        response = client.post('/api/v1/places/search', json={'name': words, 'price': '0', 'amenities': []})
+        assert response.status_code == 200
+        return [result['place_id'] for result in response.get_json()]
+
+    assert search(tag) == [titled.id, mentioned.id]
+
+    facade.update_place(mentioned.id, {'description': 'Near the station'})
+    assert search(tag) == [titled.id]
+    assert search('{} station'.format(tag)) == [titled.id, mentioned.id]
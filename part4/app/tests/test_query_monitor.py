@@ -0,0 +1,59 @@
+#!/usr/bin/python3
+""" Tests for the N+1 query detector """
+
+import warnings
+import pytest
+from app.persistence.query_monitor import (track_queries, NPlusOneError, NPlusOneWarning,
+                                           MODE_RAISE, MODE_WARN)
+
+
+@pytest.fixture
+def places_with_amenities(make_user, make_place):
+    """ Creates an owner with a few places, each with one amenity """
+    from app.services import facade
+
+    owner = make_user('Nplus', 'One')
+    amenity = facade.create_amenity({'name': 'N+1 Detector Pool'})
+    places = []
+    for i in range(4):
+        place = make_place(owner, title='N+1 place {}'.format(i), latitude=1.0, longitude=1.0)
+        place.amenities_r.append(amenity)
+        places.append(place)
+
+    from app.persistence import db_session
+    db_session.commit()
+    db_session.expire_all()
+    return places
+
+
+def test_lazy_loads_in_a_loop_raise(places_with_amenities):
+    """ Walking a lazy relationship for every row trips the detector """
+    from app.services import facade
+
+    with pytest.raises(NPlusOneError):
+        with track_queries(mode=MODE_RAISE, threshold=2):
+            for place in places_with_amenities:
+                facade.get_place_amenities(place.id)
+
+
+def test_lazy_loads_in_a_loop_warn(places_with_amenities):
+    """ Warn mode reports the relationship once and carries on """
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        with track_queries(mode=MODE_WARN, threshold=2) as monitor:
+            for place in places_with_amenities:
+                place.amenities_r
+
+    flagged = [w for w in caught if issubclass(w.category, NPlusOneWarning)]
+    assert len(flagged) == 1
+    assert 'Place.amenities_r' in str(flagged[0].message)
+    assert monitor.lazy_loads['Place.amenities_r'] == len(places_with_amenities)
+
+
+def test_assert_max_queries_counts_request_queries(client, assert_max_queries):
+    """ The fixture sees the queries issued while a request is being served """
+    with assert_max_queries(1) as monitor:
+        response = client.get('/api/v1/users/')
+
+    assert response.status_code == 200
+    assert monitor.query_count == 1
@@ -0,0 +1,80 @@
+#!/usr/bin/python3
+""" Tests for the login / write rate limiter """
+
+import time
+import pytest
+from app.api.rate_limit import limiter, InMemoryBucketStore, SQLiteBucketStore
+
+
+@pytest.fixture
+def limits_on(app):
+    """ Turns the limiter on (it is off under the testing config) with a tiny login budget """
+    saved = (limiter.enabled, limiter.store, dict(limiter.policies['login']))
+    limiter.enabled = True
+    limiter.store = InMemoryBucketStore()
+    limiter.policies['login'].update({'rate': 1 / 60, 'burst': 2})
+    yield limiter
+    limiter.enabled, limiter.store = saved[0], saved[1]
+    limiter.policies['login'] = saved[2]
+
+
+def test_login_is_throttled(client, limits_on):
+    """ Past the burst, logins get a 429 with Retry-After """
+    credentials = {'email': 'nobody@example.com', 'password': 'wrong'}
+    statuses = [client.post('/api/v1/auth/login', json=credentials).status_code for _ in range(3)]
+
+    assert statuses == [401, 401, 429]
+    response = client.post('/api/v1/auth/login', json=credentials)
+    assert 1 <= int(response.headers['Retry-After']) <= 60
+
+
+def test_no_lockout_by_email(client, limits_on):
+    """ Failed logins for an account from one address don't lock its owner out elsewhere """
+    for _ in range(3):
+        client.post('/api/v1/auth/login', json={'email': 'victim@example.com', 'password': 'x'},
+                    environ_base={'REMOTE_ADDR': '10.0.0.1'})
+    response = client.post('/api/v1/auth/login', json={'email': 'victim@example.com', 'password': 'x'},
+                           environ_base={'REMOTE_ADDR': '10.0.0.2'})
+    assert response.status_code == 401
+
+
+@pytest.mark.parametrize('store', [InMemoryBucketStore, SQLiteBucketStore])
+def test_refused_call_takes_no_token(tmp_path, store):
+    """ When one bucket is empty, the others keep their tokens """
+    store = store(str(tmp_path / 'limits.db')) if store is SQLiteBucketStore else store()
+    assert store.take(['write:user:1'], 1 / 60, 1) == 0
+
+    # The user's bucket is empty: the IP's is left alone, and stays full for another user
+    assert store.take(['write:ip:1.2.3.4', 'write:user:1'], 1 / 60, 1) > 0
+    assert store.take(['write:ip:1.2.3.4', 'write:user:2'], 1 / 60, 1) == 0
+
+
+def test_policies_are_validated():
+    """ A rate of 0 would never refill the bucket """
+    from app.api.rate_limit import validate_policy
+
+    with pytest.raises(ValueError):
+        validate_policy('login', {'rate': 0, 'burst': 5, 'keys': ('ip',)})
+    with pytest.raises(ValueError):
+        validate_policy('login', {'rate': 1, 'burst': 0, 'keys': ('ip',)})
+    validate_policy('login', {'rate': 1, 'burst': 1, 'keys': ('ip',)})
+
+
+def test_sqlite_store_is_shared(tmp_path):
+    """ Two stores on the same file (i.e. two workers) draw from the same bucket """
+    path = str(tmp_path / 'limits.db')
+    first, second = SQLiteBucketStore(path), SQLiteBucketStore(path)
+
+    assert first.take(['login:ip:1.2.3.4'], 1 / 60, 2) == 0
+    assert second.take(['login:ip:1.2.3.4'], 1 / 60, 2) == 0
+    assert first.take(['login:ip:1.2.3.4'], 1 / 60, 2) > 0
+
+
+def test_sqlite_store_forgets_full_buckets(tmp_path):
+    """ A bucket that has refilled is deleted: it is the same as no bucket """
+    store = SQLiteBucketStore(str(tmp_path / 'limits.db'))
+    store.take(['write:ip:1.2.3.4'], 1000, 1)
+    time.sleep(0.01)
+    store.take(['write:ip:5.6.7.8'], 1000, 1)
+    keys = [key for key, in store._connect().execute("SELECT key FROM buckets")]
+    assert keys == ['write:ip:5.6.7.8']
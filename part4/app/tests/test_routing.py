@@ -0,0 +1,93 @@
+#!/usr/bin/python3
+""" Tests for sending reads to a replica and writes to the primary """
+
+import uuid
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from app.persistence import Base, init_db
+from app.persistence.routing import Router, RoutingSession, install, use_primary
+
+
+@pytest.fixture
+def routed_session(tmp_path):
+    """
+    A session over two SQLite files standing in for a primary and its replica.
+    Nothing replicates between them, so a row can only be found where it was written.
+    """
+    init_db()
+    primary = create_engine('sqlite:///{}'.format(tmp_path / 'primary.db'))
+    replica = create_engine('sqlite:///{}'.format(tmp_path / 'replica.db'))
+    Base.metadata.create_all(primary)
+    Base.metadata.create_all(replica)
+
+    router = Router(primary, [replica], lag=60)
+    factory = sessionmaker(class_=RoutingSession, router=router, bind=primary, expire_on_commit=False)
+    install(router, factory)
+    session = factory()
+    yield session, router
+    session.close()
+
+
+def new_amenity():
+    from app.models.amenity import Amenity
+    return Amenity(name='Routed {}'.format(uuid.uuid4().hex[:8]))
+
+
+def test_reads_go_to_the_replica(routed_session):
+    from app.models.amenity import Amenity
+    session, router = routed_session
+
+    assert session.query(Amenity).count() == 0
+    assert router.last_write is None
+
+
+def test_read_your_writes(routed_session):
+    """ A write pins reads to the primary until the replica lag has passed """
+    from app.models.amenity import Amenity
+    session, router = routed_session
+
+    session.add(new_amenity())
+    session.commit()
+    assert session.query(Amenity).count() == 1
+
+    router.lag = 0
+    assert session.query(Amenity).count() == 0
+    with use_primary():
+        assert session.query(Amenity).count() == 1
+
+
+def test_read_your_writes_is_per_client(routed_session):
+    """ In requests, only the client that wrote has its reads pinned, through its cookie """
+    from flask import Flask
+    from app.models.amenity import Amenity
+    from app.persistence.routing import init_app, LAST_WRITE_COOKIE
+    session, router = routed_session
+
+    app = Flask(__name__)
+    init_app(app, router)
+
+    @app.route('/amenities', methods=['GET', 'POST'])
+    def amenities():
+        from flask import request
+        if request.method == 'POST':
+            session.add(new_amenity())
+            session.commit()
+        return {'count': session.query(Amenity).count()}
+
+    writer, reader = app.test_client(), app.test_client()
+    response = writer.post('/amenities')
+    assert response.get_json() == {'count': 1}
+    assert LAST_WRITE_COOKIE in response.headers['Set-Cookie']
+
+    assert writer.get('/amenities').get_json() == {'count': 1}
+    assert reader.get('/amenities').get_json() == {'count': 0}
+    # The process as a whole isn't pinned
+    assert router.last_write is None
+
+
+def test_without_replicas_everything_uses_the_primary(tmp_path):
+    primary = create_engine('sqlite:///{}'.format(tmp_path / 'primary.db'))
+    router = Router(primary)
+    from app.models.amenity import Amenity
+    assert router.engine_for(select(Amenity)) is primary
@@ -0,0 +1,59 @@
+#!/usr/bin/python3
+""" Tests for per-request sessions and the identity-map cap """
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+
+@pytest.fixture
+def users(make_user):
+    """ Ten fresh users """
+    return [make_user('Scope', str(i)) for i in range(10)]
+
+
+def test_requests_start_and_end_with_a_fresh_session(client, users):
+    from app.persistence import db_session
+
+    assert users[0] in db_session
+    response = client.get('/api/v1/users/{}'.format(users[0].id))
+    assert response.status_code == 200
+    # The session the objects were loaded in is gone, along with its identity map
+    assert len(db_session.identity_map) == 0
+    assert users[0] not in db_session
+    assert users[0].first_name == 'Scope'
+
+
+def test_trim_keeps_pending_changes(app, users):
+    from app.persistence import db_session
+    from app.persistence.session_scope import trim_identity_map
+    from app.models.user import User
+
+    db_session.expunge_all()
+    loaded = db_session.query(User).where(User.id.in_([user.id for user in users])).all()
+    loaded[0].first_name = 'Changed'
+
+    assert trim_identity_map(db_session, 20) == 0
+    evicted = trim_identity_map(db_session, 5)
+    assert len(db_session.identity_map) <= 4
+    assert evicted == 10 - len(db_session.identity_map)
+    # The oldest object was modified, so it stays
+    assert loaded[0] in db_session
+    db_session.rollback()
+
+
+def test_cap_is_applied_on_commit(app, users):
+    from app.persistence import engine, session_scope
+    from app.models.user import User
+
+    factory = sessionmaker(bind=engine, expire_on_commit=False)
+    session_scope.install(factory, 5)
+    session = factory()
+    try:
+        # Kept referenced, as a batch job holding its rows would (the identity map is weak)
+        loaded = session.query(User).where(User.id.in_([user.id for user in users])).all()
+        assert len(session.identity_map) == 10
+        session.commit()
+        assert len(session.identity_map) <= 5
+        assert len(loaded) == 10
+    finally:
+        session.close()
@@ -0,0 +1,47 @@
+#!/usr/bin/python3
+"""
+Soak test: the worker's memory stays flat over many requests.
+
+Runs a short soak by default; for the full run:
+    HBNB_SOAK_REQUESTS=100000 python -m pytest -q app/tests/test_soak.py
+"""
+
+import gc
+import os
+import pytest
+
+REQUESTS = int(os.getenv('HBNB_SOAK_REQUESTS', '1000'))
+# Allowed RSS growth once warmed up (allocator and cache noise, not per-request growth)
+MAX_GROWTH_BYTES = 8 * 1024 * 1024
+
+
+def rss_bytes():
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/statm'), reason='needs /proc to read the RSS')
+def test_rss_stays_flat(client, make_user, make_place):
+    from app.persistence import db_session
+
+    owner = make_user('Soak', 'Owner')
+    place = make_place(owner, title='Soak', latitude=-80.0, longitude=170.0)
+    urls = ['/api/v1/places/?fields=id,title,price', '/api/v1/places/{}'.format(place.id),
+            '/api/v1/users/{}'.format(owner.id), '/api/v1/places/{}/reviews/'.format(place.id)]
+
+    def run(count):
+        for i in range(count):
+            client.get(urls[i % len(urls)])
+
+    # Warm up caches, pools and indexes before taking the baseline
+    run(max(200, REQUESTS // 10))
+    gc.collect()
+    baseline = rss_bytes()
+
+    run(REQUESTS)
+    gc.collect()
+    growth = rss_bytes() - baseline
+
+    assert len(db_session.identity_map) == 0
+    assert growth < MAX_GROWTH_BYTES, "RSS grew by {:.1f} MB over {} requests".format(
+        growth / 1024 / 1024, REQUESTS)
@@ -0,0 +1,61 @@
+#!/usr/bin/python3
+""" Tests for ?fields= sparse fieldsets """
+
+import pytest
+
+
+@pytest.fixture
+def place(make_user, make_place):
+    from app.persistence import db_session
+
+    owner = make_user('Sparse', 'Fields')
+    place = make_place(owner, title='Sparse place', description='A very long description',
+                       price=50.0, latitude=5.0, longitude=5.0)
+    # Start from an empty identity map so that the request has to load the row itself
+    db_session.expunge_all()
+    return place
+
+
+def test_list_only_loads_requested_columns(client, place, assert_max_queries):
+    """ Map markers don't pay for descriptions or amenities """
+    with assert_max_queries(1) as monitor:
+        response = client.get('/api/v1/places/?fields=id,title,price,latitude,longitude')
+
+    listed = [found for found in response.get_json() if found['id'] == place.id]
+    assert listed == [{'id': place.id, 'title': 'Sparse place', 'price': 50.0,
+                       'latitude': 5.0, 'longitude': 5.0}]
+    assert 'description' not in monitor.statements[0]
+
+
+def test_detail_without_relationships(client, place, assert_max_queries):
+    """ Leaving out owner and amenities skips both lookups """
+    with assert_max_queries(1):
+        response = client.get('/api/v1/places/{}?fields=title'.format(place.id))
+
+    assert response.get_json() == {'title': 'Sparse place'}
+
+
+def test_unknown_field(client, place):
+    """ Asking for a field that doesn't exist is a client error """
+    response = client.get('/api/v1/users/?fields=id,password')
+    assert response.status_code == 400
+
+    # Reviews are only part of the place details, not of listings
+    assert client.get('/api/v1/places/?fields=id,reviews').status_code == 400
+    assert client.get('/api/v1/places/?ids={}&fields=id,reviews'.format(place.id)).status_code == 400
+    assert client.get('/api/v1/places/{}?fields=id,reviews'.format(place.id)).status_code == 200
+
+
+def test_listings_skip_the_identity_map(client, place, assert_max_queries):
+    """ Listings are rendered from plain rows: no model instances end up in the session """
+    from app.persistence import db_session
+
+    with assert_max_queries(3):
+        for url in ('/api/v1/places/?fields=id,title,owner', '/api/v1/users/?fields=id,email',
+                    '/api/v1/reviews/'):
+            assert client.get(url).status_code == 200
+    assert len(db_session.identity_map) == 0
+
+    listed = [found for found in client.get('/api/v1/places/?fields=id,owner').get_json()
+              if found['id'] == place.id]
+    assert listed[0]['owner']['first_name'] == 'Sparse'
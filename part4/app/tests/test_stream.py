@@ -0,0 +1,102 @@
+#!/usr/bin/python3
+""" Tests for the event bus and the GET /api/v1/stream/ Server-Sent Events endpoint """
+
+import json
+from app.services.event_bus import EventBus, ALL, DROPPED
+
+
+def test_bus_topics():
+    bus = EventBus()
+    place = bus.subscribe('place-1')
+    other = bus.subscribe('place-2')
+    everything = bus.subscribe(ALL)
+
+    bus.publish('place-1', 'review', {'rating': 5})
+    assert place.get(timeout=0)[1:] == ('review', {'rating': 5})
+    assert everything.get(timeout=0)[1:] == ('review', {'rating': 5})
+    assert other.get(timeout=0) is None
+
+    for subscription in (place, other, everything):
+        subscription.close()
+    assert bus.subscriber_count() == 0
+
+
+def test_slow_subscribers_are_dropped():
+    bus = EventBus(max_queued=3, max_subscribers=2)
+    slow = bus.subscribe('place-1')
+    fast = bus.subscribe('place-1')
+    assert bus.subscribe('place-1') is None  # full
+
+    for number in range(4):
+        bus.publish('place-1', 'review', {'number': number})
+        fast.get(timeout=0)
+
+    assert slow.dropped and slow.get(timeout=0) is DROPPED
+    assert not fast.dropped
+    assert bus.subscriber_count() == 1
+
+
+def read_event(stream, event_type):
+    """ The data of the next `event_type` message, skipping heartbeats """
+    for _ in range(100):
+        chunk = next(stream).decode()
+        if chunk.startswith('id:') and 'event: {}\n'.format(event_type) in chunk:
+            return json.loads(chunk.split('data: ', 1)[1])
+    raise AssertionError('no {} event'.format(event_type))
+
+
+def test_new_reviews_are_pushed(client, make_user, make_place):
+    from app.services import facade
+
+    owner, guest = make_user('Stream', 'Owner'), make_user('Stream', 'Guest')
+    place = make_place(owner, title='Stream', latitude=2.0, longitude=2.0)
+    subscribers = facade.events.subscriber_count()
+
+    response = client.get('/api/v1/stream/?place_id={}'.format(place.id))
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    stream = iter(response.response)
+    assert next(stream).decode().startswith('retry:')
+    assert next(stream).decode() == ': heartbeat\n\n'
+
+    review = facade.create_review({'text': 'Lovely', 'rating': 5, 'place_id': place.id, 'user_id': guest.id})
+    assert read_event(stream, 'review') == {'action': 'create', 'id': review.id, 'place_id': place.id,
+                                            'user_id': guest.id, 'rating': 5, 'text': 'Lovely'}
+    facade.update_place(place.id, {'price': 12.0})
+    assert read_event(stream, 'place')['price'] == 12.0
+    facade.delete_review(review.id)
+    assert read_event(stream, 'review') == {'action': 'delete', 'id': review.id, 'place_id': place.id, 'rating': 5}
+
+    # Closing the connection ends the subscription
+    response.close()
+    assert facade.events.subscriber_count() == subscribers
+
+    assert client.get('/api/v1/stream/?place_id=no-such-place').status_code == 404
+
+
+def test_streams_closed_before_reading_end_their_subscription(app, make_user, make_place):
+    from app.services import facade
+
+    place = make_place(make_user('Stream', 'Early'), title='Stream early', latitude=2.0, longitude=2.0)
+    subscribers = facade.events.subscriber_count()
+
+    # The client is gone before the first chunk was sent (the test client would read it)
+    with app.test_request_context('/api/v1/stream/?place_id={}'.format(place.id)):
+        response = app.full_dispatch_request()
+    assert facade.events.subscriber_count() == subscribers + 1
+    response.close()
+    assert facade.events.subscriber_count() == subscribers
+
+
+def test_place_id_in_uppercase(client, make_user, make_place):
+    from app.services import facade
+
+    owner, guest = make_user('Stream', 'Upper'), make_user('Stream', 'Guest')
+    place = make_place(owner, title='Stream upper', latitude=2.0, longitude=2.0)
+
+    response = client.get('/api/v1/stream/?place_id={}'.format(place.id.upper()))
+    assert response.status_code == 200
+    stream = iter(response.response)
+    review = facade.create_review({'text': 'Fine', 'rating': 4, 'place_id': place.id, 'user_id': guest.id})
+    assert read_event(stream, 'review')['id'] == review.id
+    response.close()
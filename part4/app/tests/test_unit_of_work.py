@@ -0,0 +1,87 @@
+#!/usr/bin/python3
+""" Tests for facade.transaction() """
+
+import uuid
+import pytest
+from sqlalchemy import event
+
+
+@pytest.fixture
+def commits(app):
+    """ Counts the commits made on the shared session """
+    from app.persistence import db_session
+
+    count = []
+    listener = lambda session: count.append(1)
+    event.listen(db_session, 'after_commit', listener)
+    yield count
+    event.remove(db_session, 'after_commit', listener)
+
+
+def place_data(owner_id, title='UoW place'):
+    return {'title': title, 'description': 'test', 'price': 20.0,
+            'latitude': 2.0, 'longitude': 2.0, 'owner_id': owner_id}
+
+
+def test_place_and_amenities_in_one_commit(commits, make_user):
+    from app.services import facade
+
+    owner = make_user('Owner')
+    amenities = [facade.create_amenity({'name': 'UoW amenity {}'.format(uuid.uuid4().hex[:8])})
+                 for _ in range(3)]
+    commits.clear()
+
+    place = facade.create_place(place_data(owner.id), [amenity.id for amenity in amenities])
+
+    assert len(commits) == 1
+    assert sorted(facade.place_repo.get_amenity_ids([place.id])[place.id]) == sorted(a.id for a in amenities)
+
+
+def test_rollback_on_error(commits, make_user):
+    from app.services import facade
+
+    owner = make_user('Owner')
+    commits.clear()
+    title = 'Rolled back {}'.format(uuid.uuid4().hex)
+
+    with pytest.raises(RuntimeError):
+        with facade.transaction():
+            facade.create_place(place_data(owner.id, title))
+            raise RuntimeError('boom')
+
+    assert commits == []
+    assert facade.place_repo.get_by_attribute('_title', title) is None
+
+
+def test_delete_user_removes_places_and_their_reviews(commits, make_user):
+    from app.services import facade
+
+    owner = make_user('Owner')
+    reviewer = make_user('Reviewer')
+    place = facade.create_place(place_data(owner.id))
+    review = facade.create_review({'text': 'Nice', 'rating': 4, 'place_id': place.id, 'user_id': reviewer.id})
+    commits.clear()
+
+    facade.delete_user(owner.id)
+
+    assert len(commits) == 1
+    assert facade.get_user(owner.id) is None
+    assert facade.get_place(place.id) is None
+    assert facade.get_review(review.id) is None
+    assert facade.get_user(reviewer.id) is not None
+
+
+def test_create_place_with_amenities(client, auth_headers):
+    from app.services import facade
+
+    headers = auth_headers()
+    amenity = facade.create_amenity({'name': 'UoW API amenity {}'.format(uuid.uuid4().hex[:8])})
+    payload = {'title': 'API place', 'description': 'test', 'price': 30.0,
+               'latitude': 3.0, 'longitude': 3.0, 'amenities': [{'id': amenity.id}]}
+
+    response = client.post('/api/v1/places/', json=payload, headers=headers)
+    assert response.status_code == 201
+    assert response.get_json()['amenities'] == [amenity.id]
+
+    payload['amenities'] = ['no-such-amenity']
+    assert client.post('/api/v1/places/', json=payload, headers=headers).status_code == 400
@@ -0,0 +1,90 @@
+#!/usr/bin/python3
+""" Tests for the time-ordered binary UUID keys """
+
+import uuid
+from sqlalchemy import create_engine, text
+
+
+def test_uuid7_is_time_ordered():
+    from app.models.types import uuid7
+
+    ids = [uuid7() for _ in range(5000)]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+    parsed = uuid.UUID(ids[0])
+    assert parsed.version == 7 and parsed.variant == uuid.RFC_4122
+    assert str(parsed) == ids[0]
+
+
+def test_ids_are_stored_as_16_bytes(app):
+    from app.services import facade
+    from app.persistence import db_session
+
+    amenity = facade.create_amenity({'name': 'Binary key {}'.format(uuid.uuid4().hex[:8])})
+    stored = db_session.execute(text("SELECT id FROM amenities WHERE name = :name"),
+                                {'name': amenity.name}).scalar()
+    assert stored == uuid.UUID(amenity.id).bytes
+    # ... while the models and the API keep the string form
+    assert facade.get_amenity(amenity.id).id == amenity.id
+    assert facade.get_amenity('not-a-uuid') is None
+
+
+def test_sqlite_migration(tmp_path):
+    from migrate_uuid_binary import migrate
+
+    engine = create_engine('sqlite:///{}'.format(tmp_path / 'legacy.db'))
+    user_id, place_id = str(uuid.uuid4()), str(uuid.uuid4())
+    with engine.begin() as connection:
+        for statement in ("CREATE TABLE users (id VARCHAR(36) PRIMARY KEY)",
+                          "CREATE TABLE amenities (id VARCHAR(36) PRIMARY KEY)",
+                          "CREATE TABLE places (id VARCHAR(36) PRIMARY KEY, owner_id VARCHAR(60))",
+                          "CREATE TABLE reviews (id VARCHAR(36) PRIMARY KEY, place_id VARCHAR(60), user_id VARCHAR(60))",
+                          "CREATE TABLE place_amenity (place_id VARCHAR(60), amenity_id VARCHAR(60))"):
+            connection.execute(text(statement))
+        connection.execute(text("INSERT INTO users VALUES (:id)"), {'id': user_id})
+        connection.execute(text("INSERT INTO places VALUES (:id, :owner)"), {'id': place_id, 'owner': user_id})
+
+    migrate(engine)
+    migrate(engine)  # a second run finds nothing to do
+    with engine.begin() as connection:
+        # A row left in text form (e.g. written by an old worker meanwhile) is picked up by a rerun
+        connection.execute(text("INSERT INTO users VALUES (:id)"), {'id': str(uuid.uuid4())})
+    migrate(engine)
+
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT id, owner_id FROM places")).one() == \
+            (uuid.UUID(place_id).bytes, uuid.UUID(user_id).bytes)
+
+
+def test_mysql_migration_finishes_a_partial_run():
+    from migrate_uuid_binary import mysql_statements, ID_COLUMNS, FOREIGN_KEYS
+
+    # A run that stopped after converting users, amenities and places, and during reviews
+    column_types = {table: {column: 'BINARY(16)' for column in columns} for table, columns in ID_COLUMNS.items()}
+    column_types['reviews'].update(place_id='VARBINARY(36)', user_id='VARBINARY(36)')
+    column_types['place_amenity'] = {'place_id': 'CHAR(36)', 'amenity_id': 'CHAR(36)'}
+    foreign_keys = {table: {} for table in ID_COLUMNS}
+    foreign_keys['place_amenity'] = {'place_amenity_ibfk_1': ['place_id']}
+
+    statements = mysql_statements(column_types, foreign_keys)
+    assert statements[0] == "ALTER TABLE `place_amenity` DROP FOREIGN KEY `place_amenity_ibfk_1`"
+    converted = [statement.split('`')[1] for statement in statements if 'MODIFY' in statement]
+    assert converted == ['reviews', 'reviews', 'place_amenity', 'place_amenity']
+    assert "ALTER TABLE `reviews` MODIFY `place_id` BINARY(16) NOT NULL, MODIFY `user_id` BINARY(16) NOT NULL" \
+        in statements
+    assert "`place_id` = IF(LENGTH(`place_id`) = 36, UUID_TO_BIN(`place_id`), `place_id`)" in statements[2]
+    # Every foreign key comes back under its name in tables.sql
+    added = [statement.split('`')[3] for statement in statements if 'ADD CONSTRAINT' in statement]
+    assert added == [name for name, _, _, _ in FOREIGN_KEYS]
+
+    # Once everything is converted, there is nothing left but the foreign keys named otherwise
+    column_types = {table: {column: 'BINARY(16)' for column in columns} for table, columns in ID_COLUMNS.items()}
+    foreign_keys = {table: {} for table in ID_COLUMNS}
+    for name, table, column, _ in FOREIGN_KEYS:
+        foreign_keys[table][name] = [column]
+    assert mysql_statements(column_types, foreign_keys) == []
+    foreign_keys['places'] = {'places_owner_id_fk': ['owner_id']}
+    assert mysql_statements(column_types, foreign_keys) == [
+        "ALTER TABLE `places` DROP FOREIGN KEY `places_owner_id_fk`",
+        "ALTER TABLE `places` ADD CONSTRAINT `places_ibfk_1` FOREIGN KEY (`owner_id`) "
+        "REFERENCES `users` (`id`) ON DELETE CASCADE"]
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Listing read-path benchmark
+
+Fills a throwaway SQLite file with N places, then loads and renders the whole
+listing the way the API does, once through ORM objects (get_all) and once
+through read-only rows (get_rows). Prints the memory held per loaded row and
+the rows per second of load + render.
+
+    python benchmarks/bench_list_rows.py [places]
+"""
+
+import gc
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+PART4_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_FILE = os.path.join(tempfile.mkdtemp(prefix='hbnb-bench-'), 'bench.db')
+os.environ['HBNB_DATABASE_URL'] = 'sqlite:///' + DB_FILE
+os.environ.setdefault('HBNB_N_PLUS_ONE_MODE', 'off')
+
+sys.path.insert(0, PART4_DIR)
+from app.persistence import db_session, init_db
+from app.persistence.place_repository import PlaceRepository
+from app.models.place import Place
+from app.models.user import User
+from app.models.types import uuid7
+
+FIELDS = ['id', 'title', 'description', 'price', 'latitude', 'longitude']
+
+
+def fill(count):
+    init_db()
+    now = datetime.now()
+    owner_id = uuid7()
+    db_session.execute(User.__table__.insert(), [
+        {'id': owner_id, 'first_name': 'Bench', 'last_name': 'Owner', 'email': 'bench@example.com',
+         'password': 'not-a-hash', 'created_at': now, 'updated_at': now}])
+    db_session.execute(Place.__table__.insert(), [
+        {'id': uuid7(), 'title': 'Place {}'.format(i), 'description': 'A place to stay ' * 4,
+         'price': 10.0 + i % 500, 'latitude': (i % 180) - 90.0, 'longitude': (i % 360) - 180.0,
+         'owner_id': owner_id, 'created_at': now, 'updated_at': now}
+        for i in range(count)])
+    db_session.commit()
+
+
+def render(places):
+    return [{field: getattr(place, field) for field in FIELDS} for place in places]
+
+
+def held_per_row(load, count):
+    """ Bytes still allocated per row while the loaded rows are kept """
+    gc.collect()
+    tracemalloc.start()
+    loaded = load()
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del loaded
+    db_session.expunge_all()
+    return held / count
+
+
+def rows_per_second(load, count, runs=5):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        render(load())
+        timings.append(time.perf_counter() - start)
+        db_session.expunge_all()
+    return count / statistics.median(timings)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    fill(count)
+    repo = PlaceRepository()
+
+    paths = (('ORM objects', lambda: repo.get_all(FIELDS)),
+             ('rows', lambda: repo.get_rows(FIELDS)))
+    assert render(paths[0][1]()) == render(paths[1][1]())
+    db_session.expunge_all()
+
+    print("{} places".format(count))
+    for label, load in paths:
+        print("{:<12} {:8.0f} bytes/row {:10.0f} rows/s".format(
+            label, held_per_row(load, count), rows_per_second(load, count)))
+
+
+if __name__ == '__main__':
+    main()
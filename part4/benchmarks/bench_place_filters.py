@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Place filter benchmark
+
+Times a price + bounding box + rating filter over N synthetic places, done by
+PlaceSnapshot (NumPy masks) and by a plain Python loop over the same rows.
+No DB is involved: the snapshot is fed by stand-in repositories.
+
+    python benchmarks/bench_place_filters.py [places]
+"""
+
+import os
+import random
+from datetime import datetime, timedelta
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.services.place_snapshot import PlaceSnapshot
+
+
+class Rows:
+    """ Stand-in for the place and review repositories """
+
+    def __init__(self, count):
+        rng = random.Random(42)
+        created = datetime(2024, 1, 1)
+        self.rows = [(str(i), rng.uniform(10, 500), rng.uniform(-90, 90), rng.uniform(-180, 180),
+                      created + timedelta(minutes=i)) for i in range(count)]
+        self.ratings = {str(i): rng.uniform(1, 5) for i in range(0, count, 3)}
+
+    def on_change(self, listener):
+        pass
+
+    def get_snapshot_rows(self, place_ids=None):
+        return self.rows
+
+    def get_average_ratings(self, place_ids=None):
+        return self.ratings
+
+
+def timed(func, runs=20):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(timings)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    data = Rows(count)
+    snapshot = PlaceSnapshot(data, data)
+    bbox = (30.0, -10.0, 60.0, 40.0)
+
+    def with_numpy():
+        return snapshot.filter(min_price=50, max_price=150, bbox=bbox, min_rating=4)
+
+    def with_loop():
+        return [place_id for place_id, price, latitude, longitude, created_at in data.rows
+                if 50 <= price <= 150 and bbox[0] <= latitude <= bbox[2] and bbox[1] <= longitude <= bbox[3]
+                and data.ratings.get(place_id, 0) >= 4]
+
+    with_numpy()  # the first call loads the snapshot
+    numpy_ids, numpy_ms = timed(with_numpy)
+    loop_ids, loop_ms = timed(with_loop)
+    assert sorted(numpy_ids) == sorted(loop_ids)
+
+    print("{} places, {} matches".format(count, len(numpy_ids)))
+    print("{:<14} median {:8.3f} ms".format('PlaceSnapshot', numpy_ms))
+    print("{:<14} median {:8.3f} ms".format('Python loop', loop_ms))
+
+
+if __name__ == '__main__':
+    main()
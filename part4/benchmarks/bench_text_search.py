@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Keyword search benchmark
+
+Builds the BM25 index over N synthetic places (no DB: the rows come from a
+stand-in repository) and times a few typical queries. The vocabulary is tiny,
+so every word is in a large share of the places - a worst case for postings.
+
+    python benchmarks/bench_text_search.py [places]
+"""
+
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.services.place_text_index import PlaceTextIndex
+
+WORDS = ("cozy quiet modern rustic spacious sunny charming luxury budget central beach mountain "
+         "lake city garden loft cabin villa studio apartment house cottage castle view pool "
+         "kitchen balcony fireplace parking wifi family friendly historic downtown").split()
+QUERIES = ['cozy cabin', 'beach villa pool', 'downtown loft', 'fire', 'quiet family house garden']
+
+
+class Rows:
+    """ Stand-in for the place repository """
+
+    def __init__(self, count):
+        rng = random.Random(7)
+        self.rows = [(str(i), ' '.join(rng.choices(WORDS, k=3)), ' '.join(rng.choices(WORDS, k=25)))
+                     for i in range(count)]
+
+    def on_change(self, listener):
+        pass
+
+    def get_text_rows(self):
+        return self.rows
+
+    def get_change_marker(self):
+        return len(self.rows), None
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    index = PlaceTextIndex(Rows(count))
+
+    start = time.perf_counter()
+    index.warm_up()
+    print("{} places, index built in {:.1f} ms".format(count, (time.perf_counter() - start) * 1000))
+
+    for query in QUERIES:
+        timings = []
+        for _ in range(20):
+            start = time.perf_counter()
+            results = index.search(query, limit=20)
+            timings.append((time.perf_counter() - start) * 1000)
+        print("{:<28} median {:8.3f} ms   ({} results shown)".format(
+            repr(query), statistics.median(timings), len(results)))
+
+
+if __name__ == '__main__':
+    main()
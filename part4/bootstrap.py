@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+HBnB bootstrap step
+
+Creates any missing tables and the default admin user, and saves the
+keyword search index so that workers start warm. Run this once per
+deployment (and before the test suite or demo data), instead of having
+every worker do it on import:
+
+    python bootstrap.py
+"""
+
+from app.persistence import init_db
+
+
+def bootstrap():
+    """ Prepare the DB so that the app can start serving requests """
+    from app.services import facade, seed_admin
+
+    init_db()
+    admin = seed_admin()
+    print("Schema ready, admin user: {}".format(admin.email))
+
+    facade.place_text_index.warm_up()
+    facade.place_text_index.save()
+
+
+if __name__ == '__main__':
+    bootstrap()
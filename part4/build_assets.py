@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+"""
+HBnB frontend build step
+
+Writes frontend/ to frontend/dist/ with content-hashed asset names and .br
+(if the brotli module is installed) / .gz copies of every text file, which
+the app then serves with long-lived cache headers. Run it on every deploy,
+before starting the app:
+
+    python build_assets.py
+"""
+
+from app import assets
+from config import Config
+
+
+if __name__ == '__main__':
+    manifest = assets.build(target=Config.ASSETS_DIR)
+    print("Built {} files into {} ({})".format(
+        len(manifest['files']), Config.ASSETS_DIR,
+        'br + gzip' if assets.brotli else 'gzip only: pip install brotli for .br files'))
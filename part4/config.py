@@ -1,13 +1,55 @@
 import os
 
+basedir = os.path.abspath(os.path.dirname(__file__))
+
 class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'default_secret_key')
     DEBUG = False
 
+    # N+1 query detection: 'off', 'warn' or 'raise'
+    N_PLUS_ONE_MODE = os.getenv('HBNB_N_PLUS_ONE_MODE', 'off')
+    N_PLUS_ONE_THRESHOLD = int(os.getenv('HBNB_N_PLUS_ONE_THRESHOLD', '5'))
+
+    # Rate limiting (see app/api/rate_limit.py). Use 'sqlite:///<path>' to share
+    # the limits between all the workers on one host.
+    RATE_LIMIT_ENABLED = True
+    RATE_LIMIT_STORAGE_URL = os.getenv('HBNB_RATE_LIMIT_STORAGE', 'memory://')
+    RATE_LIMITS = {}
+
+    # Responses kept for Idempotency-Key retries (see app/api/idempotency.py). Use
+    # 'sqlite:///<path>' to recognise retries that land on another worker of the host.
+    IDEMPOTENCY_STORAGE_URL = os.getenv('HBNB_IDEMPOTENCY_STORAGE', 'memory://')
+    IDEMPOTENCY_TTL = int(os.getenv('HBNB_IDEMPOTENCY_TTL', str(24 * 3600)))
+
+    # Seconds between the keep-alive comments of an idle /api/v1/stream connection
+    STREAM_HEARTBEAT = float(os.getenv('HBNB_STREAM_HEARTBEAT', '15'))
+
+    # Seconds a logged change waits before GET /api/v1/changes hands it out, so that
+    # transactions committing out of order can't be skipped (see app/persistence/change_log.py)
+    CHANGE_FEED_LAG = float(os.getenv('HBNB_CHANGE_FEED_LAG', '2'))
+
+    # Seconds between two checks of what the other workers changed (see CacheBroadcast);
+    # each check is one round trip to the shared cache
+    CACHE_SYNC_INTERVAL = float(os.getenv('HBNB_CACHE_SYNC_INTERVAL', '0.1'))
+
+    # Output of build_assets.py; without it the frontend is served from its sources
+    ASSETS_DIR = os.getenv('HBNB_ASSETS_DIR', os.path.join(basedir, 'frontend', 'dist'))
+
 class DevelopmentConfig(Config):
     DEBUG = True
+    N_PLUS_ONE_MODE = os.getenv('HBNB_N_PLUS_ONE_MODE', 'warn')
+
+class TestingConfig(Config):
+    TESTING = True
+    N_PLUS_ONE_MODE = 'raise'
+    RATE_LIMIT_ENABLED = False
+    STREAM_HEARTBEAT = 0.05
+    # SQLite has one writer at a time, so seq order is commit order
+    CHANGE_FEED_LAG = 0
+    CACHE_SYNC_INTERVAL = 0
 
 config = {
     'development': DevelopmentConfig,
+    'testing': TestingConfig,
     'default': DevelopmentConfig
 }
\ No newline at end of file
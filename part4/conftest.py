@@ -0,0 +1,9 @@
+""" Root pytest configuration - runs before the 'app' package is imported """
+
+import os
+import tempfile
+
+# Point the persistence layer at a throwaway SQLite file instead of the MySQL server
+_test_dir = tempfile.mkdtemp(prefix='hbnb-tests-')
+os.environ.setdefault('HBNB_DATABASE_URL', 'sqlite:///{}'.format(os.path.join(_test_dir, 'hbnb.db')))
+os.environ.setdefault('HBNB_SEARCH_INDEX_PATH', os.path.join(_test_dir, 'search-index.json'))
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+HBnB snapshot export
+
+Writes every place, with its owner, amenities and reviews, to the read-only
+snapshot file that workers started with HBNB_SNAPSHOT_PATH serve anonymous
+place GETs from (see app/services/data_snapshot.py):
+
+    python export_snapshot.py               # once
+    python export_snapshot.py --every 30    # keep it fresh: re-export every 30s, if anything changed
+"""
+
+import argparse
+import sys
+import time
+from app.persistence import session
+from app.services import facade
+from app.services.facade import SNAPSHOT_PATH
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--path', default=SNAPSHOT_PATH, help='snapshot file (default: $HBNB_SNAPSHOT_PATH)')
+    parser.add_argument('--every', type=float, help='seconds between exports; export once without it')
+    args = parser.parse_args(argv)
+    if not args.path:
+        parser.error('set HBNB_SNAPSHOT_PATH or pass --path')
+
+    seq = None
+    while True:
+        started = time.monotonic()
+        exported = facade.export_snapshot(args.path, seq)
+        if exported != seq:
+            print("Exported up to change {} in {:.2f}s".format(exported, time.monotonic() - started))
+        seq = exported
+        # Nothing should stay in memory between two exports
+        session.remove()
+        if not args.every:
+            return
+        time.sleep(args.every)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -4,7 +4,8 @@
 */
 
 // ===== CONFIGURATION =====
-const API_BASE_URL = 'http://127.0.0.1:5001/api/v1';
+// The pages are served by the API itself (see app/assets.py)
+const API_BASE_URL = '/api/v1';
 
 // ===== UTILITY FUNCTIONS =====
 
@@ -333,10 +334,12 @@ function checkAuthentication() {
 
 /**
  * Fetch places data from the API
+ * @param {string} maxPrice - Optional maximum price; the API does the filtering
  */
-async function fetchPlaces() {
+async function fetchPlaces(maxPrice = '') {
     try {
-        const response = await fetch(`${API_BASE_URL}/places/`, {
+        const query = maxPrice === '' ? '' : `?max_price=${encodeURIComponent(maxPrice)}`;
+        const response = await fetch(`${API_BASE_URL}/places/${query}`, {
             method: 'GET',
             headers: getAuthHeaders()
         });
@@ -489,20 +492,16 @@ function initializePriceFilter() {
  * Filter places by price without reloading the page
  * @param {string} maxPrice - Maximum price filter value
  */
-function filterPlacesByPrice(maxPrice) {
-    const placeCards = document.querySelectorAll('.place-card');
-
-    placeCards.forEach(card => {
-        const placePrice = parseFloat(card.getAttribute('data-price'));
+async function filterPlacesByPrice(maxPrice) {
+    // Places are only listed for logged-in users (see checkAuthentication)
+    if (!isAuthenticated()) {
+        return;
+    }
 
-        if (maxPrice === '' || placePrice <= parseFloat(maxPrice)) {
-            card.style.display = 'flex';  // Use flex to maintain the card layout
-        } else {
-            card.style.display = 'none';
-        }
-    });
+    // The API filters with ?max_price= so only the matching places are downloaded
+    await fetchPlaces(maxPrice);
 
-    const visiblePlaces = document.querySelectorAll('.place-card:not([style*="display: none"])').length;
+    const visiblePlaces = document.querySelectorAll('.place-card').length;
     console.log(`Price filter applied. Showing ${visiblePlaces} places with max price: ${maxPrice || 'All'}`);
 }
 
@@ -583,12 +582,17 @@ function checkPlaceAuthentication(placeId) {
  * Fetch place details from the API
  * @param {string|null} token - JWT token (can be null for unauthenticated requests)
  * @param {string} placeId - Place ID to fetch details for
+ * @param {boolean} [fresh] - Read the current data, not the (possibly older) snapshot
  */
-async function fetchPlaceDetails(token, placeId) {
+async function fetchPlaceDetails(token, placeId, fresh = false) {
     try {
         const headers = token ? getAuthHeaders() : { 'Content-Type': 'application/json' };
+        if (fresh) {
+            headers['Cache-Control'] = 'no-cache';
+        }
         
-        const response = await fetch(`${API_BASE_URL}/places/${placeId}`, {
+        // One request for everything the page shows: details, owner, amenities and reviews
+        const response = await fetch(`${API_BASE_URL}/places/${placeId}?include=owner,amenities,reviews`, {
             method: 'GET',
             headers: headers
         });
@@ -597,9 +601,14 @@ async function fetchPlaceDetails(token, placeId) {
             const place = await response.json();
             console.log('Fetched place details:', place);
             displayPlaceDetails(place);
-            
-            // Fetch reviews for this place
-            fetchPlaceReviews(placeId);
+            shownReviews = {
+                items: place.reviews.items.slice(),
+                total: place.reviews.total,
+                average_rating: place.reviews.average_rating,
+                per_page: place.reviews.per_page
+            };
+            displayPlaceReviews(shownReviews.items, shownReviews);
+            watchPlaceUpdates(token, placeId);
         } else {
             console.error('Failed to fetch place details:', response.status, response.statusText);
             // Show error message
@@ -617,6 +626,99 @@ async function fetchPlaceDetails(token, placeId) {
     }
 }
 
+/**
+ * Keep the place page current without polling. The server pushes an event
+ * (Server-Sent Events) whenever a change is committed, with the changed fields,
+ * and the page applies it as is. The browser reconnects on its own if the stream ends.
+ * @param {string|null} token - JWT token (can be null for unauthenticated requests)
+ * @param {string} placeId - Place ID to watch
+ */
+let placeUpdates = null;
+let shownReviews = null;   // The reviews on the page, with their total and average
+let placeRefetch = null;
+// A page that missed events reloads once it is reconnected, after a random delay
+// in this range (ms) so that the pages dropped together do not all reload at once
+const REFETCH_DELAY_MIN = 500;
+const REFETCH_DELAY_MAX = 5000;
+function watchPlaceUpdates(token, placeId) {
+    if (placeUpdates || typeof EventSource === 'undefined') return;
+
+    placeUpdates = new EventSource(`${API_BASE_URL}/stream/?place_id=${encodeURIComponent(placeId)}`);
+    placeUpdates.addEventListener('place', event => applyPlaceEvent(JSON.parse(event.data)));
+    placeUpdates.addEventListener('review', event => applyReviewEvent(JSON.parse(event.data)));
+
+    // Sent when the page fell behind. The stream ends, and the events sent until
+    // the browser reconnects are lost too: reload once it is back, bypassing the
+    // snapshot, which may be older than the events the page already applied.
+    let missedEvents = false;
+    placeUpdates.addEventListener('dropped', () => { missedEvents = true; });
+    placeUpdates.addEventListener('open', () => {
+        if (!missedEvents) return;
+        missedEvents = false;
+        clearTimeout(placeRefetch);
+        const delay = REFETCH_DELAY_MIN + Math.random() * (REFETCH_DELAY_MAX - REFETCH_DELAY_MIN);
+        placeRefetch = setTimeout(() => fetchPlaceDetails(token, placeId, true), delay);
+    });
+}
+
+/**
+ * Apply a pushed place change (title, description and price) to the page
+ * @param {Object} change - Event data: action, id and, unless deleted, the fields
+ */
+function applyPlaceEvent(change) {
+    if (change.action === 'delete') {
+        placeUpdates.close();
+        const placeDetails = document.getElementById('place-details');
+        if (placeDetails) {
+            placeDetails.innerHTML = '<div class="error-message" style="display: block;">This place is no longer available.</div>';
+        }
+        return;
+    }
+
+    document.title = `HBnB - ${change.title}`;
+    const placeTitle = document.getElementById('place-title');
+    if (placeTitle) placeTitle.textContent = change.title;
+    const placePrice = document.getElementById('place-price');
+    if (placePrice) placePrice.textContent = change.price || '0';
+    const placeDescriptionText = document.getElementById('place-description-text');
+    if (placeDescriptionText) placeDescriptionText.textContent = change.description;
+}
+
+/**
+ * Apply a pushed review change to the review list, count and average
+ * @param {Object} change - Event data: action, id, place_id, rating and, unless deleted, user_id and text
+ */
+function applyReviewEvent(change) {
+    if (!shownReviews) return;
+
+    const index = shownReviews.items.findIndex(review => review.id === change.id);
+    let ratingSum = (shownReviews.average_rating || 0) * shownReviews.total;
+
+    if (change.action === 'create') {
+        if (index !== -1) return;  // Already loaded
+        // Newest first, one page of them
+        shownReviews.items.unshift(change);
+        if (shownReviews.per_page && shownReviews.items.length > shownReviews.per_page) {
+            shownReviews.items.pop();
+        }
+        shownReviews.total += 1;
+        ratingSum += change.rating;
+    } else if (change.action === 'update') {
+        // A review further down the list: its old rating is unknown here, the
+        // average catches up on the next load
+        if (index === -1) return;
+        ratingSum += change.rating - shownReviews.items[index].rating;
+        shownReviews.items[index] = Object.assign({}, shownReviews.items[index], change);
+    } else if (change.action === 'delete') {
+        if (index !== -1) shownReviews.items.splice(index, 1);
+        shownReviews.total = Math.max(shownReviews.total - 1, 0);
+        ratingSum -= change.rating;
+    }
+
+    shownReviews.average_rating = shownReviews.total ? ratingSum / shownReviews.total : null;
+    displayPlaceReviews(shownReviews.items, shownReviews);
+}
+
 /**
  * Display place details in the page
  * @param {Object} place - Place object from API
@@ -785,8 +887,9 @@ async function fetchPlaceReviews(placeId) {
 /**
  * Display place reviews
  * @param {Array} reviews - Array of review objects
+ * @param {Object} [summary] - Review totals from the place details (total, average_rating)
  */
-function displayPlaceReviews(reviews) {
+function displayPlaceReviews(reviews, summary) {
     const reviewsContainer = document.getElementById('reviews-container');
     const noReviews = document.getElementById('no-reviews');
     
@@ -796,7 +899,7 @@ function displayPlaceReviews(reviews) {
     reviewsContainer.innerHTML = '';
     
     // Update rating and review count based on actual data
-    updatePlaceRating(reviews);
+    updatePlaceRating(reviews, summary);
     
     if (!reviews || reviews.length === 0) {
         // Show no reviews message
@@ -823,23 +926,26 @@ function displayPlaceReviews(reviews) {
 /**
  * Update place rating display based on review data
  * @param {Array} reviews - Array of review objects
+ * @param {Object} [summary] - Review totals computed by the API across all pages
  */
-function updatePlaceRating(reviews) {
+function updatePlaceRating(reviews, summary) {
     const starsElement = document.querySelector('.place-rating .stars');
     const ratingCountElement = document.querySelector('.place-rating .rating-count');
     
     if (!starsElement || !ratingCountElement) return;
     
-    if (!reviews || reviews.length === 0) {
+    const reviewCount = summary ? summary.total : (reviews ? reviews.length : 0);
+    if (reviewCount === 0) {
         // No reviews - show empty stars and no reviews text
         starsElement.textContent = '☆☆☆☆☆';
         ratingCountElement.textContent = '(No reviews yet)';
         return;
     }
     
-    // Calculate average rating
-    const totalRating = reviews.reduce((sum, review) => sum + review.rating, 0);
-    const averageRating = totalRating / reviews.length;
+    // Use the API's average when we have it (reviews are paginated), otherwise compute it
+    const averageRating = summary
+        ? summary.average_rating
+        : reviews.reduce((sum, review) => sum + review.rating, 0) / reviews.length;
     const roundedRating = Math.round(averageRating);
     
     // Generate stars display
@@ -849,9 +955,9 @@ function updatePlaceRating(reviews) {
     
     // Update display
     starsElement.textContent = starsDisplay;
-    ratingCountElement.textContent = `(${reviews.length} review${reviews.length !== 1 ? 's' : ''})`;
+    ratingCountElement.textContent = `(${reviewCount} review${reviewCount !== 1 ? 's' : ''})`;
     
-    console.log(`Updated rating: ${averageRating.toFixed(1)}/5 (${reviews.length} reviews)`);
+    console.log(`Updated rating: ${averageRating.toFixed(1)}/5 (${reviewCount} reviews)`);
 }
 
 /**
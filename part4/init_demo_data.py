@@ -9,6 +9,7 @@ This script populates the database with comprehensive demo data including:
 """
 
 from app.services.facade import HBnBFacade
+from bootstrap import bootstrap
 import sys
 import os
 
@@ -17,6 +18,8 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 def init_demo_data():
     """Initialize demo data for HBnB application"""
+    # Make sure the tables and the admin user exist first
+    bootstrap()
     facade = HBnBFacade()
     
     print("🚀 Starting demo data initialization...")
@@ -219,15 +222,13 @@ def init_demo_data():
                 'owner_id': owner.id
             }
             
-            place = facade.create_place(place_create_data)
+            # The place and its amenities are saved together, in one commit
+            amenity_ids = [created_amenities[amenity_name].id
+                           for amenity_name in place_data['amenities']
+                           if amenity_name in created_amenities]
+            place = facade.create_place(place_create_data, amenity_ids)
             created_places[place.title] = place
             
-            # Add amenities to place
-            for amenity_name in place_data['amenities']:
-                amenity = created_amenities.get(amenity_name)
-                if amenity:
-                    place.amenities_r.append(amenity)
-            
             print(f"  ✅ Created place: {place.title} (Owner: {owner.first_name} {owner.last_name})")
             print(f"      💡 Added {len(place_data['amenities'])} amenities")
             
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+One-off migration: varchar ids -> BINARY(16)
+
+Databases created before ids became binary UUIDs (see app/models/types.py) keep
+every id and foreign key as a 36-character string. This converts them in place.
+Every id keeps its value, so the ids that clients (and JWTs) already hold stay
+valid; only new rows get time-ordered (v7) ids.
+
+    python migrate_uuid_binary.py            # migrate the DB at HBNB_DATABASE_URL
+    python migrate_uuid_binary.py --dry-run  # MySQL: only print the statements
+
+Back the database up first. MySQL commits every ALTER TABLE on its own, so a run
+that fails halfway leaves some columns converted and others not: each step only
+does what is left, and running the script again finishes the job (on a migrated
+DB it does nothing).
+"""
+
+import sys
+import uuid
+from sqlalchemy import inspect, text
+
+# Every column that holds an id
+ID_COLUMNS = {
+    'users': ['id'],
+    'amenities': ['id'],
+    'places': ['id', 'owner_id'],
+    'reviews': ['id', 'place_id', 'user_id'],
+    'place_amenity': ['place_id', 'amenity_id'],
+}
+
+# (name, table, column, referenced table), recreated once the columns are converted.
+# The names are those of tables.sql, so that later migrations can refer to them.
+FOREIGN_KEYS = [
+    ('places_ibfk_1', 'places', 'owner_id', 'users'),
+    ('reviews_ibfk_1', 'reviews', 'place_id', 'places'),
+    ('reviews_ibfk_2', 'reviews', 'user_id', 'users'),
+    ('place_amenity_ibfk_1', 'place_amenity', 'place_id', 'places'),
+    ('place_amenity_ibfk_2', 'place_amenity', 'amenity_id', 'amenities'),
+]
+
+BINARY_ID = 'BINARY(16)'
+
+
+def mysql_state(connection):
+    """
+    What a MySQL database looks like now: ({table: {column: type}} of the id
+    columns, e.g. 'CHAR(36)' or 'BINARY(16)', and {table: {foreign key name: columns}})
+    """
+    inspector = inspect(connection)
+    column_types, foreign_keys = {}, {}
+    for table, columns in ID_COLUMNS.items():
+        column_types[table] = {column['name']: column['type'].compile(dialect=connection.dialect).upper()
+                               for column in inspector.get_columns(table) if column['name'] in columns}
+        foreign_keys[table] = {foreign_key['name']: foreign_key['constrained_columns']
+                               for foreign_key in inspector.get_foreign_keys(table)}
+    return column_types, foreign_keys
+
+
+def mysql_statements(column_types, foreign_keys):
+    """ The ALTER / UPDATE statements left to convert a MySQL database in the state given """
+    pending = {}
+    for table, columns in ID_COLUMNS.items():
+        left = [column for column in columns if column_types[table][column] != BINARY_ID]
+        if left:
+            pending[table] = left
+
+    statements = []
+    foreign_keys = {table: dict(names) for table, names in foreign_keys.items()}
+    if pending:
+        # The two ends of a foreign key must have the same type, so they all come off
+        # while columns change type
+        for table, names in foreign_keys.items():
+            for name in names:
+                statements.append("ALTER TABLE `{}` DROP FOREIGN KEY `{}`".format(table, name))
+            names.clear()
+
+    def modify(table, columns, column_type):
+        return "ALTER TABLE `{}` {}".format(table, ', '.join(
+            "MODIFY `{}` {} NOT NULL".format(column, column_type) for column in columns))
+
+    for table, columns in pending.items():
+        # Binary first (same bytes), so that the 16-byte values can be written into it.
+        # Only the values still in text form (36 characters) are converted: a run that
+        # stopped after the UPDATE converts nothing twice.
+        statements.append(modify(table, columns, 'VARBINARY(36)'))
+        statements.append("UPDATE `{}` SET {}".format(table, ', '.join(
+            "`{0}` = IF(LENGTH(`{0}`) = 36, UUID_TO_BIN(`{0}`), `{0}`)".format(column) for column in columns)))
+        statements.append(modify(table, columns, BINARY_ID))
+
+    for name, table, column, referenced in FOREIGN_KEYS:
+        if name in foreign_keys[table]:
+            continue
+        # Created under another name (e.g. by an earlier version of this script)
+        for other, columns in list(foreign_keys[table].items()):
+            if columns == [column]:
+                statements.append("ALTER TABLE `{}` DROP FOREIGN KEY `{}`".format(table, other))
+                del foreign_keys[table][other]
+        statements.append(
+            "ALTER TABLE `{}` ADD CONSTRAINT `{}` FOREIGN KEY (`{}`) "
+            "REFERENCES `{}` (`id`) ON DELETE CASCADE".format(table, name, column, referenced))
+    return statements
+
+
+def migrate_sqlite(connection, dry_run=False):
+    """
+    SQLite stores any value in any column, so the ids still in text form are rewritten
+    as their 16 bytes. Returns how many values were (or, on a dry run, would be) converted.
+    """
+    converted = 0
+    for table, columns in ID_COLUMNS.items():
+        for column in columns:
+            rows = connection.execute(text("SELECT rowid, {0} FROM {1} WHERE typeof({0}) = 'text'"
+                                           .format(column, table))).all()
+            converted += len(rows)
+            if dry_run:
+                continue
+            for rowid, value in rows:
+                connection.execute(text("UPDATE {} SET {} = :value WHERE rowid = :rowid".format(table, column)),
+                                   {'value': uuid.UUID(value).bytes, 'rowid': rowid})
+    return converted
+
+
+def migrate(engine, dry_run=False):
+    with engine.begin() as connection:
+        if connection.dialect.name == 'sqlite':
+            converted = migrate_sqlite(connection, dry_run)
+            if not converted:
+                print("Ids are already binary, nothing to do")
+            else:
+                print("{} {} ids to 16 bytes".format('Would convert' if dry_run else 'Converted', converted))
+            return
+
+        statements = mysql_statements(*mysql_state(connection))
+        if not statements:
+            print("Ids are already binary, nothing to do")
+            return
+        for statement in statements:
+            print(statement + ';')
+            if not dry_run:
+                connection.execute(text(statement))
+
+
+if __name__ == '__main__':
+    from app.persistence import engine
+    migrate(engine, dry_run='--dry-run' in sys.argv[1:])
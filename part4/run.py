@@ -1,6 +1,12 @@
+import atexit
 from app import create_app
+from app.services import facade
 
 app = create_app()
 
+# Save the keyword search index on the way out, so the next start can skip the rebuild
+# (only the server does: tests and scripts importing the app leave the file alone)
+atexit.register(facade.place_text_index.save)
+
 if __name__ == '__main__':
     app.run(debug=True)
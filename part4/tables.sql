@@ -2,9 +2,13 @@
 CREATE DATABASE IF NOT EXISTS hbnb_evo_2_db;
 USE hbnb_evo_2_db;
 
+-- Ids are time-ordered UUIDs (v7) stored as 16 raw bytes; the app shows them as the usual
+-- 36-character strings (see app/models/types.py). Older databases with varchar ids are
+-- converted in place by migrate_uuid_binary.py
+
 DROP TABLE IF EXISTS `users`;
 CREATE TABLE `users` (
-  `id` varchar(60) NOT NULL,
+  `id` binary(16) NOT NULL,
   `created_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
   `updated_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
   `first_name` varchar(50) NOT NULL,
@@ -17,7 +21,7 @@ CREATE TABLE `users` (
 
 DROP TABLE IF EXISTS `places`;
 CREATE TABLE `places` (
-  `id` varchar(60) NOT NULL,
+  `id` binary(16) NOT NULL,
   `created_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
   `updated_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
   `title` varchar(100) NOT NULL,
@@ -25,31 +29,37 @@ CREATE TABLE `places` (
   `price` float NOT NULL,
   `latitude` float NOT NULL,
   `longitude` float NOT NULL,
-  `owner_id` varchar(60) NOT NULL,
+  `owner_id` binary(16) NOT NULL,
   PRIMARY KEY (`id`),
   KEY `owner_id` (`owner_id`),
-  CONSTRAINT `places_ibfk_1` FOREIGN KEY (`owner_id`) REFERENCES `users` (`id`)
+  KEY `idx_places_price` (`price`),
+  KEY `idx_places_created_at` (`created_at`),
+  CONSTRAINT `places_ibfk_1` FOREIGN KEY (`owner_id`) REFERENCES `users` (`id`) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 
+-- For an existing database, the listing indexes can be added in place:
+-- CREATE INDEX `idx_places_price` ON `places` (`price`);
+-- CREATE INDEX `idx_places_created_at` ON `places` (`created_at`);
+
 DROP TABLE IF EXISTS `reviews`;
 CREATE TABLE `reviews` (
-  `id` varchar(60) NOT NULL,
+  `id` binary(16) NOT NULL,
   `created_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
   `updated_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
   `text` text NOT NULL,
   `rating` integer NOT NULL,
-  `place_id` varchar(60) NOT NULL,
-  `user_id` varchar(60) NOT NULL,
+  `place_id` binary(16) NOT NULL,
+  `user_id` binary(16) NOT NULL,
   PRIMARY KEY (`id`),
   KEY `place_id` (`place_id`),
   KEY `user_id` (`user_id`),
-  CONSTRAINT `reviews_ibfk_1` FOREIGN KEY (`place_id`) REFERENCES `places` (`id`),
-  CONSTRAINT `reviews_ibfk_2` FOREIGN KEY (`user_id`) REFERENCES `users` (`id`)
+  CONSTRAINT `reviews_ibfk_1` FOREIGN KEY (`place_id`) REFERENCES `places` (`id`) ON DELETE CASCADE,
+  CONSTRAINT `reviews_ibfk_2` FOREIGN KEY (`user_id`) REFERENCES `users` (`id`) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 
 DROP TABLE IF EXISTS `amenities`;
 CREATE TABLE `amenities` (
-  `id` varchar(60) NOT NULL,
+  `id` binary(16) NOT NULL,
   `created_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
   `updated_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
   `name` varchar(50) NOT NULL,
@@ -58,10 +68,34 @@ CREATE TABLE `amenities` (
 
 DROP TABLE IF EXISTS `place_amenity`;
 CREATE TABLE `place_amenity` (
-  `place_id` varchar(60) NOT NULL,
-  `amenity_id` varchar(60) NOT NULL,
+  `place_id` binary(16) NOT NULL,
+  `amenity_id` binary(16) NOT NULL,
   PRIMARY KEY (`place_id`,`amenity_id`),
   KEY `amenity_id` (`amenity_id`),
-  CONSTRAINT `place_amenity_ibfk_1` FOREIGN KEY (`place_id`) REFERENCES `places` (`id`),
-  CONSTRAINT `place_amenity_ibfk_2` FOREIGN KEY (`amenity_id`) REFERENCES `amenities` (`id`)
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
\ No newline at end of file
+  CONSTRAINT `place_amenity_ibfk_1` FOREIGN KEY (`place_id`) REFERENCES `places` (`id`) ON DELETE CASCADE,
+  CONSTRAINT `place_amenity_ibfk_2` FOREIGN KEY (`amenity_id`) REFERENCES `amenities` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+DROP TABLE IF EXISTS `changes`;
+CREATE TABLE `changes` (
+  `seq` bigint NOT NULL AUTO_INCREMENT,
+  `entity` varchar(20) NOT NULL,
+  `entity_id` binary(16) NOT NULL,
+  `action` varchar(10) NOT NULL,
+  `changed_at` datetime NOT NULL,
+  PRIMARY KEY (`seq`),
+  KEY `idx_changes_entity_seq` (`entity`, `seq`),
+  KEY `idx_changes_changed_at` (`changed_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+DROP TABLE IF EXISTS `change_log_state`;
+CREATE TABLE `change_log_state` (
+  `id` int NOT NULL,
+  `pruned_seq` bigint NOT NULL,
+  PRIMARY KEY (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+-- The app deletes dependent rows itself (see HBnBFacade.delete_user), the ON DELETE CASCADE
+-- clauses are a safety net. For an existing database, recreate the constraints, e.g.:
+-- ALTER TABLE `reviews` DROP FOREIGN KEY `reviews_ibfk_1`,
+--   ADD CONSTRAINT `reviews_ibfk_1` FOREIGN KEY (`place_id`) REFERENCES `places` (`id`) ON DELETE CASCADE;
@@ -13,9 +13,7 @@ sleep 5
 # Ensure all processes are terminated
 echo "🧹 Final cleanup..."
 pkill -f "python run_v4.py" 2>/dev/null || true
-pkill -f "python -m http.server 8080" 2>/dev/null || true
 kill -9 $(lsof -ti:5001) 2>/dev/null || true
-kill -9 $(lsof -ti:8080) 2>/dev/null || true
 
 # Wait additional time
 sleep 3
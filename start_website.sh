@@ -17,13 +17,6 @@ if lsof -Pi :5001 -sTCP:LISTEN -t >/dev/null 2>&1; then
     sleep 2
 fi
 
-if lsof -Pi :8080 -sTCP:LISTEN -t >/dev/null 2>&1; then
-    echo "⚠️  Port 8080 is already in use. Stopping existing process..."
-    pkill -f "python -m http.server 8080" 2>/dev/null || true
-    kill -9 $(lsof -ti:8080) 2>/dev/null || true
-    sleep 2
-fi
-
 # Start database
 echo "📊 Starting MySQL database..."
 docker-compose up -d mysql
@@ -41,8 +34,20 @@ done
 
 echo "✅ Database is running"
 
-# Start backend API server (background)
-echo "🔧 Starting backend API server (port 5001)..."
+# Create missing tables and the default admin user
+echo "🗄️  Bootstrapping database..."
+cd part4
+python bootstrap.py
+cd ..
+
+# Fingerprint and precompress the frontend, which the API server serves itself
+echo "📦 Building frontend assets..."
+cd part4
+python build_assets.py
+cd ..
+
+# Start the API server, which also serves the website (background)
+echo "🔧 Starting API and website server (port 5001)..."
 cd part4
 python run_v4.py &
 BACKEND_PID=$!
@@ -55,29 +60,14 @@ if ! kill -0 $BACKEND_PID 2>/dev/null; then
     exit 1
 fi
 
-# Start frontend server (background)
-echo "🌐 Starting frontend server (port 8080)..."
-cd part4/frontend
-python -m http.server 8080 &
-FRONTEND_PID=$!
-cd ../..
-
-# Wait for frontend to start and verify
-sleep 2
-if ! kill -0 $FRONTEND_PID 2>/dev/null; then
-    echo "❌ Frontend failed to start"
-    exit 1
-fi
-
 # Save process IDs to files
 echo $BACKEND_PID > .backend_pid
-echo $FRONTEND_PID > .frontend_pid
 
 echo ""
 echo "🎉 Website started successfully!"
 echo ""
 echo "📱 Access URLs:"
-echo "   Main Website: http://localhost:8080"
+echo "   Main Website: http://127.0.0.1:5001"
 echo "   API Docs:     http://127.0.0.1:5001/swagger"
 echo "   API Base:     http://127.0.0.1:5001/api/v1/"
 echo ""